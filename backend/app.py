@@ -1,12 +1,11 @@
+import csv
+import hmac
+import io
 import os
 import re
 import mimetypes
-import smtplib
-import ssl
 from functools import wraps
-from email.message import EmailMessage
 
-from datetime import datetime
 from pathlib import Path
 
 from flask import Flask, jsonify, request, g
@@ -16,7 +15,13 @@ import threading
 import time
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-from db import ensure_db, init_db
+from db import WriteQueueFull, batched_insert, ensure_db, init_db, utc_timestamp
+from json_provider import AppJSONProvider, RawJSON
+from compression import init_compression
+import metrics
+import query_stats
+import profiler
+from prerender import schedule_refresh
 from models import (
     delete_subscription,
     fetch_company,
@@ -25,19 +30,13 @@ from models import (
     fetch_subscriptions,
     fetch_contact_messages,
     delete_contact_message,
-    get_conn,
     get_page_data,
-    replace_hero,
-    replace_services,
-    replace_team,
-    save_about,
     save_company,
     set_brochure_url,
     save_contact_message,
-    save_services_meta,
-    save_story,
-    save_team_meta,
+    save_page_content,
     # publicaciones
+    fetch_publication_list,
     fetch_publications,
     fetch_publication,
     save_publication,
@@ -49,6 +48,7 @@ from models import (
     fetch_kdbweb_entries,
     fetch_kdbweb_entry_by_slug,
     fetch_page_settings,
+    fetch_page_visibility,
     is_page_enabled,
     replace_kdbweb_entries,
     fetch_katweb_boletines,
@@ -79,6 +79,8 @@ from models import (
     fetch_order_by_id,
     fetch_students,
     fetch_student_orders,
+    EXPORTS,
+    export_rows,
     # payment config
     get_payment_config,
     save_payment_config,
@@ -151,6 +153,7 @@ log_level_name = (os.environ.get("LOG_LEVEL") or ("DEBUG" if DEBUG else "INFO"))
 LOG_LEVEL = getattr(logging, log_level_name, logging.INFO)
 
 app = Flask(__name__, static_folder=None, template_folder=None)
+app.json = AppJSONProvider(app)
 if (os.environ.get("USE_PROXY_FIX") or "").lower() in ("1", "true", "yes", "on"):
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
 
@@ -178,6 +181,18 @@ if cors_enabled:
         CORS(app)
 
 
+def _is_public_request():
+    # Sin credenciales de admin la respuesta no depende de quién la pide y
+    # puede llevar ETag y reutilizar la compresión cacheada.
+    return not request.headers.get("Authorization") and not request.cookies.get("admin_token")
+
+
+# Métricas primero: su after_request corre último y ve el cuerpo comprimido
+metrics.init_metrics(app, log_requests=REQUEST_LOG)
+query_stats.init_query_stats()
+init_compression(app, _is_public_request)
+
+
 def _get_bearer_token():
     auth = request.headers.get("Authorization", "")
     if not auth:
@@ -201,12 +216,28 @@ def _is_admin_request():
     return bool(get_admin_by_token(token))
 
 
+def _is_super_admin_request():
+    admin = get_admin_by_token(_get_auth_token())
+    return bool(admin) and admin.get("role") == "super"
+
+
+# X-Profile solo se atiende para admins super; el resto lo ignora
+profiler.init_profiler(app, _is_super_admin_request)
+
+
 def _page_enabled_for_request(page_key):
+    # is_page_enabled lee un snapshot en memoria; el token admin solo se
+    # valida cuando la pagina esta oculta y el request trae credencial.
     if is_page_enabled(page_key):
         return True
     return _is_admin_request()
 
 
+def _refresh_snapshots(page=None):
+    # Regenera en segundo plano los HTML prerenderizados que dependen del cambio
+    schedule_refresh(app, page, ALLOWED_PAGES)
+
+
 def require_admin(roles=None):
     def decorator(fn):
         @wraps(fn)
@@ -292,6 +323,34 @@ def _mail_config():
     }
 
 
+def _new_message():
+    # email.message y smtplib se importan al primer correo, no al arrancar el worker
+    from email.message import EmailMessage
+
+    return EmailMessage()
+
+
+def _send_mail(cfg, *messages):
+    """Envía los mensajes por una sola conexión SMTP según _mail_config()."""
+    import smtplib
+    import ssl
+
+    if cfg["use_ssl"]:
+        with smtplib.SMTP_SSL(cfg["host"], cfg["port"], context=ssl.create_default_context(), timeout=15) as server:
+            if cfg["user"] and cfg["password"]:
+                server.login(cfg["user"], cfg["password"])
+            for msg in messages:
+                server.send_message(msg)
+    else:
+        with smtplib.SMTP(cfg["host"], cfg["port"], timeout=15) as server:
+            if cfg["use_tls"]:
+                server.starttls(context=ssl.create_default_context())
+            if cfg["user"] and cfg["password"]:
+                server.login(cfg["user"], cfg["password"])
+            for msg in messages:
+                server.send_message(msg)
+
+
 def _send_contact_email(payload):
     cfg = _mail_config()
     if not cfg["enabled"]:
@@ -307,7 +366,7 @@ def _send_contact_email(payload):
     subject = (payload.get("subject") or "").strip() or "Nuevo mensaje de contacto"
     message = (payload.get("message") or "").strip()
 
-    msg = EmailMessage()
+    msg = _new_message()
     msg["Subject"] = f"[Web] {subject}"
     msg["From"] = cfg["from"]
     msg["To"] = cfg["to"]
@@ -330,18 +389,7 @@ def _send_contact_email(payload):
     )
 
     try:
-        if cfg["use_ssl"]:
-            with smtplib.SMTP_SSL(cfg["host"], cfg["port"], context=ssl.create_default_context(), timeout=15) as server:
-                if cfg["user"] and cfg["password"]:
-                    server.login(cfg["user"], cfg["password"])
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(cfg["host"], cfg["port"], timeout=15) as server:
-                if cfg["use_tls"]:
-                    server.starttls(context=ssl.create_default_context())
-                if cfg["user"] and cfg["password"]:
-                    server.login(cfg["user"], cfg["password"])
-                server.send_message(msg)
+        _send_mail(cfg, msg)
     except Exception as exc:  # pylint: disable=broad-except
         return False, str(exc)
     return True, "sent"
@@ -370,6 +418,72 @@ def _admin_payload(admin):
     }
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    # Nginx no expone /metrics; con METRICS_TOKEN se exige además un Bearer.
+    expected = (os.environ.get("METRICS_TOKEN") or "").strip()
+    if expected and not hmac.compare_digest(_get_bearer_token(), expected):
+        return jsonify(error="No autorizado"), 401
+    return app.response_class(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.route("/api/admin/query-stats", methods=["GET"])
+@require_admin(roles={"super"})
+def api_admin_query_stats():
+    try:
+        limit = max(1, min(int(request.args.get("limit") or 20), 500))
+    except ValueError:
+        return jsonify(error="limit invalido"), 400
+    sort = request.args.get("sort") or "total_ms"
+    if sort not in query_stats.SORT_KEYS:
+        return jsonify(error="sort invalido"), 400
+    return jsonify(
+        slow_query_ms=query_stats.SLOW_QUERY_MS,
+        sort=sort,
+        items=query_stats.top_queries(limit=limit, sort=sort),
+    )
+
+
+def _profile_response(profile, fmt, name):
+    body, mimetype = profiler.render(profile, fmt)
+    extension = "json" if fmt == "speedscope" else "txt"
+    resp = app.response_class(body, mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f'attachment; filename="{name}.{extension}"'
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@app.route("/api/admin/profile", methods=["POST"])
+@require_admin(roles={"super"})
+def api_admin_profile():
+    # Bloquea este hilo mientras muestrea al resto del worker que atendió el request
+    try:
+        seconds = float(request.args.get("seconds") or 10)
+        interval_ms = max(1.0, float(request.args.get("interval_ms") or 5))
+    except ValueError:
+        return jsonify(error="seconds o interval_ms invalido"), 400
+    fmt = request.args.get("format") or "collapsed"
+    if fmt not in profiler.FORMATS:
+        return jsonify(error="format invalido"), 400
+    try:
+        profile = profiler.capture(seconds, interval_ms, exclude={threading.get_ident()})
+    except profiler.ProfilerBusy as exc:
+        return jsonify(error=str(exc)), 429
+    return _profile_response(profile, fmt, f"profile-{profile['pid']}-{int(profile['started_at'])}")
+
+
+@app.route("/api/admin/profile/<profile_id>", methods=["GET"])
+@require_admin(roles={"super"})
+def api_admin_profile_get(profile_id):
+    fmt = request.args.get("format") or "collapsed"
+    if fmt not in profiler.FORMATS:
+        return jsonify(error="format invalido"), 400
+    profile = profiler.load(profile_id)
+    if not profile:
+        return jsonify(error="Perfil no encontrado"), 404
+    return _profile_response(profile, fmt, f"profile-{profile_id}")
+
+
 @app.route("/auth/bootstrap", methods=["POST"])
 def auth_bootstrap():
     ensure_db()
@@ -498,21 +612,13 @@ def subscribe():
     if not EMAIL_REGEX.match(email):
         return jsonify(error="Email invalido"), 400
 
-    conn = get_conn()
-    try:
-        with conn:
-            conn.execute(
-                "INSERT INTO subscriptions (email, created_at) VALUES (?, ?)",
-                (email, datetime.utcnow().isoformat()),
-            )
-    except Exception as exc:  # pylint: disable=broad-except
-        if "UNIQUE constraint" in str(exc):
-            return jsonify(message="Suscripcion registrada"), 201
-        raise
-    finally:
-        conn.close()
-
-    print(f"[subscribe] new email saved: {email}")
+    # Un email repetido se ignora y responde igual que uno nuevo
+    inserted = batched_insert(
+        "INSERT OR IGNORE INTO subscriptions (email, created_at) VALUES (?, ?)",
+        (email, utc_timestamp()),
+    )
+    if inserted:
+        print(f"[subscribe] new email saved: {email}")
     return jsonify(message="Suscripcion registrada"), 201
 
 @app.route("/config/company", methods=["GET", "POST"])
@@ -523,6 +629,7 @@ def company_config():
         payload = request.get_json(silent=True) or {}
         print("[company_config] POST payload:", payload)
         save_company(payload)
+        _refresh_snapshots()
         return jsonify(message="Company info updated"), 200
     print("[company_config] GET")
     return jsonify(fetch_company())
@@ -544,6 +651,7 @@ def brochure_upload():
     f.save(dest)
     public_url = "/assets/brochure.pdf"
     set_brochure_url(public_url)
+    _refresh_snapshots()
     return jsonify(url=public_url), 200
 
 
@@ -559,6 +667,7 @@ def brochure_delete():
     except Exception:
         pass
     set_brochure_url("")
+    _refresh_snapshots()
     return jsonify(message="Brochure eliminado"), 200
 
 
@@ -571,20 +680,10 @@ def page_config(page):
     if request.method == "POST":
         payload = request.get_json(silent=True) or {}
         print(f"[page_config] POST page={page} payload keys={list(payload.keys())}")
-        hero = payload.get("hero") or []
-        story = payload.get("story") or {}
-        team = payload.get("team") or []
-        about = payload.get("about") or {}
-        team_meta = payload.get("team_meta") or {}
-        services = payload.get("services") or []
-        services_meta = payload.get("services_meta") or {}
-        replace_hero(page, hero)
-        save_story(page, story)
-        save_about(page, about)
-        save_team_meta(page, team_meta)
-        replace_team(page, team)
-        replace_services(page, services)
-        save_services_meta(page, services_meta)
+        # Todas las secciones en una transacción: los lectores nunca ven la
+        # página a medio guardar.
+        save_page_content(page, payload)
+        _refresh_snapshots(page)
         return jsonify(message="Page content updated"), 200
     print(f"[page_config] GET page={page}")
     data = get_page_data(page)
@@ -603,6 +702,7 @@ def config_pages():
             return jsonify(error="Formato invalido"), 400
         filtered = {k: bool(v) for k, v in pages.items() if k in PAGE_VISIBILITY_KEYS}
         save_page_settings(filtered)
+        _refresh_snapshots()
         return jsonify(message="Visibilidad actualizada"), 200
     settings = fetch_page_settings()
     data = {key: bool(settings.get(key, True)) for key in PAGE_VISIBILITY_KEYS}
@@ -619,7 +719,7 @@ def api_company():
 @app.route("/api/pages", methods=["GET"])
 def api_pages():
     ensure_db()
-    settings = fetch_page_settings()
+    settings = fetch_page_visibility()
     data = {key: bool(settings.get(key, True)) for key in PAGE_VISIBILITY_KEYS}
     return jsonify(pages=data)
 
@@ -640,8 +740,21 @@ def api_publications():
     ensure_db()
     if not _page_enabled_for_request("publicaciones"):
         return jsonify(error="Pagina no disponible"), 404
-    active_only = request.args.get("all") is None
-    return jsonify(fetch_publications(active_only=active_only))
+    if request.args.get("all") is not None:
+        # Admin: filas completas, incluidas las inactivas y el content_html
+        return jsonify(fetch_publications(active_only=False))
+    limit = request.args.get("limit")
+    if limit is not None and not limit.isdigit():
+        return jsonify(error="limit invalido"), 400
+    try:
+        data = fetch_publication_list(
+            category=request.args.get("category"),
+            limit=int(limit) if limit is not None else None,
+            cursor=request.args.get("cursor"),
+        )
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    return jsonify(data)
 
 
 @app.route("/api/publications/<int:pub_id>", methods=["GET"])
@@ -883,6 +996,16 @@ def api_kdbweb_detail(slug):
     entry = fetch_kdbweb_entry_by_slug(slug)
     if not entry:
         return jsonify(error="No encontrado"), 404
+    # meta_json se valida al guardar y se incrusta como objeto JSON tal cual,
+    # sin parsearlo ni re-escaparlo. Una fila antigua o editada a mano puede no
+    # ser JSON: SQLite lo revisa en la misma consulta (json_valid) y ese texto
+    # viaja como string, que el frontend ya sabe leer o descartar.
+    meta_valid = entry.pop("meta_json_valid", None)
+    if entry.get("meta_json"):
+        if meta_valid:
+            entry["meta_json"] = RawJSON(entry["meta_json"])
+        else:
+            app.logger.warning("kdbweb %s: meta_json no es JSON valido, se envia como texto", slug)
     return jsonify(entry)
 
 
@@ -895,6 +1018,7 @@ def api_kdbweb_save():
     if not isinstance(entries, list):
         return jsonify(error="Formato invalido"), 400
     replace_kdbweb_entries(entries)
+    _refresh_snapshots()
     return jsonify(message="KDBWEB actualizado"), 200
 
 
@@ -916,6 +1040,7 @@ def api_katweb_boletines_save():
     if not isinstance(boletines, list):
         return jsonify(error="Formato invalido"), 400
     replace_katweb_boletines(boletines)
+    _refresh_snapshots("kdbweb-detail")
     saved = fetch_katweb_boletines()
     return jsonify(message="Boletines actualizados", boletines=saved), 200
 
@@ -1088,6 +1213,7 @@ def api_media_move():
         update_all_url_references(old_url, url)
     except Exception:
         app.logger.exception("Error updating URL references after move")
+    _refresh_snapshots()
     return jsonify(key=new_key, url=url), 200
 
 
@@ -1264,13 +1390,17 @@ def api_contact_delete(message_id):
     delete_contact_message(message_id)
     return jsonify(message="Eliminado"), 200
 
-@app.route("/swagger.json", methods=["GET"])
-def swagger_json():
-    base = request.host_url.rstrip("/")
-    spec = {
+_SWAGGER_SPEC = None
+# host -> spec serializado; acotado porque el Host lo decide el cliente
+_SWAGGER_JSON = {}
+_SWAGGER_JSON_MAX_HOSTS = 8
+
+
+def _build_swagger_spec():
+    return {
         "openapi": "3.0.1",
         "info": {"title": "KDB API", "version": "1.0.0", "description": "API del backend (contenidos, suscripciones, configuraciÃ³n)."},
-        "servers": [{"url": base}],
+        "servers": [],
         "paths": {
             "/health": {
                 "get": {
@@ -1400,8 +1530,13 @@ def swagger_json():
             "/api/publications": {
                 "get": {
                     "summary": "Listar publicaciones",
-                    "description": "Retorna publicaciones; por defecto solo activas. Usar all=1 para incluir inactivas.",
-                    "parameters": [{"in": "query", "name": "all", "schema": {"type": "string"}, "description": "Si se envÃ­a, incluye inactivas"}],
+                    "description": "Retorna publicaciones activas sin content_html (listado liviano). Con limit/cursor responde {items, next_cursor, total}. Usar all=1 para las filas completas, incluidas inactivas.",
+                    "parameters": [
+                        {"in": "query", "name": "all", "schema": {"type": "string"}, "description": "Si se envÃ­a, incluye inactivas"},
+                        {"in": "query", "name": "category", "schema": {"type": "string"}, "description": "Id o nombre de categoria"},
+                        {"in": "query", "name": "limit", "schema": {"type": "integer"}},
+                        {"in": "query", "name": "cursor", "schema": {"type": "string"}},
+                    ],
                     "responses": {"200": {"description": "OK"}},
                 },
                 "post": {
@@ -1537,7 +1672,21 @@ def swagger_json():
             },
         },
     }
-    return jsonify(spec)
+
+
+@app.route("/swagger.json", methods=["GET"])
+def swagger_json():
+    # El spec se arma una sola vez por worker; solo "servers" depende del host
+    global _SWAGGER_SPEC
+    base = request.host_url.rstrip("/")
+    body = _SWAGGER_JSON.get(base)
+    if body is None:
+        if _SWAGGER_SPEC is None:
+            _SWAGGER_SPEC = _build_swagger_spec()
+        body = RawJSON(app.json.dumps(dict(_SWAGGER_SPEC, servers=[{"url": base}])))
+        if len(_SWAGGER_JSON) < _SWAGGER_JSON_MAX_HOSTS:
+            _SWAGGER_JSON[base] = body
+    return jsonify(body)
 
 
 # ─── Academia: Courses (público) ─────────────────────────────────────────────
@@ -1671,7 +1820,19 @@ def api_admin_toggle_moodle_visibility(course_id):
 @require_admin()
 def api_admin_students():
     ensure_db()
-    return jsonify(fetch_students())
+    try:
+        limit = int(request.args.get("limit") or 50)
+    except ValueError:
+        limit = 50
+    try:
+        page = fetch_students(
+            search=request.args.get("q") or None,
+            limit=limit,
+            cursor=request.args.get("cursor") or None,
+        )
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    return jsonify(page)
 
 
 @app.route("/api/admin/students/<path:email>/orders", methods=["GET"])
@@ -1681,6 +1842,60 @@ def api_admin_student_orders(email):
     return jsonify(fetch_student_orders(email))
 
 
+EXPORT_MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _csv_cell(value):
+    # Evita que Excel interprete como fórmula un texto enviado desde formularios públicos
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@", "\t", "\r"):
+        return "'" + value
+    return value
+
+
+def _export_body(columns, chunks, fmt):
+    if fmt == "ndjson":
+        for chunk in chunks:
+            yield "".join(app.json.dumps(dict(zip(columns, row))) + "\n" for row in chunk)
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para que Excel abra el CSV como UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    for chunk in chunks:
+        for row in chunk:
+            writer.writerow([_csv_cell(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@app.route("/api/admin/export/<kind>", methods=["GET"])
+@require_admin()
+def api_admin_export(kind):
+    """Descarga completa en CSV o NDJSON, generada por bloques mientras se envía."""
+    ensure_db()
+    if kind not in EXPORTS:
+        return jsonify(error="Exportacion no encontrada"), 404
+    fmt = request.args.get("format") or "csv"
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify(error="format invalido"), 400
+    try:
+        columns, chunks = export_rows(
+            kind,
+            date_from=request.args.get("from") or None,
+            date_to=request.args.get("to") or None,
+        )
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    resp = app.response_class(_export_body(columns, chunks, fmt), mimetype=EXPORT_MIMETYPES[fmt])
+    resp.headers["Content-Disposition"] = f'attachment; filename="{kind}-{time.strftime("%Y%m%d", time.gmtime())}.{fmt}"'
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
 # ─── Academia: Voucher upload presign (público) ───────────────────────────────
 
 @app.route("/api/checkout/voucher-presign", methods=["POST"])
@@ -1795,7 +2010,7 @@ def _send_moodle_credentials(student_email, student_name, course_title,
     cfg = _mail_config()
     if not cfg["enabled"]:
         return
-    msg = EmailMessage()
+    msg = _new_message()
     msg["Subject"] = f"Tus credenciales de acceso — {course_title}"
     msg["From"] = cfg["academia_from"]
     msg["To"] = student_email
@@ -1822,18 +2037,7 @@ def _send_moodle_credentials(student_email, student_name, course_title,
         "https://katarzyna.pe",
     ]))
     try:
-        if cfg["use_ssl"]:
-            with smtplib.SMTP_SSL(cfg["host"], cfg["port"], context=ssl.create_default_context(), timeout=15) as server:
-                if cfg["user"] and cfg["password"]:
-                    server.login(cfg["user"], cfg["password"])
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(cfg["host"], cfg["port"], timeout=15) as server:
-                if cfg["use_tls"]:
-                    server.starttls(context=ssl.create_default_context())
-                if cfg["user"] and cfg["password"]:
-                    server.login(cfg["user"], cfg["password"])
-                server.send_message(msg)
+        _send_mail(cfg, msg)
     except Exception as exc:
         app.logger.error("moodle credentials email error: %s", exc)
 
@@ -1863,7 +2067,7 @@ def _provision_moodle_and_notify(order_id):
 
         updates = {
             "moodle_enrolled": 1,
-            "moodle_enrolled_at": __import__("datetime").datetime.utcnow().isoformat(),
+            "moodle_enrolled_at": utc_timestamp(),
             "moodle_user_email": email,
             "moodle_user_id": result["moodle_user_id"],
         }
@@ -1900,7 +2104,7 @@ def _send_moodle_enrollment_notification(student_email, student_name, course_tit
     cfg = _mail_config()
     if not cfg["enabled"]:
         return
-    msg = EmailMessage()
+    msg = _new_message()
     msg["Subject"] = f"Ya tienes acceso a tu nuevo curso — {course_title}"
     msg["From"] = cfg["academia_from"]
     msg["To"] = student_email
@@ -1930,18 +2134,7 @@ def _send_moodle_enrollment_notification(student_email, student_name, course_tit
         "https://katarzyna.pe",
     ]))
     try:
-        if cfg["use_ssl"]:
-            with smtplib.SMTP_SSL(cfg["host"], cfg["port"], context=ssl.create_default_context(), timeout=15) as server:
-                if cfg["user"] and cfg["password"]:
-                    server.login(cfg["user"], cfg["password"])
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(cfg["host"], cfg["port"], timeout=15) as server:
-                if cfg["use_tls"]:
-                    server.starttls(context=ssl.create_default_context())
-                if cfg["user"] and cfg["password"]:
-                    server.login(cfg["user"], cfg["password"])
-                server.send_message(msg)
+        _send_mail(cfg, msg)
     except Exception as exc:
         app.logger.error("enrollment notification email error: %s", exc)
 
@@ -1961,7 +2154,7 @@ def _send_checkout_emails(order_id, student_name, student_email, course_title, a
     )
 
     # Email to admin
-    admin_msg = EmailMessage()
+    admin_msg = _new_message()
     admin_msg["Subject"] = f"[Academia] Nueva inscripción #{order_ref} — {course_title}"
     admin_msg["From"] = cfg["academia_from"]
     admin_msg["To"] = cfg["academia_to"]
@@ -1985,7 +2178,7 @@ def _send_checkout_emails(order_id, student_name, student_email, course_title, a
     ]))
 
     # Confirmation email to student
-    student_msg = EmailMessage()
+    student_msg = _new_message()
     student_msg["Subject"] = f"Inscripción recibida — {course_title} [{order_ref}]"
     student_msg["From"] = cfg["academia_from"]
     student_msg["To"] = student_email
@@ -2015,20 +2208,7 @@ def _send_checkout_emails(order_id, student_name, student_email, course_title, a
     ]))
 
     try:
-        if cfg["use_ssl"]:
-            with smtplib.SMTP_SSL(cfg["host"], cfg["port"], context=ssl.create_default_context(), timeout=15) as server:
-                if cfg["user"] and cfg["password"]:
-                    server.login(cfg["user"], cfg["password"])
-                server.send_message(admin_msg)
-                server.send_message(student_msg)
-        else:
-            with smtplib.SMTP(cfg["host"], cfg["port"], timeout=15) as server:
-                if cfg["use_tls"]:
-                    server.starttls(context=ssl.create_default_context())
-                if cfg["user"] and cfg["password"]:
-                    server.login(cfg["user"], cfg["password"])
-                server.send_message(admin_msg)
-                server.send_message(student_msg)
+        _send_mail(cfg, admin_msg, student_msg)
     except Exception as exc:
         app.logger.error("checkout email error: %s", exc)
 
@@ -2119,9 +2299,27 @@ def api_payment_webhook():
 @require_admin()
 def api_admin_orders():
     ensure_db()
-    status = request.args.get("status") or None
-    orders = fetch_orders(status=status)
-    return jsonify(orders)
+    try:
+        limit = int(request.args.get("limit") or 50)
+    except ValueError:
+        limit = 50
+    course_id = request.args.get("course_id") or None
+    if course_id is not None and not course_id.isdigit():
+        return jsonify(error="course_id invalido"), 400
+    try:
+        page = fetch_orders(
+            status=request.args.get("status") or None,
+            course_id=course_id,
+            payment_method=request.args.get("payment_method") or None,
+            date_from=request.args.get("from") or None,
+            date_to=request.args.get("to") or None,
+            email_prefix=request.args.get("email") or None,
+            limit=limit,
+            cursor=request.args.get("cursor") or None,
+        )
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    return jsonify(page)
 
 
 @app.route("/api/admin/orders/<int:order_id>", methods=["PUT"])
@@ -2129,14 +2327,13 @@ def api_admin_orders():
 def api_admin_update_order(order_id):
     ensure_db()
     data = request.get_json(silent=True) or {}
-    from datetime import datetime as _dt
 
     confirm_payment = data.get("status") == "paid"
 
     if data.get("comprobante_number") and not data.get("comprobante_issued_at"):
-        data["comprobante_issued_at"] = _dt.utcnow().isoformat()
+        data["comprobante_issued_at"] = utc_timestamp()
     if data.get("moodle_enrolled") and not data.get("moodle_enrolled_at"):
-        data["moodle_enrolled_at"] = _dt.utcnow().isoformat()
+        data["moodle_enrolled_at"] = utc_timestamp()
 
     admin_update_order(order_id, data)
     return jsonify(message="Orden actualizada"), 200
@@ -2225,7 +2422,7 @@ def api_admin_request_voucher(order_id):
     course_title = order.get("course_title", "") or order.get("course_slug", "")
     order_ref = f"ORD-{order_id:04d}"
 
-    msg = EmailMessage()
+    msg = _new_message()
     msg["Subject"] = f"Necesitamos tu comprobante de pago — {order_ref}"
     msg["From"] = cfg["academia_from"]
     msg["To"] = student_email
@@ -2251,18 +2448,7 @@ def api_admin_request_voucher(order_id):
         "https://katarzyna.pe",
     ]))
     try:
-        if cfg["use_ssl"]:
-            with smtplib.SMTP_SSL(cfg["host"], cfg["port"], context=ssl.create_default_context(), timeout=15) as server:
-                if cfg["user"] and cfg["password"]:
-                    server.login(cfg["user"], cfg["password"])
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(cfg["host"], cfg["port"], timeout=15) as server:
-                if cfg["use_tls"]:
-                    server.starttls(context=ssl.create_default_context())
-                if cfg["user"] and cfg["password"]:
-                    server.login(cfg["user"], cfg["password"])
-                server.send_message(msg)
+        _send_mail(cfg, msg)
         app.logger.info("request_voucher: correo enviado a %s para orden %s", student_email, order_id)
         return jsonify(message=f"Correo enviado a {student_email}"), 200
     except Exception as exc:
@@ -2273,15 +2459,6 @@ def api_admin_request_voucher(order_id):
 @app.before_request
 def before():
     ensure_db()
-    if not REQUEST_LOG:
-        return
-    # Log basic request info so frontend requests are visible in the server terminal
-    try:
-        payload = request.get_json(silent=True)
-    except Exception:
-        payload = None
-    args = dict(request.args)
-    print(f"[request] {request.method} {request.path} from {request.remote_addr} args={args} json={payload}")
 
 
 @app.errorhandler(404)
@@ -2289,6 +2466,15 @@ def not_found(error):
     return jsonify(error="Pagina no encontrada"), 404
 
 
+@app.errorhandler(WriteQueueFull)
+def write_queue_full(error):
+    # Ráfaga de escrituras mayor que la fila del proceso: que el cliente reintente
+    app.logger.warning("write queue: %s", error)
+    resp = jsonify(error="Servicio ocupado, intenta nuevamente")
+    resp.headers["Retry-After"] = "1"
+    return resp, 503
+
+
 if __name__ == "__main__":
     init_db()
     host = os.environ.get("FLASK_HOST", "127.0.0.1")
@@ -0,0 +1,163 @@
+"""
+Compresión de respuestas (Brotli si está instalado, gzip si no) negociada con
+Accept-Encoding, más ETag y caché por worker de los bytes ya comprimidos.
+
+Las respuestas públicas (GET sin credenciales de admin) llevan un ETag débil
+calculado sobre el cuerpo sin comprimir; la caché guarda el resultado de
+comprimir ese cuerpo bajo (ETag, codificación), así que una respuesta que se
+repite idéntica no se vuelve a comprimir. Con If-None-Match responde 304.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_CACHE_MAX_BYTES = int(os.environ.get("COMPRESS_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+
+def _accepted_encodings(header):
+    """{codificación: q} a partir de Accept-Encoding."""
+    accepted = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = _accepted_encodings(header)
+    wildcard = accepted.get("*", 0.0)
+    for encoding in (("br",) if brotli is not None else ()) + ("gzip",):
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _cache_get(key):
+    with _cache_lock:
+        data = _cache.get(key)
+        if data is not None:
+            _cache.move_to_end(key)
+            stats["hits"] += 1
+        else:
+            stats["misses"] += 1
+    metrics.cache_result("compression", data is not None)
+    return data
+
+
+def _cache_put(key, data):
+    global _cache_bytes
+    if len(data) > COMPRESS_CACHE_MAX_BYTES // 4:
+        return
+    with _cache_lock:
+        if key in _cache:
+            return
+        _cache[key] = data
+        _cache_bytes += len(data)
+        while _cache_bytes > COMPRESS_CACHE_MAX_BYTES and _cache:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= len(evicted)
+
+
+def clear_cache():
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+def _compressible(response):
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code != 200 or "Content-Encoding" in response.headers:
+        return False
+    mimetype = response.mimetype or ""
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def init_compression(app, is_public_request):
+    """
+    Registra el after_request. is_public_request() decide si la respuesta se
+    puede cachear (sin datos por usuario); las demás se comprimen igual, pero
+    sin ETag ni caché.
+    """
+
+    @app.after_request
+    def _compress_response(response):
+        from flask import request
+
+        if not _compressible(response):
+            return response
+        response.vary.add("Accept-Encoding")
+        body = response.get_data()
+        cacheable = request.method == "GET" and is_public_request()
+
+        etag = None
+        if cacheable:
+            etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+            response.set_etag(etag, weak=True)
+            if request.if_none_match.contains_weak(etag):
+                stats["not_modified"] += 1
+                response.status_code = 304
+                response.set_data(b"")
+                return response
+
+        if len(body) < COMPRESS_MIN_BYTES:
+            return response
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        if not encoding:
+            return response
+
+        compressed = _cache_get((etag, encoding)) if etag else None
+        if compressed is None:
+            compressed = compress(body, encoding)
+            if etag:
+                _cache_put((etag, encoding), compressed)
+        if len(compressed) >= len(body):
+            return response
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    return _compress_response
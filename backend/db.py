@@ -1,7 +1,17 @@
+import hashlib
+import logging
 import os
+import queue
 import sqlite3
-from datetime import datetime
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from html.parser import HTMLParser
 from pathlib import Path
+from urllib.parse import quote
 import json
 from werkzeug.security import generate_password_hash
 
@@ -16,16 +26,490 @@ else:
 
 _db_initialized = False
 
+# Versión del esquema guardada en PRAGMA user_version al terminar init_db.
+# Súbela al agregar tablas, columnas, índices, seeds o migraciones: un deploy
+# con otra versión vuelve a correr init_db; el resto de los arranques de
+# worker (y cada reciclado por max_requests) solo leen el pragma.
+SCHEMA_VERSION = 3
 
-def get_conn():
+# Sellos de versión compartidos entre workers de gunicorn. Cada sello es un
+# archivo pequeño junto a la base de datos; los cachés en memoria de cada
+# proceso comparan el contenido leído contra el que tenían para saber si deben
+# invalidarse, sin tocar SQLite.
+VERSIONS_DIR = DB_PATH.parent / f".{DB_PATH.name}.versions"
+
+
+# Con workers gevent (GUNICORN_WORKER_CLASS=gevent) el busy handler de SQLite
+# dormiría en C y congelaría todos los greenlets del worker mientras espera el
+# lock de escritura. En ese modo la conexión no espera (timeout=0) y las
+# sentencias con "database is locked" se reintentan con time.sleep, que gevent
+# parchea para ceder el turno; el plazo total sigue siendo DB_BUSY_TIMEOUT.
+DB_BUSY_TIMEOUT = float(os.environ.get("DB_BUSY_TIMEOUT", "5"))
+
+
+def _cooperative():
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("time")
+
+
+def _busy_retry(method, *args):
+    deadline = time.monotonic() + DB_BUSY_TIMEOUT
+    delay = 0.001
+    while True:
+        try:
+            return method(*args)
+        except sqlite3.OperationalError as exc:
+            if "locked" not in str(exc):
+                raise
+            if time.monotonic() >= deadline:
+                # Igual que sin gevent cuando la fila del proceso no avanza: 503
+                raise WriteQueueFull("La escritura no obtuvo turno a tiempo") from exc
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+# Observadores de consultas: cada sentencia ejecutada por una conexión de
+# get_conn() se reporta como observer(sql, segundos, filas, conexión) al
+# terminar de leerse (o al ejecutarse si no devuelve filas). Sin observadores
+# registrados el cursor no mide nada.
+_query_observers = []
+
+
+def add_query_observer(observer):
+    if observer not in _query_observers:
+        _query_observers.append(observer)
+
+
+class _ObservedCursor(sqlite3.Cursor):
+    _sql = None
+    _elapsed = 0.0
+    _rows = 0
+
+    def _finish(self):
+        sql = self._sql
+        if sql is None:
+            return
+        self._sql = None
+        rows = self._rows if self.description is not None else max(self.rowcount, 0)
+        for observer in list(_query_observers):
+            try:
+                observer(sql, self._elapsed, rows, self.connection)
+            except Exception:
+                pass
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+    def _execute(self, method, *args):
+        if self.connection.cooperative:
+            return _busy_retry(method, *args)
+        return method(*args)
+
+    def execute(self, sql, parameters=()):
+        if not _query_observers:
+            return self._execute(super().execute, sql, parameters)
+        self._finish()
+        self._sql, self._elapsed, self._rows = sql, 0.0, 0
+        self._timed(self._execute, super().execute, sql, parameters)
+        if self.description is None:
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        if not _query_observers:
+            return self._execute(super().executemany, sql, seq_of_parameters)
+        self._finish()
+        self._sql, self._elapsed, self._rows = sql, 0.0, 0
+        self._timed(self._execute, super().executemany, sql, seq_of_parameters)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        if self._sql is None:
+            return super().fetchone()
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        if self._sql is None:
+            return super().fetchmany(self.arraysize if size is None else size)
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        if self._sql is None:
+            return super().fetchall()
+        rows = self._timed(super().fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        if self._sql is None:
+            return super().__next__()
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Cursores temporales (conn.execute(...).fetchone()) se reportan aquí
+        self._finish()
+
+
+class _ObservedConnection(sqlite3.Connection):
+    cooperative = False
+
+    # Connection.execute de sqlite3 crea un Cursor base sin pasar por
+    # cursor(), por eso los atajos se redefinen aquí.
+    def cursor(self, factory=_ObservedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        if self.cooperative:
+            return _busy_retry(super().commit)
+        return super().commit()
+
+    def __exit__(self, exc_type, exc, tb):
+        # El __exit__ de sqlite3 hace commit en C sin pasar por commit()
+        if not self.cooperative:
+            return super().__exit__(exc_type, exc, tb)
+        if exc_type is None:
+            try:
+                self.commit()
+            except BaseException:
+                self.rollback()
+                raise
+        else:
+            self.rollback()
+        return False
+
+
+def _connect(database, **kwargs):
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    cooperative = _cooperative()
+    conn = sqlite3.connect(
+        database, timeout=0 if cooperative else DB_BUSY_TIMEOUT, factory=_ObservedConnection, **kwargs
+    )
+    conn.cooperative = cooperative
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def get_conn():
+    return _connect(DB_PATH)
+
+
+# ── Roles de conexión ─────────────────────────────────────────────────────────
+# Con la base en WAL las lecturas no esperan a las escrituras, así que los GET
+# usan get_read_conn(): solo lectura por URI (mode=ro) y query_only, para que
+# un INSERT desde una ruta de lectura falle en vez de tomar el lock.
+#
+# Las escrituras pasan por write_conn(): una sola conexión de escritura por
+# proceso, de a una transacción a la vez y con BEGIN IMMEDIATE, así una
+# ráfaga de guardados hace fila aquí en lugar de competir por el lock de
+# SQLite. La fila es corta: con DB_WRITE_QUEUE escrituras ya esperando, o si
+# el turno no llega en DB_BUSY_TIMEOUT, se lanza WriteQueueFull.
+DB_WRITE_QUEUE = int(os.environ.get("DB_WRITE_QUEUE", "32"))
+
+
+class WriteQueueFull(sqlite3.OperationalError):
+    """La fila de escrituras del proceso está llena o no avanzó a tiempo."""
+
+
+_writer_lock = threading.Lock()
+_writer_state_lock = threading.Lock()
+_writer_waiting = 0
+_writer_conn = None
+_writer_local = threading.local()
+
+
+def _reset_writer_after_fork():
+    # La conexión heredada pertenece al padre: no se usa ni se cierra aquí
+    global _writer_lock, _writer_state_lock, _writer_waiting, _writer_conn, _writer_local
+    _writer_lock = threading.Lock()
+    _writer_state_lock = threading.Lock()
+    _writer_waiting = 0
+    _writer_conn = None
+    _writer_local = threading.local()
+
+
+os.register_at_fork(after_in_child=_reset_writer_after_fork)
+
+
+def get_read_conn():
+    conn = _connect(f"file:{quote(str(DB_PATH))}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def _acquire_writer():
+    global _writer_waiting
+    with _writer_state_lock:
+        if _writer_waiting >= DB_WRITE_QUEUE:
+            raise WriteQueueFull("Demasiadas escrituras en espera")
+        _writer_waiting += 1
+    try:
+        acquired = _writer_lock.acquire(timeout=DB_BUSY_TIMEOUT)
+    finally:
+        with _writer_state_lock:
+            _writer_waiting -= 1
+    if not acquired:
+        raise WriteQueueFull("La escritura no obtuvo turno a tiempo")
+
+
+@contextmanager
+def write_conn():
+    """
+    Transacción en la conexión de escritura del proceso: commit al salir,
+    rollback ante una excepción. Anidada en el mismo hilo reutiliza la
+    transacción de afuera.
+    """
+    global _writer_conn
+    if getattr(_writer_local, "conn", None) is not None:
+        yield _writer_local.conn
+        return
+    _acquire_writer()
+    try:
+        if _writer_conn is None:
+            _writer_conn = _connect(DB_PATH, check_same_thread=False)
+        conn = _writer_conn
+        _writer_local.conn = conn
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                yield conn
+        finally:
+            _writer_local.conn = None
+    finally:
+        _writer_lock.release()
+
+
+# Inserciones sueltas de endpoints públicos (/subscribe, /api/contact): en
+# lugar de una transacción por request, un hilo del proceso junta las que
+# llegan en WRITE_BATCH_WINDOW_MS (hasta WRITE_BATCH_MAX) y las escribe en
+# una sola transacción de write_conn(). Quien inserta espera el commit de su
+# lote antes de responder, así que un 201 sigue significando "ya está en la
+# base". WRITE_BATCH_ENABLED=0 vuelve a una transacción por inserción.
+# Si el lote no logra el lock, o el commit no llega en WRITE_BATCH_TIMEOUT
+# segundos, el insert falla con WriteQueueFull (503) en lugar de colgar el
+# request.
+WRITE_BATCH_ENABLED = os.environ.get("WRITE_BATCH_ENABLED", "1").strip().lower() in ("1", "true", "yes", "on")
+WRITE_BATCH_WINDOW_MS = float(os.environ.get("WRITE_BATCH_WINDOW_MS", "2"))
+WRITE_BATCH_MAX = int(os.environ.get("WRITE_BATCH_MAX", "200"))
+WRITE_BATCH_TIMEOUT = float(os.environ.get("WRITE_BATCH_TIMEOUT") or DB_BUSY_TIMEOUT * 2)
+
+_batch_observers = []
+
+
+def add_batch_observer(observer):
+    """observer(size, seconds) tras cada lote escrito."""
+    _batch_observers.append(observer)
+
+
+class _PendingInsert:
+    __slots__ = ("sql", "params", "done", "rowcount", "error", "abandoned")
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.done = threading.Event()
+        self.rowcount = 0
+        self.error = None
+        # Quien esperaba ya respondió 503: si el lote aún no empezó, se descarta
+        self.abandoned = False
+
+
+_batch_lock = threading.Lock()
+_batch_queue = None
+_batch_thread = None
+
+
+def _reset_batcher_after_fork():
+    # El hilo del padre no existe en el hijo; se arranca otro al primer insert
+    global _batch_lock, _batch_queue, _batch_thread
+    _batch_lock = threading.Lock()
+    _batch_queue = None
+    _batch_thread = None
+
+
+os.register_at_fork(after_in_child=_reset_batcher_after_fork)
+
+
+def _busy_error(exc):
+    """WriteQueueFull para errores de lock o de turno; None para el resto."""
+    if isinstance(exc, WriteQueueFull):
+        return exc
+    message = str(exc).lower()
+    if isinstance(exc, sqlite3.OperationalError) and ("locked" in message or "busy" in message):
+        return WriteQueueFull("La base está ocupada, intenta luego")
+    return None
+
+
+def _write_batch(batch):
+    batch = [item for item in batch if not item.abandoned]
+    if not batch:
+        return
+    start = time.perf_counter()
+    try:
+        with write_conn() as conn:
+            for item in batch:
+                item.rowcount = conn.execute(item.sql, item.params).rowcount
+    except sqlite3.IntegrityError as exc:
+        if len(batch) == 1:
+            batch[0].error = exc
+        else:
+            # Una fila que viola una restricción no debe tumbar a las demás:
+            # se reintentan de a una, salvo que la base deje de dar turno.
+            for i, item in enumerate(batch):
+                _write_batch([item])
+                if isinstance(item.error, WriteQueueFull):
+                    for rest in batch[i + 1:]:
+                        rest.error = item.error
+                    break
+    except Exception as exc:  # pylint: disable=broad-except
+        error = _busy_error(exc) or exc
+        for item in batch:
+            item.error = error
+    else:
+        for observer in _batch_observers:
+            try:
+                observer(len(batch), time.perf_counter() - start)
+            except Exception:  # pylint: disable=broad-except
+                logging.getLogger("db").exception("Fallo un observador de lotes de escritura")
+    finally:
+        for item in batch:
+            item.done.set()
+
+
+def _batch_loop(pending):
+    window = WRITE_BATCH_WINDOW_MS / 1000
+    while True:
+        batch = [pending.get()]
+        deadline = time.monotonic() + window
+        while len(batch) < WRITE_BATCH_MAX:
+            try:
+                remaining = deadline - time.monotonic()
+                batch.append(pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _write_batch(batch)
+        except Exception:  # pylint: disable=broad-except
+            # _write_batch ya marcó los pendientes; el hilo sigue atendiendo la cola
+            logging.getLogger("db").exception("Fallo un lote de escritura")
+
+
+def _batch_queue_for_process():
+    global _batch_queue, _batch_thread
+    with _batch_lock:
+        if _batch_queue is None:
+            _batch_queue = queue.Queue()
+        if _batch_thread is None or not _batch_thread.is_alive():
+            # Si el hilo murió, el nuevo retoma lo que quedó en la misma cola
+            _batch_thread = threading.Thread(target=_batch_loop, args=(_batch_queue,), name="db-write-batch", daemon=True)
+            _batch_thread.start()
+        return _batch_queue
+
+
+def batched_insert(sql, params):
+    """
+    Ejecuta un INSERT en el próximo lote y retorna su rowcount una vez hecho
+    el commit (0 si un INSERT OR IGNORE descartó la fila). Dentro de
+    write_conn() en el mismo hilo se ejecuta directo en esa transacción.
+    """
+    if not WRITE_BATCH_ENABLED or getattr(_writer_local, "conn", None) is not None:
+        with write_conn() as conn:
+            return conn.execute(sql, params).rowcount
+    item = _PendingInsert(sql, params)
+    _batch_queue_for_process().put(item)
+    if not item.done.wait(WRITE_BATCH_TIMEOUT):
+        item.abandoned = True
+        raise WriteQueueFull("La escritura no se confirmó a tiempo")
+    if item.error is not None:
+        raise item.error
+    return item.rowcount
+
+
+def read_version(name):
+    try:
+        return (VERSIONS_DIR / name).read_text(encoding="utf-8")
+    except OSError:
+        return ""
+
+
+def bump_version(name):
+    VERSIONS_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex}"
+    tmp_path = VERSIONS_DIR / f".{name}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    tmp_path.write_text(stamp, encoding="utf-8")
+    os.replace(tmp_path, VERSIONS_DIR / name)
+    return stamp
+
+
+# Formato canónico de timestamps: ISO en UTC, ancho fijo y con microsegundos
+# siempre presentes, para que el orden lexicográfico sea el cronológico y los
+# ORDER BY usen el índice sin envolver la columna en datetime(). Sin sufijo
+# "Z": el frontend lo agrega al parsear.
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def utc_timestamp(value=None):
+    """Timestamp canónico de un datetime naive en UTC (por defecto, ahora)."""
+    if value is None:
+        value = datetime.utcnow()
+    elif value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def _parse_timestamp(raw):
+    if not raw or not isinstance(raw, str):
+        return None
+    text = raw.strip()
+    if text.endswith(("Z", "z")):
+        text = text[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return None
+
+
+def normalize_timestamp(raw):
+    """
+    Lleva un timestamp guardado (con o sin microsegundos, con espacio o "T",
+    con "Z" u offset) al formato canónico. Devuelve el valor original si no se
+    puede interpretar.
+    """
+    parsed = _parse_timestamp(raw)
+    return utc_timestamp(parsed) if parsed else raw
+
+
 def init_db():
     conn = get_conn()
+    # WAL: los lectores no esperan al escritor (persistente en el archivo)
+    conn.execute("PRAGMA journal_mode=WAL")
     with conn:
         # ── Registro de migraciones ───────────────────────────────────────────
         # Cada migración de datos (no de esquema) se registra aquí para que
@@ -225,7 +709,7 @@ def init_db():
             "privacidad",
             "academia",
         ]
-        now = datetime.utcnow().isoformat()
+        now = utc_timestamp()
         for page in page_defaults:
             conn.execute(
                 "INSERT OR IGNORE INTO page_settings (page, enabled, updated_at) VALUES (?, 1, ?)",
@@ -238,7 +722,7 @@ def init_db():
             ("servicios",),
         ).fetchone()["c"]
         if services_hero == 0:
-            now = datetime.utcnow().isoformat()
+            now = utc_timestamp()
             conn.executemany(
                 """
                 INSERT INTO hero_slides (page, position, title, description, primary_label, primary_href, secondary_label, secondary_href, image_url, created_at, updated_at)
@@ -350,6 +834,10 @@ def init_db():
               category_id INTEGER,
               published_at TEXT,
               active INTEGER NOT NULL DEFAULT 1,
+              excerpt_text TEXT,
+              word_count INTEGER,
+              reading_minutes INTEGER,
+              first_image_url TEXT,
               created_at TEXT NOT NULL,
               updated_at TEXT NOT NULL,
               FOREIGN KEY (category_id) REFERENCES categories(id)
@@ -424,6 +912,46 @@ def init_db():
                 conn.execute(f"ALTER TABLE publications ADD COLUMN {col} TEXT")
             except Exception:
                 pass
+        # Campos derivados del contenido (ver publication_text_fields)
+        for col_def in [
+            ("excerpt_text",    "TEXT"),
+            ("word_count",      "INTEGER"),
+            ("reading_minutes", "INTEGER"),
+            ("first_image_url", "TEXT"),
+        ]:
+            try:
+                conn.execute(f"ALTER TABLE publications ADD COLUMN {col_def[0]} {col_def[1]}")
+            except Exception:
+                pass  # column already exists
+        # El cursor del listado compara (published_at, id): una fila con
+        # published_at NULL nunca cumpliría el predicado y se perdería después
+        # de la primera página. Las filas antiguas toman la fecha de created_at
+        # y los triggers impiden que vuelva a quedar vacío (SQLite no agrega
+        # NOT NULL a una columna existente sin reconstruir la tabla).
+        conn.execute(
+            "UPDATE publications SET published_at = COALESCE(substr(NULLIF(created_at, ''), 1, 10), date('now')) "
+            "WHERE published_at IS NULL OR published_at = ''"
+        )
+        for event in ("INSERT", "UPDATE"):
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_publications_published_at_{event.lower()}
+                BEFORE {event} ON publications
+                WHEN NEW.published_at IS NULL OR NEW.published_at = ''
+                BEGIN
+                  SELECT RAISE(ABORT, 'publications.published_at no puede ser NULL');
+                END
+                """
+            )
+        # Listado público: WHERE active = 1 ORDER BY published_at DESC, id DESC
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_publications_active_published "
+            "ON publications(active, published_at DESC)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_publications_category_published "
+            "ON publications(category_id, active, published_at DESC)"
+        )
         # Legacy DBs: add hierarchy + hero fields for kdbweb entries
         try:
             conn.execute("ALTER TABLE kdbweb_entries ADD COLUMN parent_slug TEXT")
@@ -523,7 +1051,7 @@ def init_db():
         if not _pos_done:
             conn.execute(
                 "INSERT INTO db_migrations (name, applied_at) VALUES (?, ?)",
-                (_pos_migration, datetime.utcnow().isoformat()),
+                (_pos_migration, utc_timestamp()),
             )
 
         # Migration: fix Constitución hero image — photo-1589829085413 turned
@@ -647,7 +1175,7 @@ def init_db():
             conn.execute("INSERT INTO categories (name) VALUES (?)", ("General",))
 
         pub_exists = conn.execute("SELECT COUNT(*) AS c FROM publications").fetchone()["c"]
-        now = datetime.utcnow().isoformat()
+        now = utc_timestamp()
         # Ensure some useful categories exist
         conn.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", ("General",))
         conn.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", ("Análisis",))
@@ -660,7 +1188,7 @@ def init_db():
                 "excerpt": "Presentamos nuevas soluciones en tributación para pymes.",
                 "content_html": "<p>Contenido de ejemplo sobre el lanzamiento de nuevos servicios.</p>",
                 "category": "General",
-                "published_at": now,
+                "published_at": now[:10],
             },
             {
                 "title": "Guía práctica de planeamiento tributario 2026",
@@ -668,7 +1196,7 @@ def init_db():
                 "excerpt": "Puntos clave y checklist para optimizar la carga fiscal.",
                 "content_html": "<p>Un resumen con pasos prácticos para equipos financieros.</p>",
                 "category": "Análisis",
-                "published_at": now,
+                "published_at": now[:10],
             },
             {
                 "title": "Cómo preparar tu empresa para una fiscalización",
@@ -676,7 +1204,7 @@ def init_db():
                 "excerpt": "Recomendaciones y documentación esencial antes de una fiscalización.",
                 "content_html": "<p>Consejos prácticos y listados de control para estar listos ante auditorías.</p>",
                 "category": "General",
-                "published_at": now,
+                "published_at": now[:10],
             },
             {
                 "title": "Evento: Seminario sobre compliance 2026",
@@ -684,7 +1212,7 @@ def init_db():
                 "excerpt": "Regístrate en nuestro seminario enfocado en compliance y gobernanza.",
                 "content_html": "<p>Detalles del evento, agenda y ponentes.</p>",
                 "category": "Eventos",
-                "published_at": now,
+                "published_at": now[:10],
             },
             {
                 "title": "Caso de estudio: optimización fiscal",
@@ -692,7 +1220,7 @@ def init_db():
                 "excerpt": "Cómo un cliente redujo riesgo y mejoró su planificación tributaria.",
                 "content_html": "<p>Descripción del problema, solución y resultados cuantificables.</p>",
                 "category": "Análisis",
-                "published_at": now,
+                "published_at": now[:10],
             },
         ]
 
@@ -703,9 +1231,16 @@ def init_db():
                 # resolve category id
                 cat_row = conn.execute("SELECT id FROM categories WHERE name = ?", (p["category"],)).fetchone()
                 cat_id = cat_row["id"] if cat_row else None
+                derived = publication_text_fields(p["content_html"], fallback=p["excerpt"])
                 conn.execute(
-                    "INSERT INTO publications (title, slug, excerpt, content_html, category_id, published_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                    (p["title"], p["slug"], p["excerpt"], p["content_html"], cat_id, p["published_at"], now, now),
+                    "INSERT INTO publications (title, slug, excerpt, content_html, category_id, published_at, "
+                    "excerpt_text, word_count, reading_minutes, first_image_url, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        p["title"], p["slug"], p["excerpt"], p["content_html"], cat_id, p["published_at"],
+                        derived["excerpt_text"], derived["word_count"], derived["reading_minutes"],
+                        derived["first_image_url"], now, now,
+                    ),
                 )
 
         # Ensure existing publications have a category (default to 'General')
@@ -716,7 +1251,7 @@ def init_db():
 
         # Seed KDBWEB entries (insert missing defaults without overriding existing)
         kdbweb_exists = conn.execute("SELECT COUNT(*) AS c FROM kdbweb_entries").fetchone()["c"]
-        now = datetime.utcnow().isoformat()
+        now = utc_timestamp()
         entries = [
             (
                 0,
@@ -1017,6 +1552,35 @@ def init_db():
             )
             """
         )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_admin_sessions_expires ON admin_sessions(expires_at)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_admin_sessions_admin ON admin_sessions(admin_id)"
+        )
+        # Migración: los tokens de sesión se guardan como SHA-256 (hex). Las
+        # sesiones vigentes siguen funcionando porque el cliente conserva el
+        # token en claro y el backend compara contra su hash.
+        _token_migration = "admin_sessions_token_sha256_v1"
+        _token_done = conn.execute(
+            "SELECT 1 FROM db_migrations WHERE name = ?", (_token_migration,)
+        ).fetchone()
+        if not _token_done:
+            conn.execute(
+                "DELETE FROM admin_sessions WHERE expires_at <= ?",
+                (utc_timestamp(),),
+            )
+            conn.executemany(
+                "UPDATE admin_sessions SET token = ? WHERE id = ?",
+                [
+                    (hashlib.sha256(row["token"].encode("utf-8")).hexdigest(), row["id"])
+                    for row in conn.execute("SELECT id, token FROM admin_sessions").fetchall()
+                ],
+            )
+            conn.execute(
+                "INSERT INTO db_migrations (name, applied_at) VALUES (?, ?)",
+                (_token_migration, utc_timestamp()),
+            )
 
         # ── Billing fields migration for orders ───────────────────────────────
         for col_def in [
@@ -1038,6 +1602,45 @@ def init_db():
             except Exception:
                 pass  # column already exists
 
+        # Índices para el listado paginado de órdenes (keyset sobre created_at;
+        # el rowid ya va implícito al final de cada índice).
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders(status, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_course_created ON orders(course_id, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_payment_created ON orders(payment_method, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_email_created ON orders(student_email, created_at)")
+
+        # ── Resumen materializado de alumnos ──────────────────────────────────
+        # Una fila por student_email, mantenida por models.py al crear o
+        # actualizar órdenes. Evita el GROUP BY sobre todas las órdenes.
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS student_stats (
+              student_email TEXT PRIMARY KEY,
+              student_name TEXT,
+              moodle_user_email TEXT,
+              total_orders INTEGER NOT NULL DEFAULT 0,
+              paid_orders INTEGER NOT NULL DEFAULT 0,
+              total_paid REAL NOT NULL DEFAULT 0,
+              enrolled_count INTEGER NOT NULL DEFAULT 0,
+              last_order_at TEXT
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_student_stats_last_order ON student_stats(last_order_at, student_email)"
+        )
+        _stats_migration = "student_stats_backfill_v1"
+        _stats_done = conn.execute(
+            "SELECT 1 FROM db_migrations WHERE name = ?", (_stats_migration,)
+        ).fetchone()
+        if not _stats_done:
+            rebuild_student_stats(conn)
+            conn.execute(
+                "INSERT INTO db_migrations (name, applied_at) VALUES (?, ?)",
+                (_stats_migration, utc_timestamp()),
+            )
+
         # ── Payment config ────────────────────────────────────────────────────
         conn.execute(
             """
@@ -1063,24 +1666,262 @@ def init_db():
             except Exception:
                 pass  # column already exists
 
-        # Bootstrap admin user if none exist and env vars are provided
-        admin_count = conn.execute("SELECT COUNT(*) AS c FROM admin_users").fetchone()["c"]
-        admin_user = (os.environ.get("ADMIN_USER") or "").strip()
-        admin_pass = (os.environ.get("ADMIN_PASSWORD") or "").strip()
-        if admin_count == 0 and admin_user and admin_pass:
-            now = datetime.utcnow().isoformat()
+        # Migración: timestamps al formato canónico de ancho fijo (ver
+        # TIMESTAMP_FORMAT). Cubre toda columna *_at; published_at es una fecha
+        # y queda como YYYY-MM-DD.
+        _ts_migration = "timestamps_fixed_width_v1"
+        _ts_done = conn.execute(
+            "SELECT 1 FROM db_migrations WHERE name = ?", (_ts_migration,)
+        ).fetchone()
+        if not _ts_done:
+            normalize_timestamps(conn)
+            rebuild_student_stats(conn)
             conn.execute(
-                """
-                INSERT INTO admin_users (username, password_hash, role, active, created_at, updated_at)
-                VALUES (?, ?, 'super', 1, ?, ?)
-                """,
-                (admin_user, generate_password_hash(admin_pass), now, now),
+                "INSERT INTO db_migrations (name, applied_at) VALUES (?, ?)",
+                (_ts_migration, utc_timestamp()),
             )
+
+        # ── Índices secundarios ───────────────────────────────────────────────
+        # Búsquedas frecuentes que antes recorrían la tabla completa. Los de
+        # orders (student_email, status, created_at) ya están arriba, y
+        # publications.category_id lo cubre idx_publications_category_published.
+        # Para revisar los planes: python query_advisor.py
+        for index_sql in [
+            "CREATE INDEX IF NOT EXISTS idx_course_modules_course ON course_modules(course_id, position)",
+            "CREATE INDEX IF NOT EXISTS idx_course_lessons_module ON course_lessons(module_id, position)",
+            "CREATE INDEX IF NOT EXISTS idx_kdbweb_parent ON kdbweb_entries(parent_slug, position)",
+            "CREATE INDEX IF NOT EXISTS idx_kdbweb_position ON kdbweb_entries(position)",
+            "CREATE INDEX IF NOT EXISTS idx_katweb_year_position ON katweb_boletines(year DESC, position)",
+            "CREATE INDEX IF NOT EXISTS idx_contact_messages_created ON contact_messages(created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_subscriptions_created ON subscriptions(created_at)",
+        ]:
+            conn.execute(index_sql)
+
+        _pub_text_migration = "publications_text_fields_v1"
+        _pub_text_done = conn.execute(
+            "SELECT 1 FROM db_migrations WHERE name = ?", (_pub_text_migration,)
+        ).fetchone()
+        if not _pub_text_done:
+            backfill_publication_text_fields(conn)
+            conn.execute(
+                "INSERT INTO db_migrations (name, applied_at) VALUES (?, ?)",
+                (_pub_text_migration, utc_timestamp()),
+            )
+
+        _bootstrap_admin(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     conn.close()
 
 
+def _admin_env():
+    return (os.environ.get("ADMIN_USER") or "").strip(), (os.environ.get("ADMIN_PASSWORD") or "").strip()
+
+
+def _bootstrap_admin(conn):
+    """Crea el primer admin (rol super) desde ADMIN_USER/ADMIN_PASSWORD si aún no hay ninguno."""
+    admin_user, admin_pass = _admin_env()
+    if not admin_user or not admin_pass:
+        return
+    if conn.execute("SELECT COUNT(*) AS c FROM admin_users").fetchone()["c"]:
+        return
+    now = utc_timestamp()
+    conn.execute(
+        """
+        INSERT INTO admin_users (username, password_hash, role, active, created_at, updated_at)
+        VALUES (?, ?, 'super', 1, ?, ?)
+        """,
+        (admin_user, generate_password_hash(admin_pass), now, now),
+    )
+
+
+# MAX(created_at) es el único min/max del SELECT, así que SQLite toma
+# student_name y moodle_user_email de la orden más reciente de cada alumno.
+STUDENT_STATS_SELECT = """
+    SELECT
+        student_email,
+        student_name,
+        moodle_user_email,
+        COUNT(id)                                        AS total_orders,
+        SUM(CASE WHEN status='paid' THEN 1 ELSE 0 END)      AS paid_orders,
+        SUM(CASE WHEN status='paid' THEN amount ELSE 0 END) AS total_paid,
+        SUM(CASE WHEN moodle_enrolled=1 THEN 1 ELSE 0 END)  AS enrolled_count,
+        MAX(created_at)                                  AS last_order_at
+    FROM orders
+"""
+
+
+def rebuild_student_stats(conn=None):
+    """
+    Reconstruye student_stats desde cero a partir de orders (backfills).
+    Uso: python -c "from db import rebuild_student_stats; rebuild_student_stats()"
+    """
+    if conn is not None:
+        conn.execute("DELETE FROM student_stats")
+        conn.execute(
+            "INSERT INTO student_stats (student_email, student_name, moodle_user_email, total_orders, "
+            "paid_orders, total_paid, enrolled_count, last_order_at) "
+            + STUDENT_STATS_SELECT
+            + " GROUP BY student_email"
+        )
+        return conn.execute("SELECT COUNT(*) AS c FROM student_stats").fetchone()["c"]
+    conn = get_conn()
+    with conn:
+        count = rebuild_student_stats(conn)
+    conn.close()
+    return count
+
+
+def normalize_timestamps(conn):
+    """Reescribe en formato canónico todas las columnas *_at de todas las tablas."""
+    tables = [
+        row["name"]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+    ]
+    changed = 0
+    for table in tables:
+        for col in conn.execute(f"PRAGMA table_info({table})").fetchall():
+            name = col["name"]
+            if not name.endswith("_at"):
+                continue
+            rows = conn.execute(
+                f"SELECT rowid AS rid, {name} AS value FROM {table} WHERE {name} IS NOT NULL AND {name} != ''"
+            ).fetchall()
+            for row in rows:
+                parsed = _parse_timestamp(row["value"])
+                if parsed is None:
+                    continue
+                if name == "published_at":
+                    fixed = parsed.date().isoformat()
+                else:
+                    fixed = utc_timestamp(parsed)
+                if fixed != row["value"]:
+                    conn.execute(f"UPDATE {table} SET {name} = ? WHERE rowid = ?", (fixed, row["rid"]))
+                    changed += 1
+    return changed
+
+
+PUBLICATION_EXCERPT_CHARS = 280
+PUBLICATION_WORDS_PER_MINUTE = 200
+
+# Etiquetas que separan bloques de texto: se inserta un espacio al cerrarlas
+# para que "<p>a</p><p>b</p>" quede como "a b" y no "ab".
+_BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+    "blockquote", "hr", "table", "tr", "th", "td",
+}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.first_image = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "img" and self.first_image is None:
+            src = (dict(attrs).get("src") or "").strip()
+            if src:
+                self.first_image = src
+        if tag in _BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in _BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def publication_text_fields(content_html, fallback=""):
+    """
+    Deriva del HTML ya sanitizado los campos livianos que usan los listados y
+    la búsqueda: excerpt_text, word_count, reading_minutes y first_image_url.
+    """
+    parser = _TextExtractor()
+    try:
+        parser.feed(content_html or "")
+        parser.close()
+    except Exception:
+        pass
+    text = " ".join("".join(parser.parts).split())
+    if not text:
+        text = " ".join((fallback or "").split())
+    words = len(text.split())
+    excerpt = text
+    if len(excerpt) > PUBLICATION_EXCERPT_CHARS:
+        cut = excerpt[:PUBLICATION_EXCERPT_CHARS]
+        if " " in cut:
+            cut = cut.rsplit(" ", 1)[0]
+        excerpt = cut.rstrip(" ,.;:") + "..."
+    return {
+        "excerpt_text": excerpt,
+        "word_count": words,
+        "reading_minutes": max(1, -(-words // PUBLICATION_WORDS_PER_MINUTE)) if words else 0,
+        "first_image_url": parser.first_image,
+    }
+
+
+def backfill_publication_text_fields(conn=None):
+    """
+    Recalcula los campos derivados de todas las publicaciones.
+    Uso: python -c "from db import backfill_publication_text_fields; backfill_publication_text_fields()"
+    """
+    if conn is not None:
+        rows = conn.execute("SELECT id, content_html, excerpt FROM publications").fetchall()
+        for row in rows:
+            derived = publication_text_fields(row["content_html"], fallback=row["excerpt"])
+            conn.execute(
+                "UPDATE publications SET excerpt_text = ?, word_count = ?, reading_minutes = ?, "
+                "first_image_url = ? WHERE id = ?",
+                (
+                    derived["excerpt_text"],
+                    derived["word_count"],
+                    derived["reading_minutes"],
+                    derived["first_image_url"],
+                    row["id"],
+                ),
+            )
+        return len(rows)
+    conn = get_conn()
+    with conn:
+        count = backfill_publication_text_fields(conn)
+    conn.close()
+    return count
+
+
+def _schema_is_current():
+    if not DB_PATH.exists():
+        return False
+    conn = get_conn()
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    finally:
+        conn.close()
+
+
+def _ensure_admin():
+    # Con el esquema al día init_db no corre: el bootstrap del admin se revisa
+    # aparte con un COUNT de lectura, y solo toma el lock si la tabla está vacía.
+    if not all(_admin_env()):
+        return
+    conn = get_read_conn()
+    try:
+        if conn.execute("SELECT COUNT(*) AS c FROM admin_users").fetchone()["c"]:
+            return
+    finally:
+        conn.close()
+    with write_conn() as conn:
+        _bootstrap_admin(conn)
+
+
 def ensure_db():
     global _db_initialized
     if not _db_initialized:
-        init_db()
+        if not _schema_is_current():
+            init_db()
+        else:
+            _ensure_admin()
         _db_initialized = True
@@ -0,0 +1,69 @@
+"""
+Proveedor JSON de Flask: usa orjson si está instalado y cae a la librería
+estándar si no. Además permite incrustar JSON ya serializado (RawJSON) sin
+volver a parsearlo ni escaparlo como string, p. ej. el meta_json de KDBWEB.
+"""
+
+import json
+import uuid
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+
+class RawJSON:
+    """Texto JSON ya validado que se emite tal cual dentro de la respuesta."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return f"RawJSON({self.text[:40]!r})"
+
+
+class AppJSONProvider(DefaultJSONProvider):
+    # Claves ordenadas como el proveedor por defecto (cuerpos estables para
+    # ETag), pero en UTF-8 directo: ensure_ascii solo agranda el contenido en
+    # español y obligaría a re-escapar la salida de orjson.
+    ensure_ascii = False
+    backend = "orjson" if orjson is not None else "json"
+
+    def dumps(self, obj, **kwargs):
+        raw_parts = {}
+        nonce = uuid.uuid4().hex
+        base_default = kwargs.pop("default", self.default)
+
+        def default(value):
+            if isinstance(value, RawJSON):
+                token = f"__rawjson_{nonce}_{len(raw_parts)}__"
+                raw_parts[token] = value.text
+                return token
+            return base_default(value)
+
+        use_orjson = orjson is not None and not kwargs.get("cls") and not kwargs.get("ensure_ascii")
+        if use_orjson:
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            if kwargs.get("sort_keys", self.sort_keys):
+                option |= orjson.OPT_SORT_KEYS
+            if kwargs.get("indent") is not None:
+                option |= orjson.OPT_INDENT_2
+            text = orjson.dumps(obj, default=default, option=option).decode("utf-8")
+        else:
+            kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+            kwargs.setdefault("sort_keys", self.sort_keys)
+            text = json.dumps(obj, default=default, **kwargs)
+
+        for token, raw in raw_parts.items():
+            text = text.replace(f'"{token}"', raw, 1)
+        return text
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
@@ -0,0 +1,325 @@
+"""
+Métricas por request (latencia por ruta, status, consultas y tiempo de DB,
+bytes de respuesta, aciertos de cachés) en formato de texto de Prometheus.
+
+Cada worker acumula en memoria y vuelca su registro a un JSON propio dentro de
+METRICS_DIR (junto a la base de datos por defecto) como máximo cada
+METRICS_FLUSH_SECONDS; /metrics suma los archivos de todos los workers.
+Cuando un worker termina (child_exit en deploy/gunicorn.conf.py) su archivo
+se suma a worker-exited.json y se borra: los contadores no bajan al reciclar
+workers y el directorio no crece con cada pid. on_starting llama a reset_dir
+para empezar de cero en cada arranque de gunicorn.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from db import DB_PATH, add_batch_observer, add_query_observer
+
+METRICS_ENABLED = (os.environ.get("METRICS_ENABLED") or "1").lower() in ("1", "true", "yes", "on")
+METRICS_DIR = Path(os.environ.get("METRICS_DIR") or DB_PATH.parent / f".{DB_PATH.name}.metrics")
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+HELP = {
+    "http_requests_total": ("counter", "Requests por método, ruta y status"),
+    "http_request_duration_seconds": ("histogram", "Latencia por ruta"),
+    "http_request_db_queries": ("histogram", "Consultas SQL por request"),
+    "http_request_db_seconds_total": ("counter", "Tiempo en SQLite por ruta"),
+    "http_response_bytes_total": ("counter", "Bytes de respuesta enviados por ruta"),
+    "db_queries_total": ("counter", "Consultas SQL ejecutadas (incluye hilos en segundo plano)"),
+    "db_query_seconds_total": ("counter", "Tiempo total en SQLite"),
+    "cache_requests_total": ("counter", "Consultas a cachés en memoria por resultado"),
+    "db_write_batch_size": ("histogram", "Inserciones por lote de escritura agrupada"),
+    "db_write_batch_seconds": ("histogram", "Duración de cada lote, commit incluido"),
+}
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_local = threading.local()
+_counters = {}
+_histograms = {}
+_last_flush = 0.0
+
+
+def _reset_after_fork():
+    # Con preload_app el master importa la app (y cuenta las consultas de
+    # ensure_db) antes de hacer fork: cada worker empieza con lo suyo.
+    global _lock, _flush_lock, _last_flush
+    _lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _counters.clear()
+    _histograms.clear()
+    _last_flush = 0.0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _labels(**labels):
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def inc(name, value=1, **labels):
+    key = f"{name}\t{_labels(**labels)}"
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    key = f"{name}\t{_labels(**labels)}"
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = {"le": list(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(series["le"]):
+            if value <= bound:
+                series["counts"][i] += 1
+                break
+        series["sum"] += value
+        series["count"] += 1
+
+
+def cache_result(cache, hit):
+    inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def _on_query(sql, seconds, rows, conn):
+    inc("db_queries_total")
+    inc("db_query_seconds_total", seconds)
+    req = getattr(_local, "request", None)
+    if req is not None:
+        req["queries"] += 1
+        req["db_seconds"] += seconds
+
+
+def _on_batch(size, seconds):
+    observe("db_write_batch_size", size, buckets=BATCH_SIZE_BUCKETS)
+    observe("db_write_batch_seconds", seconds)
+
+
+def start_request():
+    _local.request = {"start": time.perf_counter(), "queries": 0, "db_seconds": 0.0}
+
+
+def finish_request(method, route, status, response_bytes):
+    """Registra el request en curso y retorna su resumen (o None si no hay)."""
+    req = getattr(_local, "request", None)
+    if req is None:
+        return None
+    _local.request = None
+    elapsed = time.perf_counter() - req["start"]
+    inc("http_requests_total", method=method, route=route, status=status)
+    observe("http_request_duration_seconds", elapsed, route=route)
+    observe("http_request_db_queries", req["queries"], buckets=QUERY_COUNT_BUCKETS, route=route)
+    inc("http_request_db_seconds_total", req["db_seconds"], route=route)
+    if response_bytes:
+        inc("http_response_bytes_total", response_bytes, route=route)
+    maybe_flush()
+    return {"seconds": elapsed, "queries": req["queries"], "db_seconds": req["db_seconds"]}
+
+
+def snapshot():
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "histograms": {k: {**v, "counts": list(v["counts"])} for k, v in _histograms.items()},
+        }
+
+
+def flush():
+    global _last_flush
+    with _flush_lock:
+        data = snapshot()
+        METRICS_DIR.mkdir(parents=True, exist_ok=True)
+        target = METRICS_DIR / f"worker-{os.getpid()}.json"
+        tmp = METRICS_DIR / f".worker-{os.getpid()}.tmp"
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp, target)
+        _last_flush = time.monotonic()
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush < METRICS_FLUSH_SECONDS:
+        return
+    try:
+        flush()
+    except OSError:
+        pass
+
+
+@contextlib.contextmanager
+def dir_lock(exclusive=False):
+    """
+    flock sobre METRICS_DIR/.lock: quien suma los archivos toma el lock
+    compartido y fold_exited el exclusivo, así nadie cuenta dos veces (ni
+    pierde) el registro de un worker mientras se pliega.
+    """
+    METRICS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(METRICS_DIR / ".lock", "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def fold_exited(source, exited, combine):
+    """
+    Suma el archivo source de un worker que terminó en exited y lo borra.
+    combine(acumulado, datos) retorna el nuevo acumulado (acumulado es None
+    la primera vez).
+    """
+    source = METRICS_DIR / source
+    target = METRICS_DIR / exited
+    with dir_lock(exclusive=True):
+        try:
+            data = json.loads(source.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            data = None
+        if data is not None:
+            try:
+                acc = json.loads(target.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                acc = None
+            tmp = METRICS_DIR / f".{exited}.tmp"
+            tmp.write_text(json.dumps(combine(acc, data)), encoding="utf-8")
+            os.replace(tmp, target)
+        source.unlink(missing_ok=True)
+
+
+def _combine(acc, data):
+    acc = acc or {"counters": {}, "histograms": {}}
+    _add_into(acc["counters"], acc["histograms"], data)
+    return acc
+
+
+def worker_exited(pid):
+    """Pliega el registro del worker pid en worker-exited.json (master de gunicorn)."""
+    fold_exited(f"worker-{pid}.json", "worker-exited.json", _combine)
+    (METRICS_DIR / f".worker-{pid}.tmp").unlink(missing_ok=True)
+
+
+def reset_dir():
+    """Borra los registros de workers anteriores (arranque del master)."""
+    if METRICS_DIR.is_dir():
+        for path in METRICS_DIR.glob("*.json"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def _add_into(counters, histograms, data):
+    for key, value in data.get("counters", {}).items():
+        counters[key] = counters.get(key, 0) + value
+    for key, series in data.get("histograms", {}).items():
+        merged = histograms.get(key)
+        if merged is None or merged["le"] != series["le"]:
+            histograms[key] = {**series, "counts": list(series["counts"])}
+            continue
+        merged["counts"] = [a + b for a, b in zip(merged["counts"], series["counts"])]
+        merged["sum"] += series["sum"]
+        merged["count"] += series["count"]
+
+
+def _merge():
+    counters = {}
+    histograms = {}
+    with dir_lock():
+        for path in sorted(METRICS_DIR.glob("worker-*.json")):
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            _add_into(counters, histograms, data)
+    return counters, histograms
+
+
+def _series(name, labels, extra=""):
+    inner = ",".join(part for part in (labels, extra) if part)
+    return f"{name}{{{inner}}}" if inner else name
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Texto de exposición de Prometheus con los registros de todos los workers."""
+    flush()
+    counters, histograms = _merge()
+    by_name = {}
+    for key, value in counters.items():
+        name, labels = key.split("\t", 1)
+        by_name.setdefault(name, []).append((labels, value))
+    for key, series in histograms.items():
+        name, labels = key.split("\t", 1)
+        by_name.setdefault(name, []).append((labels, series))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+            if kind != "histogram":
+                lines.append(f"{_series(name, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(value["le"], value["counts"]):
+                cumulative += count
+                lines.append(f"{_series(name + '_bucket', labels, _labels(le=bound))} {cumulative}")
+            lines.append(f"{_series(name + '_bucket', labels, _labels(le='+Inf'))} {value['count']}")
+            lines.append(f"{_series(name + '_sum', labels)} {_number(value['sum'])}")
+            lines.append(f"{_series(name + '_count', labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def init_metrics(app, log_requests=False):
+    """
+    Registra los hooks de request y el observador de consultas. Debe llamarse
+    antes que init_compression para medir los bytes ya comprimidos.
+    """
+    if not METRICS_ENABLED:
+        return
+    from flask import request
+
+    add_query_observer(_on_query)
+    add_batch_observer(_on_batch)
+
+    @app.before_request
+    def _metrics_start():
+        start_request()
+
+    @app.after_request
+    def _metrics_finish(response):
+        rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        size = 0 if response.is_streamed else (response.content_length or 0)
+        summary = finish_request(request.method, rule, response.status_code, size)
+        if log_requests and summary is not None:
+            app.logger.info(
+                "%s %s %s %.1fms db=%d/%.1fms %dB",
+                request.method,
+                request.path,
+                response.status_code,
+                summary["seconds"] * 1000,
+                summary["queries"],
+                summary["db_seconds"] * 1000,
+                size,
+            )
+        return response
@@ -1,14 +1,27 @@
+import base64
+import hashlib
 import json
+import os
 import secrets
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
 from flask import current_app
 
-from db import get_conn
+from db import (
+    STUDENT_STATS_SELECT,
+    batched_insert,
+    bump_version,
+    get_read_conn,
+    publication_text_fields,
+    read_version,
+    utc_timestamp,
+    write_conn,
+)
+import metrics
 
-# sanitize/normalize HTML content stored by admin editors
-import bleach
-from bleach.css_sanitizer import CSSSanitizer
 import html as _html
 from werkzeug.security import check_password_hash, generate_password_hash
 ALLOWED_TAGS = [
@@ -69,34 +82,50 @@ ALLOWED_ATTRIBUTES = {
     "td": ["class", "style", "colspan", "rowspan", "colwidth", "data-colwidth", "width"],
 }
 # Allow safe sizing and alignment styles so texto e imagenes se centren si el editor los aplica
-IMG_CSS_SANITIZER = CSSSanitizer(
-    allowed_css_properties=[
-        "font-size",
-        "width",
-        "height",
-        "max-width",
-        "text-align",
-        "margin",
-        "margin-left",
-        "margin-right",
-        "margin-top",
-        "margin-bottom",
-        "float",
-        "display",
-        "color",
-        "background-color",
-        "text-decoration",
-        "text-decoration-color",
-        "text-decoration-line",
-        "text-decoration-thickness",
-        "line-height",
-        "font-weight",
-        "border",
-        "border-collapse",
-        "padding",
-        "vertical-align",
-    ]
-)
+IMG_CSS_PROPERTIES = [
+    "font-size",
+    "width",
+    "height",
+    "max-width",
+    "text-align",
+    "margin",
+    "margin-left",
+    "margin-right",
+    "margin-top",
+    "margin-bottom",
+    "float",
+    "display",
+    "color",
+    "background-color",
+    "text-decoration",
+    "text-decoration-color",
+    "text-decoration-line",
+    "text-decoration-thickness",
+    "line-height",
+    "font-weight",
+    "border",
+    "border-collapse",
+    "padding",
+    "vertical-align",
+]
+
+# sanitize/normalize HTML content stored by admin editors.
+# bleach (y tinycss2) se cargan en el primer guardado: ningún GET los usa y
+# son de lo más caro de importar al arrancar un worker.
+bleach = None
+IMG_CSS_SANITIZER = None
+
+
+def _load_bleach():
+    global bleach, IMG_CSS_SANITIZER
+    if bleach is not None:
+        return
+    import bleach as _bleach
+    from bleach.css_sanitizer import CSSSanitizer
+
+    IMG_CSS_SANITIZER = CSSSanitizer(allowed_css_properties=IMG_CSS_PROPERTIES)
+    bleach = _bleach
+
 
 TITLE_ALLOWED_TAGS = ["b", "strong", "i", "em", "u", "br", "span"]
 TITLE_ALLOWED_ATTRIBUTES = {
@@ -104,16 +133,123 @@ TITLE_ALLOWED_ATTRIBUTES = {
 }
 
 
+# ── Transacciones ─────────────────────────────────────────────────────────────
+# Las lecturas usan get_read_conn() y las escrituras write_conn() (ver db.py).
+# Las funciones de guardado aceptan conn=None: sin conexión abren su propia
+# transacción de escritura y confirman al terminar; con una conexión de
+# unit_of_work() escriben dentro de esa transacción y el commit queda a cargo
+# de quien la abrió.
+#
+# El sello "content" cubre lo que arma get_page_data(): las secciones de cada
+# página y, para publicaciones, el listado. Toda escritura sobre esas tablas lo
+# sube al confirmar, y cada worker recarga su copia de la página al verlo
+# cambiar.
+
+_CONTENT_VERSION = "content"
+
+
+@contextmanager
+def _transaction(conn=None):
+    if conn is not None:
+        yield conn
+        return
+    with unit_of_work(_CONTENT_VERSION) as conn:
+        yield conn
+
+
+@contextmanager
+def unit_of_work(*versions):
+    """
+    Una conexión y una transacción para varias escrituras. Si todo sale bien
+    hace commit y luego sube los sellos de versión indicados; ante una
+    excepción hace rollback y no toca los sellos.
+    """
+    with write_conn() as conn:
+        yield conn
+    for name in versions:
+        bump_version(name)
+
+
+# ── Escrituras masivas ────────────────────────────────────────────────────────
+# Las listas ordenadas (slides, equipo, servicios, boletines, módulos y
+# lecciones) se guardan comparando contra lo que ya está en la tabla, clave por
+# clave: solo se tocan las filas nuevas, cambiadas o sobrantes, y cada grupo va
+# en un único executemany.
+
+def _sync_rows(conn, table, key_cols, columns, rows, existing, now=None):
+    """
+    Aplica en `table` la diferencia entre `existing` y `rows`, ambos
+    {tupla_clave: tupla_valores} con valores en el orden de `columns`.
+    Con `now`, las filas insertadas reciben created_at/updated_at y las
+    actualizadas updated_at. Retorna el conteo por tipo de operación.
+    """
+    key_where = " AND ".join(f"{k} = ?" for k in key_cols)
+    deletes = [key for key in existing if key not in rows]
+    updates = [
+        values + key
+        for key, values in rows.items()
+        if key in existing and tuple(existing[key]) != tuple(values)
+    ]
+    inserts = [key + values for key, values in rows.items() if key not in existing]
+
+    if deletes:
+        conn.executemany(f"DELETE FROM {table} WHERE {key_where}", deletes)
+    if updates:
+        set_cols = [f"{c} = ?" for c in columns]
+        if now:
+            set_cols.append("updated_at = ?")
+            updates = [row[: len(columns)] + (now,) + row[len(columns):] for row in updates]
+        conn.executemany(f"UPDATE {table} SET {', '.join(set_cols)} WHERE {key_where}", updates)
+    if inserts:
+        insert_cols = list(key_cols) + list(columns)
+        if now:
+            insert_cols += ["created_at", "updated_at"]
+            inserts = [row + (now, now) for row in inserts]
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(insert_cols)}) VALUES ({', '.join('?' for _ in insert_cols)})",
+            inserts,
+        )
+    return {
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "deleted": len(deletes),
+        "unchanged": len(rows) - len(inserts) - len(updates),
+    }
+
+
+def _replace_positioned(conn, table, scope, columns, items, now=None, diff=True):
+    """
+    Reemplaza la lista ordenada de `table` que cumple `scope` (p. ej.
+    {"page": "home"}) por `items` (tuplas en el orden de `columns`); la
+    posición es el índice en la lista. Con diff=False borra todo y reinserta.
+    """
+    scope_cols = list(scope)
+    scope_vals = tuple(scope[c] for c in scope_cols)
+    where = " AND ".join(f"{c} = ?" for c in scope_cols) or "1 = 1"
+    existing = {}
+    if diff:
+        current = conn.execute(
+            f"SELECT position, {', '.join(columns)} FROM {table} WHERE {where}", scope_vals
+        ).fetchall()
+        existing = {scope_vals + (row["position"],): tuple(row[c] for c in columns) for row in current}
+        # Posiciones repetidas (datos viejos): no hay clave confiable, se reescribe.
+        diff = len(existing) == len(current)
+    if not diff:
+        conn.execute(f"DELETE FROM {table} WHERE {where}", scope_vals)
+        existing = {}
+    rows = {scope_vals + (pos,): tuple(values) for pos, values in enumerate(items)}
+    return _sync_rows(conn, table, scope_cols + ["position"], columns, rows, existing, now=now)
+
+
 def fetch_company():
-    conn = get_conn()
+    conn = get_read_conn()
     row = conn.execute("SELECT * FROM company_info WHERE id = 1").fetchone()
     conn.close()
     return dict(row) if row else {}
 
 
 def save_company(payload):
-    conn = get_conn()
-    with conn:
+    with write_conn() as conn:
         conn.execute(
             """
             INSERT INTO company_info (id, name, tagline, phone, email, address, logo_url, favicon_url, linkedin, facebook, instagram)
@@ -143,21 +279,18 @@ def save_company(payload):
                 payload.get("instagram"),
             ),
         )
-    conn.close()
 
 
 def set_brochure_url(url):
-    conn = get_conn()
-    with conn:
+    with write_conn() as conn:
         conn.execute(
             "UPDATE company_info SET brochure_url = ? WHERE id = 1",
             (url or None,),
         )
-    conn.close()
 
 
 def fetch_hero(page):
-    conn = get_conn()
+    conn = get_read_conn()
     rows = conn.execute(
         "SELECT * FROM hero_slides WHERE page = ? ORDER BY position",
         (page,),
@@ -166,36 +299,32 @@ def fetch_hero(page):
     return [dict(r) for r in rows]
 
 
-def replace_hero(page, slides):
-    now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    with conn:
-        conn.execute("DELETE FROM hero_slides WHERE page = ?", (page,))
-        for pos, slide in enumerate(slides):
-            conn.execute(
-                """
-                INSERT INTO hero_slides (page, position, title, description, primary_label, primary_href, secondary_label, secondary_href, image_url, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    page,
-                    pos,
-                    slide.get("title"),
-                    slide.get("description"),
-                    slide.get("primary_label"),
-                    slide.get("primary_href"),
-                    slide.get("secondary_label"),
-                    slide.get("secondary_href"),
-                    slide.get("image_url"),
-                    now,
-                    now,
-                ),
-            )
-    conn.close()
+_HERO_COLUMNS = [
+    "title",
+    "description",
+    "primary_label",
+    "primary_href",
+    "secondary_label",
+    "secondary_href",
+    "image_url",
+]
+
+
+def replace_hero(page, slides, conn=None):
+    now = utc_timestamp()
+    with _transaction(conn) as conn:
+        _replace_positioned(
+            conn,
+            "hero_slides",
+            {"page": page},
+            _HERO_COLUMNS,
+            [tuple(slide.get(c) for c in _HERO_COLUMNS) for slide in slides],
+            now=now,
+        )
 
 
 def fetch_story(page):
-    conn = get_conn()
+    conn = get_read_conn()
     row = conn.execute(
         "SELECT page, title, paragraphs, content_html, image_url FROM page_story WHERE page = ?",
         (page,),
@@ -216,7 +345,8 @@ def fetch_story(page):
     }
 
 
-def save_story(page, story):
+def save_story(page, story, conn=None):
+    _load_bleach()
     title_raw = story.get("title") or ""
     paragraphs = story.get("paragraphs") or []
     html = story.get("html") or story.get("content_html")
@@ -239,8 +369,7 @@ def save_story(page, story):
         )
     except Exception:
         title = title_raw
-    conn = get_conn()
-    with conn:
+    with _transaction(conn) as conn:
         conn.execute(
             """
             INSERT INTO page_story (page, title, paragraphs, content_html, image_url)
@@ -253,17 +382,17 @@ def save_story(page, story):
             """,
             (page, title, json.dumps(paragraphs), html, image_url),
         )
-    conn.close()
 
 
 def fetch_about(page):
-    conn = get_conn()
+    conn = get_read_conn()
     row = conn.execute("SELECT * FROM page_about WHERE page = ?", (page,)).fetchone()
     conn.close()
     return dict(row) if row else {}
 
 
-def save_about(page, about):
+def save_about(page, about, conn=None):
+    _load_bleach()
     title_raw = about.get("title") or ""
     content_raw = about.get("content") or ""
     try:
@@ -312,8 +441,7 @@ def save_about(page, about):
     ]
     normalized = {**about, "title": title, "content": content}
     values = [normalized.get(f) for f in fields]
-    conn = get_conn()
-    with conn:
+    with _transaction(conn) as conn:
         conn.execute(
             """
             INSERT INTO page_about (page, title, content, image_url, primary_label, primary_href, secondary_label, secondary_href)
@@ -329,11 +457,10 @@ def save_about(page, about):
             """,
             [page] + values,
         )
-    conn.close()
 
 
 def fetch_team(page):
-    conn = get_conn()
+    conn = get_read_conn()
     rows = conn.execute(
         "SELECT * FROM team_members WHERE page = ? ORDER BY position",
         (page,),
@@ -343,40 +470,30 @@ def fetch_team(page):
 
 
 def fetch_team_meta(page):
-    conn = get_conn()
+    conn = get_read_conn()
     row = conn.execute("SELECT * FROM team_meta WHERE page = ?", (page,)).fetchone()
     conn.close()
     return dict(row) if row else {}
 
 
-def replace_team(page, members):
-    conn = get_conn()
-    with conn:
-        conn.execute("DELETE FROM team_members WHERE page = ?", (page,))
-        for pos, m in enumerate(members):
-            conn.execute(
-                """
-                INSERT INTO team_members (page, position, name, role, image_url, linkedin, more_url)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    page,
-                    pos,
-                    m.get("name"),
-                    m.get("role"),
-                    m.get("image_url"),
-                    m.get("linkedin"),
-                    m.get("more_url"),
-                ),
-            )
-    conn.close()
+_TEAM_COLUMNS = ["name", "role", "image_url", "linkedin", "more_url"]
+
+
+def replace_team(page, members, conn=None):
+    with _transaction(conn) as conn:
+        _replace_positioned(
+            conn,
+            "team_members",
+            {"page": page},
+            _TEAM_COLUMNS,
+            [tuple(m.get(c) for c in _TEAM_COLUMNS) for m in members],
+        )
 
 
-def save_team_meta(page, meta):
-    conn = get_conn()
+def save_team_meta(page, meta, conn=None):
     title = meta.get("title")
     subtitle = meta.get("subtitle")
-    with conn:
+    with _transaction(conn) as conn:
         conn.execute(
             """
             INSERT INTO team_meta (page, title, subtitle)
@@ -387,11 +504,10 @@ def save_team_meta(page, meta):
             """,
             (page, title, subtitle),
         )
-    conn.close()
 
 
 def fetch_services(page):
-    conn = get_conn()
+    conn = get_read_conn()
     rows = conn.execute(
         "SELECT * FROM services_items WHERE page = ? ORDER BY position",
         (page,),
@@ -410,54 +526,53 @@ def fetch_services(page):
 
 
 def fetch_services_meta(page):
-    conn = get_conn()
+    conn = get_read_conn()
     row = conn.execute("SELECT * FROM services_meta WHERE page = ?", (page,)).fetchone()
     conn.close()
     return dict(row) if row else {}
 
 
-def replace_services(page, services):
-    conn = get_conn()
-    with conn:
-        conn.execute("DELETE FROM services_items WHERE page = ?", (page,))
-        for pos, s in enumerate(services):
-            bullets = s.get("bullets") or []
-            description_raw = _html.unescape((s.get("description") or "").strip())
-            try:
-                allowed_protocols = list(bleach.sanitizer.ALLOWED_PROTOCOLS)
-                description = bleach.clean(
-                    description_raw,
-                    tags=ALLOWED_TAGS,
-                    attributes=ALLOWED_ATTRIBUTES,
-                    protocols=allowed_protocols,
-                    css_sanitizer=IMG_CSS_SANITIZER,
-                    strip=True,
-                )
-            except Exception:
-                description = description_raw
-            conn.execute(
-                """
-                INSERT INTO services_items (page, position, title, description, bullets, image_url, icon_url)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    page,
-                    pos,
-                    s.get("title"),
-                    description,
-                    json.dumps(bullets),
-                    s.get("image_url"),
-                    s.get("icon_url") or s.get("icon"),
-                ),
+def replace_services(page, services, conn=None):
+    _load_bleach()
+    items = []
+    for s in services:
+        bullets = s.get("bullets") or []
+        description_raw = _html.unescape((s.get("description") or "").strip())
+        try:
+            allowed_protocols = list(bleach.sanitizer.ALLOWED_PROTOCOLS)
+            description = bleach.clean(
+                description_raw,
+                tags=ALLOWED_TAGS,
+                attributes=ALLOWED_ATTRIBUTES,
+                protocols=allowed_protocols,
+                css_sanitizer=IMG_CSS_SANITIZER,
+                strip=True,
             )
-    conn.close()
+        except Exception:
+            description = description_raw
+        items.append(
+            (
+                s.get("title"),
+                description,
+                json.dumps(bullets),
+                s.get("image_url"),
+                s.get("icon_url") or s.get("icon") or None,
+            )
+        )
+    with _transaction(conn) as conn:
+        _replace_positioned(
+            conn,
+            "services_items",
+            {"page": page},
+            ["title", "description", "bullets", "image_url", "icon_url"],
+            items,
+        )
 
 
-def save_services_meta(page, meta):
-    conn = get_conn()
+def save_services_meta(page, meta, conn=None):
     title = meta.get("title")
     subtitle = meta.get("subtitle")
-    with conn:
+    with _transaction(conn) as conn:
         conn.execute(
             """
             INSERT INTO services_meta (page, title, subtitle)
@@ -468,13 +583,12 @@ def save_services_meta(page, meta):
             """,
             (page, title, subtitle),
         )
-    conn.close()
 
 
 def fetch_subscriptions(limit=500):
-    conn = get_conn()
+    conn = get_read_conn()
     rows = conn.execute(
-        "SELECT id, email, created_at FROM subscriptions ORDER BY datetime(created_at) DESC LIMIT ?",
+        "SELECT id, email, created_at FROM subscriptions ORDER BY created_at DESC LIMIT ?",
         (limit,),
     ).fetchall()
     conn.close()
@@ -482,10 +596,8 @@ def fetch_subscriptions(limit=500):
 
 
 def delete_subscription(sub_id):
-    conn = get_conn()
-    with conn:
+    with write_conn() as conn:
         conn.execute("DELETE FROM subscriptions WHERE id = ?", (sub_id,))
-    conn.close()
 
 
 def save_contact_message(payload, ip=None, user_agent=None):
@@ -494,26 +606,23 @@ def save_contact_message(payload, ip=None, user_agent=None):
     phone = (payload.get("phone") or "").strip()
     subject = (payload.get("subject") or "").strip()
     message = (payload.get("message") or "").strip()
-    now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    with conn:
-        conn.execute(
-            """
-            INSERT INTO contact_messages (name, email, phone, subject, message, ip, user_agent, status, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 'new', ?)
-            """,
-            (name, email, phone, subject, message, ip, user_agent, now),
-        )
-    conn.close()
+    now = utc_timestamp()
+    batched_insert(
+        """
+        INSERT INTO contact_messages (name, email, phone, subject, message, ip, user_agent, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'new', ?)
+        """,
+        (name, email, phone, subject, message, ip, user_agent, now),
+    )
 
 
 def fetch_contact_messages(limit=200):
-    conn = get_conn()
+    conn = get_read_conn()
     rows = conn.execute(
         """
         SELECT id, name, email, phone, subject, message, status, created_at
         FROM contact_messages
-        ORDER BY datetime(created_at) DESC
+        ORDER BY created_at DESC
         LIMIT ?
         """,
         (limit,),
@@ -523,14 +632,12 @@ def fetch_contact_messages(limit=200):
 
 
 def delete_contact_message(message_id):
-    conn = get_conn()
-    with conn:
+    with write_conn() as conn:
         conn.execute("DELETE FROM contact_messages WHERE id = ?", (message_id,))
-    conn.close()
 
 # -- Categorías publicaciones
 def fetch_categories():
-    conn = get_conn()
+    conn = get_read_conn()
     rows = conn.execute(
         """
         SELECT c.id, c.name, COUNT(p.id) AS posts
@@ -548,35 +655,32 @@ def save_category(payload):
     name = payload.get("name")
     if not name:
         return
-    conn = get_conn()
-    with conn:
+    with unit_of_work(_CONTENT_VERSION) as conn:
         conn.execute(
             "INSERT INTO categories (name) VALUES (?) ON CONFLICT(name) DO UPDATE SET name=excluded.name",
             (name,),
         )
-    conn.close()
 
 
 def delete_category(cat_id):
-    conn = get_conn()
-    with conn:
+    with unit_of_work(_CONTENT_VERSION) as conn:
         conn.execute("DELETE FROM categories WHERE id = ?", (cat_id,))
-    conn.close()
 
 
 
 
 def fetch_publications(active_only=False):
-    conn = get_conn()
+    conn = get_read_conn()
     base_sql = (
         "SELECT p.id, p.title, p.slug, p.excerpt, p.content_html, p.author, "
+        "p.excerpt_text, p.word_count, p.reading_minutes, p.first_image_url, "
         "p.hero_title, p.hero_subtitle, p.hero_image_url, p.hero_cta_label, p.hero_cta_href, "
         "p.category_id, c.name as category, "
         "p.published_at, p.created_at, p.updated_at, p.active "
         "FROM publications p LEFT JOIN categories c ON p.category_id = c.id "
     )
     where = "WHERE p.active = 1 " if active_only else ""
-    sql = base_sql + where + "ORDER BY datetime(p.published_at) DESC"
+    sql = base_sql + where + "ORDER BY p.published_at DESC, p.id DESC"
     rows = conn.execute(sql).fetchall()
     result = []
     for r in rows:
@@ -586,10 +690,70 @@ def fetch_publications(active_only=False):
     return result
 
 
+PUBLICATIONS_PAGE_MAX = 100
+
+
+def fetch_publication_list(category=None, limit=None, cursor=None):
+    """
+    Proyección liviana para los listados públicos (sin content_html).
+    Solo publicaciones activas, ordenadas por (published_at, id) descendente.
+    category acepta id o nombre. Sin limit devuelve la lista completa; con
+    limit/cursor retorna {"items", "next_cursor", "total"} como fetch_orders.
+    """
+    conditions = ["p.active = 1"]
+    params = []
+    if category not in (None, ""):
+        if str(category).isdigit():
+            conditions.append("p.category_id = ?")
+            params.append(int(category))
+        else:
+            conditions.append("p.category_id = (SELECT id FROM categories WHERE name = ?)")
+            params.append(str(category))
+    paged = limit is not None or bool(cursor)
+    if paged:
+        limit = max(1, min(20 if limit is None else int(limit), PUBLICATIONS_PAGE_MAX))
+
+    conn = get_read_conn()
+    total = None
+    if paged and not cursor:
+        total = conn.execute(
+            "SELECT COUNT(*) AS c FROM publications p WHERE " + " AND ".join(conditions), params
+        ).fetchone()["c"]
+
+    page_conditions = list(conditions)
+    page_params = list(params)
+    if cursor:
+        published_at, last_id = _decode_cursor(cursor, 2)
+        page_conditions.append("(p.published_at < ? OR (p.published_at = ? AND p.id < ?))")
+        page_params.extend([published_at, published_at, last_id])
+    q = (
+        "SELECT p.id, p.slug, p.title, COALESCE(NULLIF(p.excerpt_text, ''), p.excerpt, '') AS excerpt_text, "
+        "p.word_count, p.reading_minutes, p.hero_image_url, p.first_image_url, p.published_at, "
+        "p.category_id, c.name AS category "
+        "FROM publications p LEFT JOIN categories c ON p.category_id = c.id "
+        "WHERE " + " AND ".join(page_conditions) + " "
+        "ORDER BY p.published_at DESC, p.id DESC"
+    )
+    if paged:
+        q += " LIMIT ?"
+        page_params.append(limit + 1)
+    rows = conn.execute(q, page_params).fetchall()
+    conn.close()
+
+    if not paged:
+        return [dict(r) for r in rows]
+    items = [dict(r) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit and items:
+        next_cursor = _encode_cursor(items[-1]["published_at"], items[-1]["id"])
+    return {"items": items, "next_cursor": next_cursor, "total": total}
+
+
 def fetch_publication(pub_id):
-    conn = get_conn()
+    conn = get_read_conn()
     row = conn.execute(
         "SELECT p.id, p.title, p.slug, p.excerpt, p.content_html, p.author, "
+        "p.excerpt_text, p.word_count, p.reading_minutes, p.first_image_url, "
         "p.hero_title, p.hero_subtitle, p.hero_image_url, p.hero_cta_label, p.hero_cta_href, "
         "p.category_id, c.name as category, p.published_at, p.created_at, p.updated_at, p.active "
         "FROM publications p LEFT JOIN categories c ON p.category_id = c.id WHERE p.id = ?",
@@ -604,9 +768,10 @@ def fetch_publication(pub_id):
 
 
 def fetch_publication_by_slug(slug):
-    conn = get_conn()
+    conn = get_read_conn()
     row = conn.execute(
         "SELECT p.id, p.title, p.slug, p.excerpt, p.content_html, p.author, "
+        "p.excerpt_text, p.word_count, p.reading_minutes, p.first_image_url, "
         "p.hero_title, p.hero_subtitle, p.hero_image_url, p.hero_cta_label, p.hero_cta_href, "
         "p.category_id, c.name as category, p.published_at, p.created_at, p.updated_at, p.active "
         "FROM publications p LEFT JOIN categories c ON p.category_id = c.id WHERE p.slug = ? AND p.active = 1",
@@ -621,6 +786,7 @@ def fetch_publication_by_slug(slug):
 
 
 def save_publication(payload):
+    _load_bleach()
     title = payload.get("title")
     slug = payload.get("slug")
     excerpt = ""  # excerpt removed from UI; keep empty
@@ -666,7 +832,7 @@ def save_publication(payload):
         category_id = int(category_id)
     # allow passing category name
     if not category_id and payload.get("category"):
-        conn = get_conn()
+        conn = get_read_conn()
         try:
             row = conn.execute("SELECT id FROM categories WHERE name = ?", (payload.get("category"),)).fetchone()
             if row:
@@ -699,12 +865,14 @@ def save_publication(payload):
     hero_image_url = (payload.get("hero_image_url") or "").strip()
     hero_cta_label = (payload.get("hero_cta_label") or "").strip()
     hero_cta_href = (payload.get("hero_cta_href") or "").strip()
-    now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    with conn:
+    # Extracto, conteo de palabras y primera imagen se derivan aquí una sola vez
+    # para que los listados y la búsqueda no tengan que bajar el documento.
+    derived = publication_text_fields(content)
+    now = utc_timestamp()
+    with unit_of_work(_CONTENT_VERSION) as conn:
         if payload.get("id"):
             conn.execute(
-                "UPDATE publications SET title=?, slug=?, excerpt=?, content_html=?, author=?, hero_title=?, hero_subtitle=?, hero_image_url=?, hero_cta_label=?, hero_cta_href=?, category_id=?, published_at=?, active=?, updated_at=? WHERE id = ?",
+                "UPDATE publications SET title=?, slug=?, excerpt=?, content_html=?, author=?, hero_title=?, hero_subtitle=?, hero_image_url=?, hero_cta_label=?, hero_cta_href=?, category_id=?, published_at=?, active=?, excerpt_text=?, word_count=?, reading_minutes=?, first_image_url=?, updated_at=? WHERE id = ?",
                 (
                     title,
                     slug,
@@ -719,6 +887,10 @@ def save_publication(payload):
                     category_id,
                     published_at,
                     active,
+                    derived["excerpt_text"],
+                    derived["word_count"],
+                    derived["reading_minutes"],
+                    derived["first_image_url"],
                     now,
                     payload.get("id"),
                 ),
@@ -726,7 +898,7 @@ def save_publication(payload):
             pub_id = payload.get("id")
         else:
             conn.execute(
-                "INSERT INTO publications (title, slug, excerpt, content_html, author, hero_title, hero_subtitle, hero_image_url, hero_cta_label, hero_cta_href, category_id, published_at, active, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                "INSERT INTO publications (title, slug, excerpt, content_html, author, hero_title, hero_subtitle, hero_image_url, hero_cta_label, hero_cta_href, category_id, published_at, active, excerpt_text, word_count, reading_minutes, first_image_url, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
                 (
                     title,
                     slug,
@@ -741,17 +913,20 @@ def save_publication(payload):
                     category_id,
                     published_at,
                     active,
+                    derived["excerpt_text"],
+                    derived["word_count"],
+                    derived["reading_minutes"],
+                    derived["first_image_url"],
                     now,
                     now,
                 ),
             )
             pub_id = conn.execute("SELECT last_insert_rowid() AS id").fetchone()["id"]
-    conn.close()
 
 
 # --- KDBWEB entries ---
 def fetch_kdbweb_entries():
-    conn = get_conn()
+    conn = get_read_conn()
     rows = conn.execute(
         """
         SELECT id, position, slug, parent_slug, title, card_title, summary, hero_kicker, hero_title, hero_subtitle,
@@ -766,12 +941,12 @@ def fetch_kdbweb_entries():
 
 
 def fetch_kdbweb_entry_by_slug(slug):
-    conn = get_conn()
+    conn = get_read_conn()
     row = conn.execute(
         """
         SELECT id, position, slug, parent_slug, title, card_title, summary, hero_kicker, hero_title, hero_subtitle,
                hero_image_url, hero_primary_label, hero_primary_href, hero_secondary_label,
-               hero_secondary_href, content_html, meta_json
+               hero_secondary_href, content_html, meta_json, json_valid(meta_json) AS meta_json_valid
         FROM kdbweb_entries
         WHERE slug = ?
         """,
@@ -782,10 +957,10 @@ def fetch_kdbweb_entry_by_slug(slug):
 
 
 def replace_kdbweb_entries(entries):
+    _load_bleach()
     import json as _json
-    now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    with conn:
+    now = utc_timestamp()
+    with write_conn() as conn:
         # ── Safety snapshot ──────────────────────────────────────────────────
         # Before wiping the table, save every slug's existing meta_json.
         # If the incoming payload for that slug has null/invalid meta_json we
@@ -815,6 +990,9 @@ def replace_kdbweb_entries(entries):
                 content = content_raw
             # meta_json: store as raw JSON string (validated to be valid JSON if present)
             meta_raw = entry.get("meta_json") or None
+            if isinstance(meta_raw, (dict, list)):
+                # /api/kdbweb/<slug> entrega meta_json como objeto
+                meta_raw = _json.dumps(meta_raw, ensure_ascii=False)
             if meta_raw:
                 try:
                     _json.loads(meta_raw)  # validate JSON
@@ -873,13 +1051,12 @@ def replace_kdbweb_entries(entries):
                     now,
                 ),
             )
-    conn.close()
     return len(entries or [])
 
 
 # --- KATWeb Boletines (Tribunal Fiscal) ---
 def fetch_katweb_boletines():
-    conn = get_conn()
+    conn = get_read_conn()
     rows = conn.execute(
         """
         SELECT id, year, month_label, pdf_url, position
@@ -892,26 +1069,16 @@ def fetch_katweb_boletines():
 
 
 def replace_katweb_boletines(boletines):
-    now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    with conn:
-        conn.execute("DELETE FROM katweb_boletines")
-        for pos, b in enumerate(boletines or []):
-            conn.execute(
-                """
-                INSERT INTO katweb_boletines (year, month_label, pdf_url, position, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    b.get("year"),
-                    b.get("month_label"),
-                    b.get("pdf_url"),
-                    pos,
-                    now,
-                    now,
-                ),
-            )
-    conn.close()
+    now = utc_timestamp()
+    with write_conn() as conn:
+        _replace_positioned(
+            conn,
+            "katweb_boletines",
+            {},
+            ["year", "month_label", "pdf_url"],
+            [(b.get("year"), b.get("month_label"), b.get("pdf_url")) for b in boletines or []],
+            now=now,
+        )
     return len(boletines or [])
 
 
@@ -926,11 +1093,10 @@ def update_all_url_references(old_url, new_url):
         ("page_about",     ["image_url"]),
         ("team_members",   ["image_url"]),
         ("services_items", ["image_url", "icon_url"]),
-        ("publications",   ["hero_image_url", "content_html"]),
+        ("publications",   ["hero_image_url", "content_html", "first_image_url"]),
         ("kdbweb_entries", ["hero_image_url", "content_html", "meta_json"]),
     ]
-    conn = get_conn()
-    with conn:
+    with unit_of_work(_CONTENT_VERSION) as conn:
         for table, cols in url_columns:
             for col in cols:
                 conn.execute(
@@ -938,17 +1104,25 @@ def update_all_url_references(old_url, new_url):
                     f" WHERE instr(COALESCE({col}, ''), ?) > 0",
                     (old_url, new_url, old_url),
                 )
-    conn.close()
 
 
 def delete_publication(pub_id):
-    conn = get_conn()
-    with conn:
+    with unit_of_work(_CONTENT_VERSION) as conn:
         conn.execute("DELETE FROM publications WHERE id = ?", (pub_id,))
-    conn.close()
+
+
+_page_data_cache = {}
 
 
 def get_page_data(page):
+    """
+    Secciones de una página, cacheadas por worker hasta que cambie el sello
+    "content". El resultado se comparte entre requests: no modificarlo.
+    """
+    version = read_version(_CONTENT_VERSION)
+    cached = _page_data_cache.get(page)
+    if cached is not None and cached[0] == version:
+        return cached[1]
     base = {
         "hero": fetch_hero(page),
         "story": fetch_story(page),
@@ -959,23 +1133,56 @@ def get_page_data(page):
         "services_meta": fetch_services_meta(page),
     }
     if page == "publicaciones":
-        base["publications"] = fetch_publications(active_only=True)
+        base["publications"] = fetch_publication_list()
+    _page_data_cache[page] = (version, base)
     return base
 
 
+def save_page_content(page, payload):
+    """Guarda todas las secciones de una página en una sola transacción."""
+    with unit_of_work(_CONTENT_VERSION) as conn:
+        replace_hero(page, payload.get("hero") or [], conn=conn)
+        save_story(page, payload.get("story") or {}, conn=conn)
+        save_about(page, payload.get("about") or {}, conn=conn)
+        save_team_meta(page, payload.get("team_meta") or {}, conn=conn)
+        replace_team(page, payload.get("team") or [], conn=conn)
+        replace_services(page, payload.get("services") or [], conn=conn)
+        save_services_meta(page, payload.get("services_meta") or {}, conn=conn)
+
+
 def fetch_page_settings():
-    conn = get_conn()
+    conn = get_read_conn()
     rows = conn.execute("SELECT page, enabled FROM page_settings").fetchall()
     conn.close()
     return {row["page"]: bool(row["enabled"]) for row in rows}
 
 
+# Snapshot en memoria de la visibilidad de páginas. Los endpoints públicos lo
+# consultan en cada request; solo se recarga cuando save_page_settings cambia
+# el sello "page_settings".
+_PAGE_SETTINGS_VERSION = "page_settings"
+_page_settings_snapshot = (None, None)
+
+
+def _page_visibility():
+    global _page_settings_snapshot
+    version = read_version(_PAGE_SETTINGS_VERSION)
+    cached_version, pages = _page_settings_snapshot
+    if pages is None or cached_version != version:
+        pages = fetch_page_settings()
+        _page_settings_snapshot = (version, pages)
+    return pages
+
+
+def fetch_page_visibility():
+    return dict(_page_visibility())
+
+
 def save_page_settings(pages):
     if not isinstance(pages, dict):
         return
-    now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    with conn:
+    now = utc_timestamp()
+    with write_conn() as conn:
         for page, enabled in pages.items():
             conn.execute(
                 """
@@ -987,16 +1194,11 @@ def save_page_settings(pages):
                 """,
                 (page, 1 if bool(enabled) else 0, now),
             )
-    conn.close()
+    bump_version(_PAGE_SETTINGS_VERSION)
 
 
 def is_page_enabled(page):
-    conn = get_conn()
-    row = conn.execute("SELECT enabled FROM page_settings WHERE page = ?", (page,)).fetchone()
-    conn.close()
-    if row is None:
-        return True
-    return bool(row["enabled"])
+    return _page_visibility().get(page, True)
 
 
 # ─── Academia: Courses ────────────────────────────────────────────────────────
@@ -1016,24 +1218,76 @@ def _course_row_to_dict(row):
 
 
 def _attach_modules(conn, course_id):
+    """Módulos con sus lecciones en dos consultas (sin N+1), armados en una pasada."""
     modules = conn.execute(
         "SELECT * FROM course_modules WHERE course_id = ? ORDER BY position",
         (course_id,),
     ).fetchall()
     result = []
+    by_id = {}
     for m in modules:
         md = dict(m)
-        lessons = conn.execute(
-            "SELECT * FROM course_lessons WHERE module_id = ? ORDER BY position",
-            (m["id"],),
-        ).fetchall()
-        md["lessons"] = [dict(l) for l in lessons]
+        md["lessons"] = []
+        by_id[md["id"]] = md
         result.append(md)
+    if not by_id:
+        return result
+    # IN sobre idx_course_lessons_module: SQLite recorre el índice ya ordenado
+    # por (module_id, position), sin TEMP B-TREE.
+    placeholders = ", ".join("?" for _ in by_id)
+    lessons = conn.execute(
+        f"SELECT * FROM course_lessons WHERE module_id IN ({placeholders}) ORDER BY module_id, position",
+        list(by_id),
+    ).fetchall()
+    for l in lessons:
+        by_id[l["module_id"]]["lessons"].append(dict(l))
     return result
 
 
+# Caché por worker del detalle de cursos (curso + módulos + lecciones). Se
+# vacía cuando save_course/delete_course cambian el sello "courses"; nunca se
+# guardan los "no encontrado" para que slugs inválidos no llenen el dict.
+_COURSES_VERSION = "courses"
+_course_cache = {}
+_course_cache_lock = threading.Lock()
+_course_cache_version = None
+
+
+def _copy_course(course):
+    # Copia estructural (más barata que deepcopy): los valores hoja son escalares.
+    data = {k: (list(v) if isinstance(v, list) else v) for k, v in course.items()}
+    data["modules"] = [
+        {**m, "lessons": [dict(l) for l in m.get("lessons") or []]} for m in course.get("modules") or []
+    ]
+    return data
+
+
+def _course_cache_get(key):
+    global _course_cache_version
+    version = read_version(_COURSES_VERSION)
+    with _course_cache_lock:
+        if version != _course_cache_version:
+            _course_cache.clear()
+            _course_cache_version = version
+            metrics.cache_result("course", False)
+            return None, version
+        course = _course_cache.get(key)
+    metrics.cache_result("course", course is not None)
+    return (_copy_course(course) if course else None), version
+
+
+def _course_cache_put(key, course, version):
+    with _course_cache_lock:
+        if version == _course_cache_version:
+            _course_cache[key] = _copy_course(course)
+
+
+def invalidate_course_cache():
+    bump_version(_COURSES_VERSION)
+
+
 def fetch_courses(published_only=True, category=None):
-    conn = get_conn()
+    conn = get_read_conn()
     q = "SELECT * FROM courses"
     params = []
     conditions = []
@@ -1051,7 +1305,11 @@ def fetch_courses(published_only=True, category=None):
 
 
 def fetch_course_by_slug(slug, published_only=True):
-    conn = get_conn()
+    cache_key = ("slug", slug, bool(published_only))
+    cached, version = _course_cache_get(cache_key)
+    if cached:
+        return cached
+    conn = get_read_conn()
     q = "SELECT * FROM courses WHERE slug = ?"
     params = [slug]
     if published_only:
@@ -1063,11 +1321,16 @@ def fetch_course_by_slug(slug, published_only=True):
     course = _course_row_to_dict(row)
     course["modules"] = _attach_modules(conn, course["id"])
     conn.close()
+    _course_cache_put(cache_key, course, version)
     return course
 
 
 def fetch_course_by_id(course_id):
-    conn = get_conn()
+    cache_key = ("id", course_id)
+    cached, version = _course_cache_get(cache_key)
+    if cached:
+        return cached
+    conn = get_read_conn()
     row = conn.execute("SELECT * FROM courses WHERE id = ?", (course_id,)).fetchone()
     if not row:
         conn.close()
@@ -1075,11 +1338,55 @@ def fetch_course_by_id(course_id):
     course = _course_row_to_dict(row)
     course["modules"] = _attach_modules(conn, course["id"])
     conn.close()
+    _course_cache_put(cache_key, course, version)
     return course
 
 
+def _sync_course_modules(conn, course_id, modules):
+    """
+    Módulos por posición (conservan su id si siguen existiendo) y luego todas
+    las lecciones del curso en un solo lote, incluidas las de módulos
+    eliminados.
+    """
+    existing_ids = [
+        r["id"] for r in conn.execute("SELECT id FROM course_modules WHERE course_id = ?", (course_id,)).fetchall()
+    ]
+    existing_lessons = {}
+    if existing_ids:
+        placeholders = ", ".join("?" for _ in existing_ids)
+        for row in conn.execute(
+            f"SELECT module_id, position, title, duration, type FROM course_lessons WHERE module_id IN ({placeholders})",
+            existing_ids,
+        ).fetchall():
+            existing_lessons[(row["module_id"], row["position"])] = (row["title"], row["duration"], row["type"])
+
+    _replace_positioned(
+        conn,
+        "course_modules",
+        {"course_id": course_id},
+        ["title", "duration", "lessons_count"],
+        [(m.get("title"), m.get("duration"), m.get("lessons_count", 0)) for m in modules],
+    )
+    module_ids = {
+        r["position"]: r["id"]
+        for r in conn.execute("SELECT id, position FROM course_modules WHERE course_id = ?", (course_id,)).fetchall()
+    }
+    lessons = {}
+    for mi, mod in enumerate(modules):
+        for li, lesson in enumerate(mod.get("lessons") or []):
+            lessons[(module_ids[mi], li)] = (lesson.get("title"), lesson.get("duration"), lesson.get("type", "video"))
+    _sync_rows(
+        conn,
+        "course_lessons",
+        ["module_id", "position"],
+        ["title", "duration", "type"],
+        lessons,
+        existing_lessons,
+    )
+
+
 def save_course(payload, course_id=None):
-    now = datetime.utcnow().isoformat()
+    now = utc_timestamp()
 
     def _json_list(key):
         val = payload.get(key)
@@ -1089,8 +1396,7 @@ def save_course(payload, course_id=None):
             return val  # already serialized
         return json.dumps([])
 
-    conn = get_conn()
-    with conn:
+    with write_conn() as conn:
         if course_id:
             conn.execute(
                 """
@@ -1165,41 +1471,57 @@ def save_course(payload, course_id=None):
 
         # Replace modules + lessons if provided
         if "modules" in payload:
-            conn.execute("DELETE FROM course_modules WHERE course_id = ?", (cid,))
-            for mi, mod in enumerate(payload.get("modules") or []):
-                mod_cur = conn.execute(
-                    """
-                    INSERT INTO course_modules (course_id, position, title, duration, lessons_count)
-                    VALUES (?, ?, ?, ?, ?)
-                    """,
-                    (cid, mi, mod.get("title"), mod.get("duration"), mod.get("lessons_count", 0)),
-                )
-                mid = mod_cur.lastrowid
-                for li, lesson in enumerate(mod.get("lessons") or []):
-                    conn.execute(
-                        """
-                        INSERT INTO course_lessons (module_id, position, title, duration, type)
-                        VALUES (?, ?, ?, ?, ?)
-                        """,
-                        (mid, li, lesson.get("title"), lesson.get("duration"), lesson.get("type", "video")),
-                    )
-    conn.close()
+            _sync_course_modules(conn, cid, payload.get("modules") or [])
+    invalidate_course_cache()
     return cid
 
 
 def delete_course(course_id):
-    conn = get_conn()
-    with conn:
+    with write_conn() as conn:
         conn.execute("DELETE FROM courses WHERE id = ?", (course_id,))
-    conn.close()
+    invalidate_course_cache()
 
 
 # ─── Academia: Orders ─────────────────────────────────────────────────────────
 
+# Campos de orders que alimentan student_stats.
+_STUDENT_STATS_FIELDS = {"status", "moodle_enrolled", "moodle_user_email"}
+
+
+def _order_emails(conn, order_id):
+    row = conn.execute("SELECT student_email FROM orders WHERE id = ?", (order_id,)).fetchone()
+    return [row["student_email"]] if row else []
+
+
+def _refresh_student_stats(conn, emails):
+    """Recalcula student_stats solo para los alumnos afectados (usa idx_orders_email_created)."""
+    for email in {e for e in emails if e}:
+        conn.execute(
+            "INSERT INTO student_stats (student_email, student_name, moodle_user_email, total_orders, "
+            "paid_orders, total_paid, enrolled_count, last_order_at) "
+            + STUDENT_STATS_SELECT
+            + """ WHERE student_email = ? GROUP BY student_email
+            ON CONFLICT(student_email) DO UPDATE SET
+              student_name=excluded.student_name,
+              moodle_user_email=excluded.moodle_user_email,
+              total_orders=excluded.total_orders,
+              paid_orders=excluded.paid_orders,
+              total_paid=excluded.total_paid,
+              enrolled_count=excluded.enrolled_count,
+              last_order_at=excluded.last_order_at
+            """,
+            (email,),
+        )
+        conn.execute(
+            "DELETE FROM student_stats WHERE student_email = ? "
+            "AND NOT EXISTS (SELECT 1 FROM orders WHERE student_email = ?)",
+            (email, email),
+        )
+
+
 def create_order(payload):
-    now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    with conn:
+    now = utc_timestamp()
+    with write_conn() as conn:
         cur = conn.execute(
             """
             INSERT INTO orders (
@@ -1232,14 +1554,13 @@ def create_order(payload):
             ),
         )
         order_id = cur.lastrowid
-    conn.close()
+        _refresh_student_stats(conn, [payload.get("student_email")])
     return order_id
 
 
 def update_order_status(order_id, status, gateway_ref=None):
-    now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    with conn:
+    now = utc_timestamp()
+    with write_conn() as conn:
         if gateway_ref:
             conn.execute(
                 "UPDATE orders SET status=?, gateway_ref=?, updated_at=? WHERE id=?",
@@ -1250,12 +1571,12 @@ def update_order_status(order_id, status, gateway_ref=None):
                 "UPDATE orders SET status=?, updated_at=? WHERE id=?",
                 (status, now, order_id),
             )
-    conn.close()
+        _refresh_student_stats(conn, _order_emails(conn, order_id))
 
 
 def admin_update_order(order_id, data):
     """Partial update of an order for admin actions."""
-    now = datetime.utcnow().isoformat()
+    now = utc_timestamp()
     allowed = {
         "status", "gateway_ref", "notes",
         "comprobante_number", "comprobante_issued_at",
@@ -1273,14 +1594,14 @@ def admin_update_order(order_id, data):
     sets.append("updated_at=?")
     params.append(now)
     params.append(order_id)
-    conn = get_conn()
-    with conn:
+    with write_conn() as conn:
         conn.execute(f"UPDATE orders SET {', '.join(sets)} WHERE id=?", params)
-    conn.close()
+        if _STUDENT_STATS_FIELDS.intersection(data):
+            _refresh_student_stats(conn, _order_emails(conn, order_id))
 
 
 def fetch_order_by_id(order_id):
-    conn = get_conn()
+    conn = get_read_conn()
     row = conn.execute(
         "SELECT o.*, c.slug AS course_slug, c.moodle_course_id FROM orders o LEFT JOIN courses c ON o.course_id = c.id WHERE o.id = ?",
         (order_id,),
@@ -1289,43 +1610,152 @@ def fetch_order_by_id(order_id):
     return dict(row) if row else None
 
 
-def fetch_orders(status=None):
-    conn = get_conn()
-    q = "SELECT o.*, c.slug AS course_slug FROM orders o LEFT JOIN courses c ON o.course_id = c.id"
+ORDERS_PAGE_MAX = 200
+
+
+def _encode_cursor(*parts):
+    raw = json.dumps(list(parts), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor, size):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        parts = json.loads(raw.decode("utf-8"))
+    except Exception:
+        raise ValueError("cursor invalido")
+    if not isinstance(parts, list) or len(parts) != size:
+        raise ValueError("cursor invalido")
+    # Solo valores que SQLite puede enlazar; listas u objetos darían un 500
+    if any(isinstance(part, bool) or not isinstance(part, (str, int, float, type(None))) for part in parts):
+        raise ValueError("cursor invalido")
+    return parts
+
+
+def _date_bound(value, end=False):
+    """Convierte YYYY-MM-DD (o ISO completo) en un límite comparable con created_at."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError("Fecha invalida, usa YYYY-MM-DD")
+    if end and len(value) <= 10:
+        parsed = parsed + timedelta(days=1)
+    return utc_timestamp(parsed)
+
+
+def fetch_orders(status=None, course_id=None, payment_method=None, date_from=None,
+                 date_to=None, email_prefix=None, limit=50, cursor=None):
+    """
+    Órdenes paginadas por cursor (created_at, id) descendente.
+    Retorna {"items", "next_cursor", "total"}; total solo se calcula en la
+    primera página (sin cursor) para no repetir el COUNT al paginar.
+    """
+    conditions = []
     params = []
     if status:
-        q += " WHERE o.status = ?"
+        conditions.append("o.status = ?")
         params.append(status)
-    q += " ORDER BY o.created_at DESC"
-    rows = conn.execute(q, params).fetchall()
+    if course_id:
+        conditions.append("o.course_id = ?")
+        params.append(int(course_id))
+    if payment_method:
+        conditions.append("o.payment_method = ?")
+        params.append(payment_method)
+    start = _date_bound(date_from)
+    if start:
+        conditions.append("o.created_at >= ?")
+        params.append(start)
+    end = _date_bound(date_to, end=True)
+    if end:
+        conditions.append("o.created_at < ?")
+        params.append(end)
+    prefix = (email_prefix or "").strip().lower()
+    if prefix:
+        # Rango en vez de LIKE para que el índice sobre student_email aplique.
+        conditions.append("o.student_email >= ? AND o.student_email < ?")
+        params.extend([prefix, prefix + "\U0010ffff"])
+    limit = max(1, min(int(limit or 50), ORDERS_PAGE_MAX))
+
+    conn = get_read_conn()
+    total = None
+    if not cursor:
+        count_sql = "SELECT COUNT(*) AS c FROM orders o"
+        if conditions:
+            count_sql += " WHERE " + " AND ".join(conditions)
+        total = conn.execute(count_sql, params).fetchone()["c"]
+
+    page_conditions = list(conditions)
+    page_params = list(params)
+    if cursor:
+        created_at, last_id = _decode_cursor(cursor, 2)
+        page_conditions.append("(o.created_at < ? OR (o.created_at = ? AND o.id < ?))")
+        page_params.extend([created_at, created_at, last_id])
+    q = "SELECT o.*, c.slug AS course_slug FROM orders o LEFT JOIN courses c ON o.course_id = c.id"
+    if page_conditions:
+        q += " WHERE " + " AND ".join(page_conditions)
+    q += " ORDER BY o.created_at DESC, o.id DESC LIMIT ?"
+    page_params.append(limit + 1)
+    rows = conn.execute(q, page_params).fetchall()
     conn.close()
-    return [dict(r) for r in rows]
 
+    items = [dict(r) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit and items:
+        next_cursor = _encode_cursor(items[-1]["created_at"], items[-1]["id"])
+    return {"items": items, "next_cursor": next_cursor, "total": total}
 
-def fetch_students():
-    """Retorna alumnos únicos (por email) con resumen de sus órdenes."""
-    conn = get_conn()
-    rows = conn.execute("""
-        SELECT
-            o.student_email,
-            o.student_name,
-            o.moodle_user_email,
-            COUNT(o.id)                                          AS total_orders,
-            SUM(CASE WHEN o.status='paid' THEN 1 ELSE 0 END)    AS paid_orders,
-            SUM(CASE WHEN o.status='paid' THEN o.amount ELSE 0 END) AS total_paid,
-            SUM(CASE WHEN o.moodle_enrolled=1 THEN 1 ELSE 0 END) AS enrolled_count,
-            MAX(o.created_at)                                    AS last_order_at
-        FROM orders o
-        GROUP BY o.student_email
-        ORDER BY last_order_at DESC
-    """).fetchall()
+
+def fetch_students(search=None, limit=50, cursor=None):
+    """
+    Alumnos únicos (por email) con resumen de sus órdenes, desde student_stats.
+    Paginado por cursor (last_order_at, student_email) descendente; search
+    filtra por email o nombre. Retorna {"items", "next_cursor", "total"}.
+    """
+    conditions = []
+    params = []
+    term = (search or "").strip().lower()
+    if term:
+        like = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        conditions.append("(student_email LIKE ? ESCAPE '\\' OR lower(student_name) LIKE ? ESCAPE '\\')")
+        params.extend([like, like])
+    limit = max(1, min(int(limit or 50), ORDERS_PAGE_MAX))
+
+    conn = get_read_conn()
+    total = None
+    if not cursor:
+        count_sql = "SELECT COUNT(*) AS c FROM student_stats"
+        if conditions:
+            count_sql += " WHERE " + " AND ".join(conditions)
+        total = conn.execute(count_sql, params).fetchone()["c"]
+    page_conditions = list(conditions)
+    page_params = list(params)
+    if cursor:
+        last_order_at, email = _decode_cursor(cursor, 2)
+        page_conditions.append("(last_order_at < ? OR (last_order_at = ? AND student_email < ?))")
+        page_params.extend([last_order_at, last_order_at, email])
+    q = (
+        "SELECT student_email, student_name, moodle_user_email, total_orders, paid_orders, "
+        "total_paid, enrolled_count, last_order_at FROM student_stats"
+    )
+    if page_conditions:
+        q += " WHERE " + " AND ".join(page_conditions)
+    q += " ORDER BY last_order_at DESC, student_email DESC LIMIT ?"
+    page_params.append(limit + 1)
+    rows = conn.execute(q, page_params).fetchall()
     conn.close()
-    return [dict(r) for r in rows]
+
+    items = [dict(r) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit and items:
+        next_cursor = _encode_cursor(items[-1]["last_order_at"], items[-1]["student_email"])
+    return {"items": items, "next_cursor": next_cursor, "total": total}
 
 
 def fetch_student_orders(student_email):
     """Retorna todas las órdenes de un alumno específico."""
-    conn = get_conn()
+    conn = get_read_conn()
     rows = conn.execute("""
         SELECT o.*, c.slug AS course_slug, c.moodle_course_id
         FROM orders o
@@ -1337,10 +1767,94 @@ def fetch_student_orders(student_email):
     return [dict(r) for r in rows]
 
 
+# --- Exportaciones completas (CSV / NDJSON) ---
+
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "500"))
+
+# tipo -> (SELECT sin WHERE, columna de fecha para from/to, clave de avance)
+# La clave es única y tiene índice, así cada bloque sigue desde la última fila.
+EXPORTS = {
+    "subscriptions": (
+        "SELECT id, email, created_at FROM subscriptions",
+        "created_at",
+        ("created_at", "id"),
+    ),
+    "contact_messages": (
+        "SELECT id, name, email, phone, subject, message, status, created_at FROM contact_messages",
+        "created_at",
+        ("created_at", "id"),
+    ),
+    "orders": (
+        "SELECT o.*, c.slug AS course_slug FROM orders o LEFT JOIN courses c ON o.course_id = c.id",
+        "o.created_at",
+        ("o.created_at", "o.id"),
+    ),
+    "students": (
+        "SELECT student_email, student_name, moodle_user_email, total_orders, paid_orders, "
+        "total_paid, enrolled_count, last_order_at FROM student_stats",
+        "last_order_at",
+        ("student_email",),
+    ),
+}
+
+
+def export_rows(kind, date_from=None, date_to=None, chunk_size=None):
+    """
+    Prepara la exportación completa de una tabla de EXPORTS filtrada por
+    fecha. Retorna (columnas, bloques): bloques es un generador de listas de
+    tuplas de a EXPORT_CHUNK_ROWS filas. Cada bloque es una consulta corta
+    que sigue desde la clave de la última fila, así la memoria no depende del
+    tamaño de la tabla y no queda una lectura abierta mientras el cliente
+    descarga. Fechas inválidas lanzan ValueError antes de empezar.
+    """
+    select, date_column, key = EXPORTS[kind]
+    conditions = []
+    params = []
+    start = _date_bound(date_from)
+    if start:
+        conditions.append(f"{date_column} >= ?")
+        params.append(start)
+    end = _date_bound(date_to, end=True)
+    if end:
+        conditions.append(f"{date_column} < ?")
+        params.append(end)
+    conn = get_read_conn()
+    try:
+        columns = [d[0] for d in conn.execute(select + " LIMIT 0").description]
+    finally:
+        conn.close()
+    key_positions = [columns.index(col.split(".")[-1]) for col in key]
+    return columns, _iter_export(select, conditions, params, key, key_positions, chunk_size or EXPORT_CHUNK_ROWS)
+
+
+def _iter_export(select, conditions, params, key, key_positions, chunk_size):
+    order = ", ".join(key)
+    after = f"({order}) > ({', '.join('?' * len(key))})"
+    last = None
+    conn = get_read_conn()
+    try:
+        while True:
+            where = conditions + ([after] if last is not None else [])
+            q = select
+            if where:
+                q += " WHERE " + " AND ".join(where)
+            q += f" ORDER BY {order} LIMIT ?"
+            rows = conn.execute(q, params + (last or []) + [chunk_size]).fetchall()
+            if not rows:
+                return
+            chunk = [tuple(r) for r in rows]
+            yield chunk
+            if len(rows) < chunk_size:
+                return
+            last = [chunk[-1][i] for i in key_positions]
+    finally:
+        conn.close()
+
+
 # --- Admin auth helpers ---
 
 def fetch_admin_by_username(username):
-    conn = get_conn()
+    conn = get_read_conn()
     row = conn.execute(
         "SELECT * FROM admin_users WHERE username = ?",
         (username,),
@@ -1350,7 +1864,7 @@ def fetch_admin_by_username(username):
 
 
 def fetch_admin_by_id(admin_id):
-    conn = get_conn()
+    conn = get_read_conn()
     row = conn.execute(
         "SELECT * FROM admin_users WHERE id = ?",
         (admin_id,),
@@ -1360,7 +1874,7 @@ def fetch_admin_by_id(admin_id):
 
 
 def list_admins():
-    conn = get_conn()
+    conn = get_read_conn()
     rows = conn.execute(
         "SELECT id, username, role, active, created_at, updated_at FROM admin_users ORDER BY id ASC"
     ).fetchall()
@@ -1369,16 +1883,15 @@ def list_admins():
 
 
 def admins_exist():
-    conn = get_conn()
+    conn = get_read_conn()
     count = conn.execute("SELECT COUNT(*) AS c FROM admin_users").fetchone()["c"]
     conn.close()
     return count > 0
 
 
 def create_admin_user(username, password, role="editor", active=True):
-    now = datetime.utcnow().isoformat()
-    conn = get_conn()
-    with conn:
+    now = utc_timestamp()
+    with write_conn() as conn:
         cur = conn.execute(
             """
             INSERT INTO admin_users (username, password_hash, role, active, created_at, updated_at)
@@ -1393,8 +1906,7 @@ def create_admin_user(username, password, role="editor", active=True):
                 now,
             ),
         )
-    admin_id = cur.lastrowid
-    conn.close()
+        admin_id = cur.lastrowid
     return admin_id
 
 
@@ -1416,23 +1928,21 @@ def update_admin_user(admin_id, role=None, active=None, password=None, username=
     if not fields:
         return
     fields.append("updated_at = ?")
-    values.append(datetime.utcnow().isoformat())
+    values.append(utc_timestamp())
     values.append(admin_id)
-    conn = get_conn()
-    with conn:
+    with write_conn() as conn:
         conn.execute(
             f"UPDATE admin_users SET {', '.join(fields)} WHERE id = ?",
             values,
         )
-    conn.close()
+    invalidate_admin_cache()
 
 
 def delete_admin_user(admin_id):
-    conn = get_conn()
-    with conn:
+    with write_conn() as conn:
         conn.execute("DELETE FROM admin_users WHERE id = ?", (admin_id,))
         conn.execute("DELETE FROM admin_sessions WHERE admin_id = ?", (admin_id,))
-    conn.close()
+    invalidate_admin_cache()
 
 
 def authenticate_admin(username, password):
@@ -1444,58 +1954,133 @@ def authenticate_admin(username, password):
     return admin
 
 
+def sweep_expired_admin_sessions(conn=None):
+    """Elimina sesiones admin vencidas. Usa el índice sobre expires_at."""
+    now = utc_timestamp()
+    if conn is not None:
+        return conn.execute("DELETE FROM admin_sessions WHERE expires_at <= ?", (now,)).rowcount
+    with write_conn() as conn:
+        deleted = conn.execute("DELETE FROM admin_sessions WHERE expires_at <= ?", (now,)).rowcount
+    return deleted
+
+
 def create_admin_session(admin_id, ttl_hours=8):
     now = datetime.utcnow()
     expires_at = now + timedelta(hours=ttl_hours)
     token = secrets.token_urlsafe(32)
-    conn = get_conn()
-    with conn:
+    with write_conn() as conn:
+        # Limpieza oportunista: cada login purga las sesiones ya vencidas.
+        sweep_expired_admin_sessions(conn)
         conn.execute(
             """
             INSERT INTO admin_sessions (admin_id, token, created_at, expires_at)
             VALUES (?, ?, ?, ?)
             """,
-            (admin_id, token, now.isoformat(), expires_at.isoformat()),
+            (admin_id, _token_hash(token), utc_timestamp(now), utc_timestamp(expires_at)),
         )
-    conn.close()
-    return token, expires_at.isoformat()
+    return token, utc_timestamp(expires_at)
+
+
+# Caché por worker de tokens admin ya validados: evita el JOIN
+# admin_sessions/admin_users en cada request autenticado. Se invalida por TTL
+# y por el sello de versión "admin_auth" (logout, cambios de rol, borrado).
+ADMIN_CACHE_TTL = int(os.environ.get("ADMIN_CACHE_TTL", "60"))
+ADMIN_CACHE_MAX_ENTRIES = 1024
+_ADMIN_AUTH_VERSION = "admin_auth"
+_admin_cache = {}
+_admin_cache_lock = threading.Lock()
+_admin_cache_version = None
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _admin_cache_get(key):
+    global _admin_cache_version
+    version = read_version(_ADMIN_AUTH_VERSION)
+    with _admin_cache_lock:
+        if version != _admin_cache_version:
+            _admin_cache.clear()
+            _admin_cache_version = version
+            metrics.cache_result("admin_auth", False)
+            return None, version
+        entry = _admin_cache.get(key)
+        if not entry:
+            metrics.cache_result("admin_auth", False)
+            return None, version
+        data, cached_until = entry
+        expires_at = data.get("expires_at") or ""
+        if cached_until <= time.monotonic() or (expires_at and expires_at < utc_timestamp()):
+            _admin_cache.pop(key, None)
+            metrics.cache_result("admin_auth", False)
+            return None, version
+        metrics.cache_result("admin_auth", True)
+        return dict(data), version
+
+
+def _admin_cache_put(key, data, version):
+    if ADMIN_CACHE_TTL <= 0:
+        return
+    now = time.monotonic()
+    with _admin_cache_lock:
+        # Si otro thread invalidó mientras consultábamos, no guardar datos viejos.
+        if version != _admin_cache_version:
+            return
+        if len(_admin_cache) >= ADMIN_CACHE_MAX_ENTRIES:
+            for stale_key in [k for k, (_, until) in _admin_cache.items() if until <= now]:
+                del _admin_cache[stale_key]
+            if len(_admin_cache) >= ADMIN_CACHE_MAX_ENTRIES:
+                _admin_cache.clear()
+        _admin_cache[key] = (dict(data), now + ADMIN_CACHE_TTL)
+
+
+def invalidate_admin_cache():
+    """Invalida el caché de sesiones admin en todos los workers."""
+    global _admin_cache_version
+    version = bump_version(_ADMIN_AUTH_VERSION)
+    with _admin_cache_lock:
+        _admin_cache.clear()
+        _admin_cache_version = version
 
 
 def get_admin_by_token(token):
     if not token:
         return None
-    conn = get_conn()
+    key = _token_hash(token)
+    cached, version = _admin_cache_get(key)
+    if cached is not None:
+        return cached
+    conn = get_read_conn()
     row = conn.execute(
         """
         SELECT u.id, u.username, u.role, u.active, s.token, s.expires_at
         FROM admin_sessions s
         JOIN admin_users u ON u.id = s.admin_id
-        WHERE s.token = ?
+        WHERE s.token = ? AND s.expires_at > ? AND u.active = 1
         """,
-        (token,),
+        (key, utc_timestamp()),
     ).fetchone()
     conn.close()
     if not row:
         return None
     data = dict(row)
-    if not data.get("active"):
-        return None
-    expires_at = data.get("expires_at") or ""
-    if expires_at and expires_at < datetime.utcnow().isoformat():
-        return None
+    _admin_cache_put(key, data, version)
     return data
 
 
 def revoke_admin_session(token):
-    conn = get_conn()
-    with conn:
-        conn.execute("DELETE FROM admin_sessions WHERE token = ?", (token,))
+    if not token:
+        return
+    with write_conn() as conn:
+        conn.execute("DELETE FROM admin_sessions WHERE token = ?", (_token_hash(token),))
+    invalidate_admin_cache()
 
 
 # ─── Payment config ───────────────────────────────────────────────────────────
 
 def get_payment_config():
-    conn = get_conn()
+    conn = get_read_conn()
     row = conn.execute("SELECT * FROM payment_config WHERE id = 1").fetchone()
     conn.close()
     if not row:
@@ -1510,8 +2095,7 @@ def get_payment_config():
 
 def save_payment_config(payload):
     bank_accounts = json.dumps(payload.get("bank_accounts") or [])
-    conn = get_conn()
-    with conn:
+    with write_conn() as conn:
         conn.execute(
             """
             INSERT INTO payment_config (id, yape_number, yape_qr_url, plin_number, plin_qr_url, bank_accounts)
@@ -1531,5 +2115,3 @@ def save_payment_config(payload):
                 bank_accounts,
             ),
         )
-    conn.close()
-    conn.close()
@@ -0,0 +1,203 @@
+"""
+Snapshots estáticos de las páginas públicas.
+
+Cada snapshot es el HTML original de la página con las respuestas que necesita
+para el primer render (partials de header/footer/hero y los GET de la API)
+incrustadas en un <script type="application/json" id="prerender-data">.
+config.js lee ese bloque y responde esos fetch desde memoria, así que el primer
+paint no hace ninguna llamada; el render sigue siendo el de los scripts de cada
+página.
+
+Nginx sirve el snapshot con try_files si existe (ver deploy/nginx.conf) y cae
+al HTML original si no. Los snapshots se regeneran en segundo plano cuando el
+admin guarda contenido, solo si la carpeta ya existe (la crea el paso de
+publicación):
+
+    python prerender.py
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import uuid
+from pathlib import Path
+
+FRONTEND_DIR = Path(__file__).resolve().parent.parent / "frontend"
+PRERENDER_DIR = Path(os.environ.get("PRERENDER_DIR") or FRONTEND_DIR / "prerendered")
+PRERENDER_PAGES = ("index.html", "servicios.html", "nosotros.html", "kdbweb.html", "kdbweb-*.html")
+
+# Endpoints que consultan header.js/footer.js en todas las páginas
+COMMON_PATHS = ("/api/pages", "/api/company", "/api/kdbweb")
+PARTIALS = ("partials/header.html", "partials/footer.html")
+
+_BODY_RE = re.compile(r"<body\b([^>]*)>", re.IGNORECASE)
+_ATTR_RE = re.compile(r'data-([\w-]+)="([^"]*)"')
+_CONFIG_SCRIPT_RE = re.compile(r'<script src="\./js/config\.js[^"]*"></script>')
+
+# _draining se lee y cambia solo bajo _pending_lock: un hilo que vio la cola
+# vacía ya no atiende nada aunque siga vivo un instante.
+_pending = set()
+_pending_lock = threading.Lock()
+_draining = False
+
+
+def _reset_after_fork():
+    global _pending, _pending_lock, _draining
+    _pending = set()
+    _pending_lock = threading.Lock()
+    _draining = False
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def page_files():
+    files = []
+    for pattern in PRERENDER_PAGES:
+        files.extend(sorted(FRONTEND_DIR.glob(pattern)))
+    return files
+
+
+def _body_attrs(html):
+    match = _BODY_RE.search(html)
+    return dict(_ATTR_RE.findall(match.group(1))) if match else {}
+
+
+def page_sources(html, allowed_pages):
+    """Partials y rutas GET que la página pide antes de pintar."""
+    attrs = _body_attrs(html)
+    partials = list(PARTIALS)
+    if 'id="site-hero"' in html:
+        partials.append("partials/hero.html")
+    paths = list(COMMON_PATHS)
+    page = attrs.get("page")
+    if page in allowed_pages:
+        paths.append(f"/api/page/{page}")
+    slug = attrs.get("kdbweb")
+    if slug:
+        paths.append(f"/api/kdbweb/{slug}")
+    if attrs.get("katweb-type") == "tribunal-fiscal":
+        paths.append("/api/katweb/boletines")
+    return page, partials, paths
+
+
+def _script_json(data):
+    # "</" y "<!--" no pueden aparecer dentro de un <script>
+    text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return text.replace("<", "\\u003c")
+
+
+def render_page(client, path, allowed_pages):
+    """HTML del snapshot o None si la página no carga config.js."""
+    html = path.read_text(encoding="utf-8-sig")
+    if not _CONFIG_SCRIPT_RE.search(html):
+        return None
+    _, partials, paths = page_sources(html, allowed_pages)
+    responses = {}
+    for partial in partials:
+        partial_path = FRONTEND_DIR / partial
+        if partial_path.exists():
+            responses[partial] = {"type": "text/html", "body": partial_path.read_text(encoding="utf-8-sig")}
+    for api_path in paths:
+        resp = client.get(api_path)
+        # Lo que no responde 200 (p. ej. una página oculta) se pide en vivo
+        if resp.status_code == 200:
+            responses[api_path] = {"type": resp.mimetype, "body": resp.get_data(as_text=True)}
+    block = f'<script type="application/json" id="prerender-data">{_script_json(responses)}</script>\n  '
+    match = _CONFIG_SCRIPT_RE.search(html)
+    return html[: match.start()] + block + html[match.start():]
+
+
+def _write(target, html):
+    # Temporal propio de cada escritor: dos workers que regeneran a la vez no
+    # comparten archivo, y os.replace publica siempre un HTML completo.
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    try:
+        tmp.write_text(html, encoding="utf-8")
+        os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def render_pages(app, pages=None, allowed_pages=()):
+    """
+    Regenera los snapshots. pages filtra por data-page (p. ej. {"home"});
+    None regenera todos. Retorna la lista de archivos escritos.
+    """
+    PRERENDER_DIR.mkdir(parents=True, exist_ok=True)
+    written = []
+    client = app.test_client()
+    for path in page_files():
+        if pages is not None:
+            page, _, _ = page_sources(path.read_text(encoding="utf-8-sig"), allowed_pages)
+            if page not in pages:
+                continue
+        html = render_page(client, path, allowed_pages)
+        target = PRERENDER_DIR / path.name
+        if html is None:
+            if target.exists():
+                target.unlink()
+            continue
+        _write(target, html)
+        written.append(path.name)
+    return written
+
+
+def schedule_refresh(app, page=None, allowed_pages=()):
+    """
+    Encola la regeneración tras un guardado del admin. page=None (empresa,
+    visibilidad, KDBWEB, URLs de media) afecta el header/footer de todas.
+    Los guardados seguidos se agrupan en una sola pasada por hilo.
+    """
+    global _draining
+    if not PRERENDER_DIR.is_dir():
+        return
+    with _pending_lock:
+        _pending.add(page)
+        if _draining:
+            return
+        _draining = True
+    threading.Thread(target=_drain, args=(app, allowed_pages), daemon=True).start()
+
+
+def _drain(app, allowed_pages):
+    global _draining
+    try:
+        while True:
+            with _pending_lock:
+                if not _pending:
+                    _draining = False
+                    return
+                pages = None if None in _pending else set(_pending)
+                _pending.clear()
+            try:
+                written = render_pages(app, pages, allowed_pages)
+                app.logger.info("prerender: %d snapshots (%s)", len(written), "todas" if pages is None else ",".join(sorted(pages)))
+            except Exception:
+                app.logger.exception("prerender: fallo regenerando snapshots")
+    except BaseException:
+        # Si el hilo muere, el próximo guardado debe poder arrancar otro
+        with _pending_lock:
+            _draining = False
+        raise
+
+
+def main():
+    sys.path.insert(0, str(Path(__file__).parent))
+    os.environ.setdefault("REQUEST_LOG", "0")
+    from app import ALLOWED_PAGES, app
+    from db import init_db
+
+    init_db()
+    written = render_pages(app, allowed_pages=ALLOWED_PAGES)
+    for name in written:
+        print(f"[prerender] {PRERENDER_DIR / name}")
+    print(f"{len(written)} snapshots")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Profiler por muestreo para workers en vivo.
+
+Un hilo toma cada intervalo la pila de los demás hilos del proceso con
+sys._current_frames() y cuenta cada pila completa; no instrumenta llamadas,
+así que el costo no depende de lo que haga el código perfilado. El resultado
+se exporta como pilas colapsadas (flamegraph.pl, inferno) o JSON de
+speedscope (https://www.speedscope.app).
+
+Dos modos:
+  - capture(): perfila todo el worker durante N segundos (endpoint admin).
+  - por request: con el header X-Profile de un admin super, se muestrea solo
+    el hilo de ese request; el perfil se guarda en PROFILE_DIR y la respuesta
+    trae X-Profile-Id para descargarlo desde cualquier worker.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+import metrics
+
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "30"))
+PROFILE_COOLDOWN_SECONDS = float(os.environ.get("PROFILE_COOLDOWN_SECONDS", "30"))
+PROFILE_REQUEST_INTERVAL_MS = float(os.environ.get("PROFILE_REQUEST_INTERVAL_MS", "1"))
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR") or metrics.METRICS_DIR / "profiles")
+PROFILE_KEEP = 50
+FORMATS = ("collapsed", "speedscope")
+
+_PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_capture_lock = threading.Lock()
+_last_capture = 0.0
+
+
+class ProfilerBusy(Exception):
+    """Ya hay una captura en curso o no pasó el tiempo mínimo entre capturas."""
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """Muestrea las pilas de thread_ids (o de todos los hilos salvo exclude)."""
+
+    def __init__(self, interval, thread_ids=None, exclude=()):
+        self.interval = max(0.0005, interval)
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.exclude = set(exclude)
+        self.stacks = {}
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident == own or ident in self.exclude:
+                    continue
+                if self.thread_ids is not None and ident not in self.thread_ids:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                thread_name = names.get(ident, f"thread-{ident}")
+                self.stacks.setdefault(thread_name, Counter())[tuple(reversed(stack))] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+        self.duration = time.perf_counter() - start
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "interval": self.interval,
+            "samples": self.samples,
+            "pid": os.getpid(),
+            "threads": {name: [[list(stack), count] for stack, count in counter.items()]
+                        for name, counter in self.stacks.items()},
+        }
+
+
+def to_collapsed(profile):
+    lines = []
+    for thread_name, stacks in sorted(profile["threads"].items()):
+        for stack, count in stacks:
+            lines.append(";".join([thread_name] + list(stack)) + f" {count}")
+    return "\n".join(sorted(lines)) + "\n"
+
+
+def to_speedscope(profile, name="kdbweb"):
+    frames = []
+    index = {}
+
+    def frame_id(label):
+        if label not in index:
+            func, _, location = label.partition(" (")
+            file, _, line = location.rstrip(")").rpartition(":")
+            index[label] = len(frames)
+            frames.append({"name": func, "file": file, "line": int(line) if line.isdigit() else None})
+        return index[label]
+
+    interval_ms = profile["interval"] * 1000
+    profiles = []
+    for thread_name, stacks in sorted(profile["threads"].items()):
+        samples = [[frame_id(label) for label in stack] for stack, _ in stacks]
+        weights = [count * interval_ms for _, count in stacks]
+        profiles.append({
+            "type": "sampled",
+            "name": f"{thread_name} (pid {profile['pid']})",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        })
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "kdbweb profiler",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": profiles,
+    }
+
+
+def render(profile, fmt):
+    """(cuerpo, mimetype) del perfil en el formato pedido."""
+    if fmt == "speedscope":
+        return json.dumps(to_speedscope(profile)), "application/json"
+    return to_collapsed(profile), "text/plain"
+
+
+def capture(seconds, interval_ms=5.0, exclude=()):
+    """Perfila el worker actual; a lo sumo una captura a la vez y con cooldown."""
+    global _last_capture
+    if not _capture_lock.acquire(blocking=False):
+        raise ProfilerBusy("Ya hay una captura en curso en este worker")
+    try:
+        wait = PROFILE_COOLDOWN_SECONDS - (time.monotonic() - _last_capture)
+        if _last_capture and wait > 0:
+            raise ProfilerBusy(f"Espera {int(wait) + 1}s antes de otra captura")
+        seconds = max(0.1, min(float(seconds), PROFILE_MAX_SECONDS))
+        sampler = Sampler(interval_ms / 1000, exclude=exclude).start()
+        time.sleep(seconds)
+        sampler.stop()
+        _last_capture = time.monotonic()
+        return sampler.to_dict()
+    finally:
+        _capture_lock.release()
+
+
+def save(profile):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    tmp = PROFILE_DIR / f".{profile_id}.tmp"
+    tmp.write_text(json.dumps(profile), encoding="utf-8")
+    os.replace(tmp, PROFILE_DIR / f"{profile_id}.json")
+    saved = sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for old in saved[:-PROFILE_KEEP]:
+        old.unlink(missing_ok=True)
+    return profile_id
+
+
+def load(profile_id):
+    if not _PROFILE_ID_RE.match(profile_id or ""):
+        return None
+    try:
+        return json.loads((PROFILE_DIR / f"{profile_id}.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def init_profiler(app, is_allowed):
+    """
+    Activa el modo por request: si llega X-Profile y is_allowed() lo permite
+    (admin super), se muestrea el hilo del request y se responde X-Profile-Id.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _profile_start():
+        if not request.headers.get("X-Profile") or not is_allowed():
+            return
+        g.profile_sampler = Sampler(
+            PROFILE_REQUEST_INTERVAL_MS / 1000, thread_ids={threading.get_ident()}
+        ).start()
+
+    @app.after_request
+    def _profile_finish(response):
+        sampler = g.pop("profile_sampler", None)
+        if sampler is None:
+            return response
+        sampler.stop()
+        profile = sampler.to_dict()
+        profile["request"] = f"{request.method} {request.full_path.rstrip('?')}"
+        try:
+            response.headers["X-Profile-Id"] = save(profile)
+        except OSError:
+            app.logger.exception("profiler: no se pudo guardar el perfil")
+        return response
+
+    @app.teardown_request
+    def _profile_teardown(exc):
+        # Si el request terminó sin pasar por after_request, que el hilo no quede vivo
+        sampler = g.pop("profile_sampler", None)
+        if sampler is not None:
+            sampler.stop()
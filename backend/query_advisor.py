@@ -0,0 +1,183 @@
+"""
+Asesor de índices (solo desarrollo).
+
+Recorre models.py, extrae cada sentencia SQL literal y ejecuta EXPLAIN QUERY
+PLAN contra una base creada con init_db. Marca los recorridos completos de
+tabla (SCAN sin índice) y los ordenamientos con TEMP B-TREE.
+
+Uso:
+    python query_advisor.py                 # base temporal vacía
+    python query_advisor.py --db copia.db   # contra una copia de producción
+    python query_advisor.py --strict        # exit 1 si hay advertencias
+
+Las consultas armadas en tiempo de ejecución (condiciones dinámicas,
+f-strings con nombres de tabla) no se pueden analizar estáticamente; se
+listan como omitidas con su número de línea.
+"""
+
+import argparse
+import ast
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+MODELS_PATH = Path(__file__).parent / "models.py"
+SQL_PREFIXES = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+def _fold(node):
+    """Devuelve el string si el nodo es un literal o una suma de literales."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left = _fold(node.left)
+        right = _fold(node.right)
+        if left is not None and right is not None:
+            return left + right
+    return None
+
+
+def _looks_like_sql(text):
+    words = text.upper().split()
+    if not words or words[0] not in SQL_PREFIXES:
+        return False
+    return words[0] == "UPDATE" or "FROM" in words or "INTO" in words
+
+
+def _extended_names(func):
+    """Variables que se amplían con += o se concatenan: su literal inicial es un prefijo."""
+    names = set()
+    for node in ast.walk(func):
+        if isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+            names.add(node.target.id)
+        elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            for side in (node.left, node.right):
+                if isinstance(side, ast.Name):
+                    names.add(side.id)
+    return names
+
+
+def extract_statements(path=MODELS_PATH):
+    """Retorna (sentencias, omitidas) como listas de (función, línea, sql)."""
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    statements = []
+    skipped = []
+    for func in ast.walk(tree):
+        if not isinstance(func, ast.FunctionDef):
+            continue
+        consumed = set()
+        extended = _extended_names(func)
+        for node in ast.walk(func):
+            if id(node) in consumed:
+                continue
+            if (
+                isinstance(node, ast.Assign)
+                and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name)
+                and node.targets[0].id in extended
+            ):
+                literal = _fold(node.value)
+                if literal is not None:
+                    if _looks_like_sql(literal):
+                        skipped.append((func.name, node.lineno, " ".join(literal.split())))
+                    for child in ast.walk(node.value):
+                        consumed.add(id(child))
+                continue
+            if isinstance(node, ast.JoinedStr):
+                parts = "".join(v.value for v in node.values if isinstance(v, ast.Constant))
+                if _looks_like_sql(parts):
+                    skipped.append((func.name, node.lineno, " ".join(parts.split())))
+                for child in ast.walk(node):
+                    consumed.add(id(child))
+                continue
+            text = _fold(node)
+            if text is None:
+                if isinstance(node, ast.BinOp):
+                    literal = _fold(node.left) or ""
+                    if _looks_like_sql(literal):
+                        skipped.append((func.name, node.lineno, " ".join(literal.split())))
+                        for child in ast.walk(node.left):
+                            consumed.add(id(child))
+                continue
+            for child in ast.walk(node):
+                consumed.add(id(child))
+            if _looks_like_sql(text):
+                statements.append((func.name, node.lineno, " ".join(text.split())))
+    statements.sort(key=lambda item: item[1])
+    skipped.sort(key=lambda item: item[1])
+    return statements, skipped
+
+
+def explain(conn, sql):
+    params = [None] * sql.count("?")
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [row[3] for row in rows]
+
+
+def classify(plan):
+    warnings = []
+    for detail in plan:
+        upper = detail.upper()
+        if upper.startswith("SCAN ") and " USING " not in upper:
+            warnings.append("full scan: " + detail)
+        if "USE TEMP B-TREE" in upper:
+            warnings.append("temp b-tree: " + detail)
+    return warnings
+
+
+def _open_db(db_path):
+    if db_path:
+        # Solo lectura: el asesor nunca modifica la base analizada
+        return sqlite3.connect(f"file:{Path(db_path).resolve()}?mode=ro", uri=True)
+    tmp_dir = tempfile.mkdtemp(prefix="query_advisor_")
+    os.environ["DB_PATH"] = str(Path(tmp_dir) / "advisor.db")
+    sys.path.insert(0, str(Path(__file__).parent))
+    import db
+
+    db.init_db()
+    return sqlite3.connect(db.DB_PATH)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN sobre el SQL de models.py")
+    parser.add_argument("--db", help="base SQLite a analizar (por defecto una temporal vacía)")
+    parser.add_argument("--strict", action="store_true", help="exit 1 si hay advertencias")
+    parser.add_argument("--all", action="store_true", help="mostrar también los planes sin advertencias")
+    args = parser.parse_args(argv)
+
+    statements, skipped = extract_statements()
+    conn = _open_db(args.db)
+    flagged = 0
+    errors = 0
+    for func_name, lineno, sql in statements:
+        try:
+            plan = explain(conn, sql)
+        except sqlite3.Error as exc:
+            errors += 1
+            print(f"[error] models.py:{lineno} {func_name}: {exc}\n    {sql[:160]}")
+            continue
+        warnings = classify(plan)
+        if warnings:
+            flagged += 1
+        if warnings or args.all:
+            tag = "warn" if warnings else "ok"
+            print(f"[{tag}] models.py:{lineno} {func_name}\n    {sql[:160]}")
+            for line in warnings or plan:
+                print(f"      - {line}")
+    conn.close()
+
+    for func_name, lineno, sql in skipped:
+        print(f"[skip] models.py:{lineno} {func_name} (SQL dinámico): {sql[:120]}")
+    print(
+        f"\n{len(statements)} sentencias analizadas, {flagged} con advertencias, "
+        f"{errors} con error, {len(skipped)} omitidas"
+    )
+    if args.strict and (flagged or errors):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
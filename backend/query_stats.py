@@ -0,0 +1,205 @@
+"""
+Estadísticas por huella de consulta y log de consultas lentas.
+
+La huella es la sentencia con los literales reemplazados por ? y las listas
+IN (?, ?, ...) colapsadas, así que "WHERE id = 3" y "WHERE id = 7" cuentan
+juntas. Por huella se guardan conteo, tiempo total, filas y una muestra de
+las últimas duraciones para p50/p99.
+
+Las consultas que superan SLOW_QUERY_MS se registran en el logger
+"slow_query" junto con su EXPLAIN QUERY PLAN (una vez por huella y proceso).
+Igual que metrics.py, cada worker vuelca su tabla a METRICS_DIR y
+top_queries() suma las de todos; la de un worker que terminó se pliega en
+queries-exited.json (worker_exited, desde child_exit de gunicorn).
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import metrics
+from db import add_query_observer
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+QUERY_STATS_ENABLED = (os.environ.get("QUERY_STATS_ENABLED") or "1").lower() in ("1", "true", "yes", "on")
+SAMPLE_SIZE = 256
+MAX_FINGERPRINTS = 2000
+SORT_KEYS = ("total_ms", "count", "p50_ms", "p99_ms", "rows")
+
+logger = logging.getLogger("slow_query")
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+# Lo que puede contener un "?" que no es parámetro: literales, identificadores
+# entre comillas o corchetes y comentarios
+_NOT_PARAM_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?(?:\*/|$)", re.DOTALL)
+_BINDINGS_RE = re.compile(r"uses (\d+)")
+
+_lock = threading.Lock()
+_stats = {}
+_explained = set()
+_local = threading.local()
+_last_flush = 0.0
+
+
+def _reset_after_fork():
+    global _lock, _last_flush
+    _lock = threading.Lock()
+    _stats.clear()
+    _explained.clear()
+    _last_flush = 0.0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def fingerprint(sql):
+    text = _STRING_RE.sub("?", sql)
+    text = _NUMBER_RE.sub("?", text)
+    text = _IN_LIST_RE.sub("IN (...)", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _param_count(sql):
+    return _NOT_PARAM_RE.sub(" ", sql).count("?")
+
+
+def _explain(conn, sql):
+    """EXPLAIN QUERY PLAN en la misma conexión que ejecutó la consulta."""
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")):
+        return []
+    _local.explaining = True
+    try:
+        params = [None] * _param_count(sql)
+        try:
+            rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        except sqlite3.ProgrammingError as exc:
+            # ?NNN o un caso que la cuenta no cubre: sqlite3 informa cuántos usa
+            match = _BINDINGS_RE.search(str(exc))
+            if not match:
+                raise
+            rows = conn.execute("EXPLAIN QUERY PLAN " + sql, [None] * int(match.group(1))).fetchall()
+        return [row[3] for row in rows]
+    except Exception as exc:
+        return [f"(sin plan: {exc})"]
+    finally:
+        _local.explaining = False
+
+
+def _on_query(sql, seconds, rows, conn):
+    global _last_flush
+    if getattr(_local, "explaining", False):
+        return
+    key = fingerprint(sql)
+    with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+            if len(_stats) >= MAX_FINGERPRINTS:
+                return
+            entry = _stats[key] = {"count": 0, "total": 0.0, "rows": 0, "samples": deque(maxlen=SAMPLE_SIZE)}
+        entry["count"] += 1
+        entry["total"] += seconds
+        entry["rows"] += rows
+        entry["samples"].append(seconds)
+        first_slow = seconds * 1000 >= SLOW_QUERY_MS and key not in _explained
+        if first_slow:
+            _explained.add(key)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        plan = _explain(conn, sql) if first_slow else None
+        logger.warning(
+            "consulta lenta %.1fms filas=%d: %s%s",
+            seconds * 1000,
+            rows,
+            key[:500],
+            "".join(f"\n    plan: {line}" for line in plan) if plan else "",
+        )
+    if time.monotonic() - _last_flush >= metrics.METRICS_FLUSH_SECONDS:
+        _last_flush = time.monotonic()
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def flush():
+    with _lock:
+        data = {
+            key: {"count": e["count"], "total": e["total"], "rows": e["rows"], "samples": list(e["samples"])}
+            for key, e in _stats.items()
+        }
+    metrics.METRICS_DIR.mkdir(parents=True, exist_ok=True)
+    target = metrics.METRICS_DIR / f"queries-{os.getpid()}.json"
+    tmp = metrics.METRICS_DIR / f".queries-{os.getpid()}.{threading.get_ident()}.tmp"
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, target)
+
+
+def _add_into(merged, data):
+    for key, e in data.items():
+        acc = merged.setdefault(key, {"count": 0, "total": 0.0, "rows": 0, "samples": []})
+        acc["count"] += e["count"]
+        acc["total"] += e["total"]
+        acc["rows"] += e["rows"]
+        acc["samples"].extend(e["samples"])
+
+
+def _combine(acc, data):
+    acc = acc or {}
+    _add_into(acc, data)
+    for e in acc.values():
+        # Las muestras más recientes, igual que el deque de cada worker
+        del e["samples"][:-SAMPLE_SIZE]
+    return acc
+
+
+def worker_exited(pid):
+    """Pliega la tabla del worker pid en queries-exited.json (master de gunicorn)."""
+    metrics.fold_exited(f"queries-{pid}.json", "queries-exited.json", _combine)
+    for path in metrics.METRICS_DIR.glob(f".queries-{pid}.*.tmp"):
+        path.unlink(missing_ok=True)
+
+
+def top_queries(limit=20, sort="total_ms"):
+    """Tabla de huellas de todos los workers, ordenada de mayor a menor."""
+    flush()
+    merged = {}
+    with metrics.dir_lock():
+        for path in sorted(metrics.METRICS_DIR.glob("queries-*.json")):
+            try:
+                data = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            _add_into(merged, data)
+    table = []
+    for key, e in merged.items():
+        table.append({
+            "fingerprint": key,
+            "count": e["count"],
+            "total_ms": round(e["total"] * 1000, 3),
+            "avg_ms": round(e["total"] * 1000 / e["count"], 3) if e["count"] else 0.0,
+            "p50_ms": round(_percentile(e["samples"], 50) * 1000, 3),
+            "p99_ms": round(_percentile(e["samples"], 99) * 1000, 3),
+            "rows": e["rows"],
+        })
+    table.sort(key=lambda row: row[sort], reverse=True)
+    return table[:limit]
+
+
+def init_query_stats():
+    if QUERY_STATS_ENABLED:
+        add_query_observer(_on_query)
@@ -1,12 +1,40 @@
 import mimetypes
 import os
 import re
+import threading
 import uuid
 from urllib.parse import quote
 
-import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 
+# boto3 tarda ~100 ms en importarse y cada client() arma el modelo del
+# servicio; se importa al primer uso y se reutiliza un cliente por región
+# (los clientes de boto3 son thread-safe). Tras un fork se descartan porque
+# sus pools de conexiones no se pueden compartir entre procesos.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _reset_clients():
+    _clients.clear()
+
+
+os.register_at_fork(after_in_child=_reset_clients)
+
+
+def _s3_client(region):
+    key = region or None
+    client = _clients.get(key)
+    if client is None:
+        import boto3
+
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = boto3.client("s3", region_name=key)
+                _clients[key] = client
+    return client
+
 
 def _normalize_prefix(value):
     clean = (value or "").lstrip("/")
@@ -87,7 +115,7 @@ def upload_file_object(file_obj, filename, content_type=None, prefix_override=No
     key = f"{prefix}{uuid.uuid4().hex}_{safe_name}" if prefix else f"{uuid.uuid4().hex}_{safe_name}"
     if not content_type:
         content_type = mimetypes.guess_type(safe_name)[0] or "application/octet-stream"
-    client = boto3.client("s3", region_name=region or None)
+    client = _s3_client(region)
     try:
         client.upload_fileobj(file_obj, bucket, key, ExtraArgs={"ContentType": content_type})
     except (BotoCoreError, ClientError) as exc:
@@ -110,7 +138,7 @@ def create_presigned_post(filename, content_type=None, max_bytes=None, prefix_ov
         content_type = mimetypes.guess_type(safe_name)[0] or "application/octet-stream"
     fields = {"Content-Type": content_type}
     conditions = [{"Content-Type": content_type}, ["content-length-range", 1, max_bytes]]
-    client = boto3.client("s3", region_name=region or None)
+    client = _s3_client(region)
     try:
         post = client.generate_presigned_post(
             Bucket=bucket,
@@ -142,7 +170,7 @@ def delete_media_object(key, prefix_override=None):
     if not key:
         raise ValueError("key es obligatorio")
     _assert_key_in_prefix(key, allowed_prefixes)
-    client = boto3.client("s3", region_name=region or None)
+    client = _s3_client(region)
     try:
         client.delete_object(Bucket=bucket, Key=key)
     except (BotoCoreError, ClientError) as exc:
@@ -176,7 +204,7 @@ def rename_media_object(key, new_name, prefix_override=None):
     _assert_key_in_prefix(new_key, allowed_prefixes)
     if new_key == key:
         raise ValueError("El nombre es igual al actual")
-    client = boto3.client("s3", region_name=region or None)
+    client = _s3_client(region)
     try:
         client.head_object(Bucket=bucket, Key=new_key)
         raise ValueError("Ya existe una imagen con ese nombre")
@@ -210,7 +238,7 @@ def move_media_object(key, target_prefix, prefix_override=None):
     if new_key == key:
         raise ValueError("El archivo ya está en esa carpeta")
     _assert_key_in_prefix(new_key, allowed_prefixes)
-    client = boto3.client("s3", region_name=region or None)
+    client = _s3_client(region)
     try:
         client.head_object(Bucket=bucket, Key=new_key)
         raise ValueError("Ya existe un archivo con ese nombre en la carpeta destino")
@@ -261,7 +289,7 @@ def optimize_media_object(key, max_width=1920, jpeg_quality=82, prefix_override=
     if ext not in ("jpg", "jpeg", "png", "webp"):
         return {"key": key, "skipped": True, "reason": "formato no soportado", "saved": 0}
 
-    client = boto3.client("s3", region_name=region or None)
+    client = _s3_client(region)
     try:
         response = client.get_object(Bucket=bucket, Key=key)
     except (BotoCoreError, ClientError) as exc:
@@ -341,7 +369,7 @@ def create_media_folder(folder_name, prefix_override=None):
     key = f"{prefix}{safe_name}/" if prefix else f"{safe_name}/"
     if not _prefix_allowed(key, allowed_prefixes):
         raise ValueError("Prefijo fuera del permitido")
-    client = boto3.client("s3", region_name=region or None)
+    client = _s3_client(region)
     try:
         client.head_object(Bucket=bucket, Key=key)
         raise ValueError("La carpeta ya existe")
@@ -363,7 +391,7 @@ def list_media_objects(limit=200, prefix_override=None, continuation=None, delim
         prefix = _normalize_prefix(prefix_override)
         if prefix and not _prefix_allowed(prefix, allowed_prefixes):
             raise ValueError("Prefijo fuera del permitido")
-    client = boto3.client("s3", region_name=region or None)
+    client = _s3_client(region)
     params = {"Bucket": bucket, "MaxKeys": limit}
     if prefix:
         params["Prefix"] = prefix
@@ -409,7 +437,7 @@ def delete_media_folder(folder_prefix, prefix_override=None):
         raise ValueError("prefix es obligatorio")
     if not _prefix_allowed(folder_prefix, allowed_prefixes):
         raise ValueError("Prefijo fuera del permitido")
-    client = boto3.client("s3", region_name=region or None)
+    client = _s3_client(region)
     try:
         resp = client.list_objects_v2(Bucket=bucket, Prefix=folder_prefix, MaxKeys=2)
     except (BotoCoreError, ClientError) as exc:
@@ -0,0 +1,179 @@
+"""
+Esperas de SQLite con gevent (db._busy_retry y la fila de write_conn).
+
+Cada caso corre en un proceso aparte: monkey.patch_all() tiene que ir antes
+de importar db y no debe filtrarse al proceso de pytest.
+
+Uso (desde backend/):
+    python -m pytest -q tests
+"""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("gevent")
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+PRELUDE = textwrap.dedent(
+    """
+    from gevent import monkey
+
+    monkey.patch_all()
+
+    import json
+    import sqlite3
+    import sys
+    import time
+
+    import gevent
+
+    sys.path.insert(0, {backend!r})
+    import db
+
+    setup = db.get_conn()
+    setup.execute("PRAGMA journal_mode=WAL")
+    setup.execute("CREATE TABLE IF NOT EXISTS t (x INTEGER)")
+    setup.commit()
+    setup.close()
+
+    gaps = []
+
+
+    def ticker(stop):
+        last = time.monotonic()
+        while not stop:
+            gevent.sleep(0.01)
+            now = time.monotonic()
+            gaps.append(now - last)
+            last = now
+
+
+    def run(target, hold):
+        stop = []
+        tick = gevent.spawn(ticker, stop)
+        holder = gevent.spawn(hold)
+        gevent.sleep(0.05)
+        start = time.monotonic()
+        try:
+            result = target()
+            error = None
+        except Exception as exc:
+            result, error = None, type(exc).__name__
+        waited = time.monotonic() - start
+        holder.join()
+        stop.append(True)
+        tick.join()
+        print(json.dumps({{
+            "cooperative": db._cooperative(),
+            "result": result,
+            "error": error,
+            "waited": waited,
+            "max_gap": max(gaps),
+        }}))
+    """
+)
+
+
+def _run_case(tmp_path, body, busy_timeout):
+    script = PRELUDE.format(backend=str(BACKEND_DIR)) + textwrap.dedent(body)
+    env = {
+        **os.environ,
+        "DB_PATH": str(tmp_path / "gevent.db"),
+        "DB_BUSY_TIMEOUT": str(busy_timeout),
+        "METRICS_ENABLED": "0",
+    }
+    out = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_busy_retry_yields_while_another_connection_holds_the_lock(tmp_path):
+    report = _run_case(
+        tmp_path,
+        """
+        def hold():
+            conn = sqlite3.connect(db.DB_PATH, isolation_level=None)
+            conn.execute("BEGIN IMMEDIATE")
+            gevent.sleep(1.0)
+            conn.execute("COMMIT")
+            conn.close()
+
+
+        def insert():
+            with db.write_conn() as conn:
+                conn.execute("INSERT INTO t (x) VALUES (1)")
+            return db.get_read_conn().execute("SELECT COUNT(*) FROM t").fetchone()[0]
+
+
+        run(insert, hold)
+        """,
+        busy_timeout=5,
+    )
+    assert report["cooperative"] is True
+    assert report["error"] is None and report["result"] == 1
+    assert 0.8 <= report["waited"] < 3
+    # El ticker siguió corriendo mientras _busy_retry esperaba el lock
+    assert report["max_gap"] < 0.25
+
+
+def test_busy_retry_timeout_raises_write_queue_full(tmp_path):
+    report = _run_case(
+        tmp_path,
+        """
+        def hold():
+            conn = sqlite3.connect(db.DB_PATH, isolation_level=None)
+            conn.execute("BEGIN IMMEDIATE")
+            gevent.sleep(1.5)
+            conn.execute("ROLLBACK")
+            conn.close()
+
+
+        def insert():
+            with db.write_conn() as conn:
+                conn.execute("INSERT INTO t (x) VALUES (1)")
+
+
+        run(insert, hold)
+        """,
+        busy_timeout=0.5,
+    )
+    assert report["error"] == "WriteQueueFull"
+    assert 0.4 <= report["waited"] < 1.4
+    assert report["max_gap"] < 0.25
+
+
+def test_writer_queue_timeout_raises_write_queue_full(tmp_path):
+    report = _run_case(
+        tmp_path,
+        """
+        def hold():
+            with db.write_conn():
+                gevent.sleep(1.5)
+
+
+        def insert():
+            with db.write_conn() as conn:
+                conn.execute("INSERT INTO t (x) VALUES (1)")
+
+
+        run(insert, hold)
+        """,
+        busy_timeout=0.5,
+    )
+    assert report["error"] == "WriteQueueFull"
+    assert 0.4 <= report["waited"] < 1.4
+    assert report["max_gap"] < 0.25
@@ -1,3 +1,7 @@
 from app import app
+from db import ensure_db
+
+# Esquema listo antes de atender: con preload_app corre una vez en el master
+ensure_db()
 
 __all__ = ["app"]
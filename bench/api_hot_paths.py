@@ -0,0 +1,290 @@
+"""
+Benchmark de los endpoints calientes de la API pública y del admin.
+
+Genera una base sintética (bench/seed.py) y ejecuta cada endpoint:
+  - client:   con el test client de Flask en este proceso (sin red)
+  - gunicorn: contra un gunicorn real con deploy/gunicorn.conf.py, con
+              --concurrency hilos y conexiones keep-alive
+
+Imprime (o guarda con --output) un JSON con throughput y percentiles de
+latencia por endpoint; --compare muestra la diferencia contra otra corrida.
+
+Uso (desde la raíz del repo):
+    python bench/api_hot_paths.py --scale medium --output bench-main.json
+    python bench/api_hot_paths.py --scale medium --compare bench-main.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = REPO_DIR / "backend"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import seed as seed_module  # noqa: E402
+
+
+def endpoints(info):
+    """(nombre, función índice -> path, requiere admin)."""
+    slugs = info["course_slugs"] or ["curso-0"]
+    terms = info["search_terms"]
+    return [
+        ("page_home", lambda i: "/api/page/home", False),
+        ("kdbweb_search", lambda i: f"/api/kdbweb/search?q={terms[i % len(terms)]}", False),
+        ("publications_list", lambda i: "/api/publications?limit=20", False),
+        ("publications_category", lambda i: "/api/publications?limit=20&category=Tributario", False),
+        ("course_detail", lambda i: f"/api/courses/{slugs[i % len(slugs)]}", False),
+        ("admin_orders", lambda i: "/api/admin/orders?limit=50", True),
+        ("admin_orders_paid", lambda i: "/api/admin/orders?limit=50&status=paid", True),
+    ]
+
+
+def _percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(target, name, path, latencies, errors, seconds):
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "target": target,
+        "endpoint": name,
+        "path": path,
+        "requests": count,
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "rps": round(count / seconds, 1) if seconds else 0.0,
+        "mean_ms": round(sum(ordered) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(_percentile(ordered, 50) * 1000, 3),
+        "p90_ms": round(_percentile(ordered, 90) * 1000, 3),
+        "p99_ms": round(_percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+def run_client(info, requests, warmup, headers):
+    from app import app
+
+    client = app.test_client()
+    auth = {"Authorization": f"Bearer {info['admin_token']}"}
+    results = []
+    for name, path_for, admin in endpoints(info):
+        req_headers = {**headers, **(auth if admin else {})}
+        for i in range(warmup):
+            client.get(path_for(i), headers=req_headers)
+        latencies = []
+        errors = 0
+        start = time.perf_counter()
+        for i in range(requests):
+            t0 = time.perf_counter()
+            resp = client.get(path_for(i), headers=req_headers)
+            latencies.append(time.perf_counter() - t0)
+            if resp.status_code != 200:
+                errors += 1
+        results.append(summarize("client", name, path_for(0), latencies, errors, time.perf_counter() - start))
+    return results
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(db_path, workers, threads, work_dir, extra_env=None):
+    """Arranca gunicorn sobre db_path y espera /health; retorna (proceso, puerto)."""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DB_PATH": str(db_path),
+        "APP_ENV": "production",
+        "REQUEST_LOG": "0",
+        "SECRET_KEY": "bench",
+        "METRICS_DIR": str(Path(work_dir) / "metrics"),
+        "PRERENDER_DIR": str(Path(work_dir) / "prerendered"),
+        "GUNICORN_WORKERS": str(workers),
+        "GUNICORN_THREADS": str(threads),
+        "GUNICORN_LOG_LEVEL": "warning",
+        **(extra_env or {}),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", str(REPO_DIR / "deploy" / "gunicorn.conf.py"),
+         "--bind", f"127.0.0.1:{port}", "--access-logfile", "/dev/null", "wsgi:app"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("gunicorn terminó al arrancar:\n" + proc.stderr.read().decode("utf-8", "replace"))
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return proc, port
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("gunicorn no respondió /health a tiempo")
+
+
+def run_gunicorn(info, requests, warmup, headers, concurrency, workers, threads, work_dir):
+    proc, port = start_gunicorn(info["db_path"], workers, threads, work_dir)
+    auth = {"Authorization": f"Bearer {info['admin_token']}"}
+    results = []
+    try:
+        for name, path_for, admin in endpoints(info):
+            req_headers = {**headers, **(auth if admin else {})}
+            latencies = []
+            errors = [0]
+            lock = threading.Lock()
+            counter = iter(range(requests))
+
+            def worker():
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                for i in range(warmup // concurrency + 1):
+                    conn.request("GET", path_for(i), headers=req_headers)
+                    conn.getresponse().read()
+                local = []
+                local_errors = 0
+                while True:
+                    with lock:
+                        i = next(counter, None)
+                    if i is None:
+                        break
+                    t0 = time.perf_counter()
+                    try:
+                        conn.request("GET", path_for(i), headers=req_headers)
+                        resp = conn.getresponse()
+                        resp.read()
+                        if resp.status != 200:
+                            local_errors += 1
+                    except (OSError, http.client.HTTPException):
+                        local_errors += 1
+                        conn.close()
+                        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                    local.append(time.perf_counter() - t0)
+                conn.close()
+                with lock:
+                    latencies.extend(local)
+                    errors[0] += local_errors
+
+            pool = [threading.Thread(target=worker) for _ in range(concurrency)]
+            start = time.perf_counter()
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            results.append(summarize("gunicorn", name, path_for(0), latencies, errors[0], time.perf_counter() - start))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return results
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(report, baseline):
+    base = {(r["target"], r["endpoint"]): r for r in baseline.get("results", [])}
+    lines = [f"{'target':<9} {'endpoint':<22} {'rps':>9} {'Δrps':>8} {'p99_ms':>9} {'Δp99':>8}"]
+    for r in report["results"]:
+        old = base.get((r["target"], r["endpoint"]))
+
+        def delta(key):
+            if not old or not old[key]:
+                return "n/a"
+            return f"{(r[key] - old[key]) / old[key] * 100:+.1f}%"
+
+        lines.append(f"{r['target']:<9} {r['endpoint']:<22} {r['rps']:>9.1f} {delta('rps'):>8} {r['p99_ms']:>9.3f} {delta('p99_ms'):>8}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de endpoints calientes (JSON)")
+    parser.add_argument("--scale", choices=sorted(seed_module.SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1234)
+    for key in seed_module.SCALES["small"]:
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, dest=key, help=f"sobrescribe {key} de la escala")
+    parser.add_argument("--target", choices=["client", "gunicorn", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=300, help="requests medidos por endpoint")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4, help="hilos cliente contra gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--gzip", action="store_true", help="enviar Accept-Encoding: gzip")
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto stdout)")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_api_")
+    os.environ.setdefault("REQUEST_LOG", "0")
+    os.environ.setdefault("METRICS_DIR", str(Path(work_dir) / "metrics"))
+    os.environ.setdefault("PRERENDER_DIR", str(Path(work_dir) / "prerendered"))
+    overrides = {key: getattr(args, key) for key in seed_module.SCALES["small"]}
+    info = seed_module.seed(Path(work_dir) / "bench.db", args.scale, args.seed, **overrides)
+    headers = {"Accept-Encoding": "gzip"} if args.gzip else {}
+
+    results = []
+    if args.target in ("client", "both"):
+        results += run_client(info, args.requests, args.warmup, headers)
+    if args.target in ("gunicorn", "both"):
+        results += run_gunicorn(info, args.requests, args.warmup, headers, args.concurrency,
+                                args.workers, args.threads, work_dir)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "seed": args.seed,
+            "counts": info["counts"],
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "threads": args.threads,
+            "gzip": args.gzip,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(compare(report, baseline), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Benchmark del detalle de curso (/api/courses/<slug>).
+
+Crea una base temporal con un curso de 40 módulos x 8 lecciones y compara:
+  - n_plus_1: el cargador anterior (1 consulta de módulos + 1 por módulo)
+  - two_query: _attach_modules actual (módulos + lecciones por course_id)
+  - cached:    fetch_course_by_slug con la caché por worker ya caliente
+
+Uso (desde la raíz del repo):
+    python bench/course_detail.py [--modules 40] [--lessons 8] [--iterations 300]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+
+def _legacy_attach_modules(conn, course_id):
+    modules = conn.execute(
+        "SELECT * FROM course_modules WHERE course_id = ? ORDER BY position",
+        (course_id,),
+    ).fetchall()
+    result = []
+    for m in modules:
+        md = dict(m)
+        lessons = conn.execute(
+            "SELECT * FROM course_lessons WHERE module_id = ? ORDER BY position",
+            (m["id"],),
+        ).fetchall()
+        md["lessons"] = [dict(l) for l in lessons]
+        result.append(md)
+    return result
+
+
+def _timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def _count_queries(db, fn):
+    statements = []
+    conn = db.get_conn()
+    conn.set_trace_callback(statements.append)
+    fn(conn)
+    conn.close()
+    return len([s for s in statements if s.lstrip().upper().startswith("SELECT")])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modules", type=int, default=40)
+    parser.add_argument("--lessons", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    os.environ["DB_PATH"] = str(Path(tempfile.mkdtemp(prefix="bench_course_")) / "bench.db")
+    sys.path.insert(0, str(BACKEND_DIR))
+    import db
+    import models
+
+    db.init_db()
+    modules = [
+        {
+            "title": f"Modulo {mi}",
+            "duration": "1h",
+            "lessons_count": args.lessons,
+            "lessons": [{"title": f"Leccion {mi}.{li}", "duration": "8m"} for li in range(args.lessons)],
+        }
+        for mi in range(args.modules)
+    ]
+    course_id = models.save_course(
+        {"slug": "bench-curso", "title": "Curso benchmark", "is_published": 1, "modules": modules}
+    )
+
+    def n_plus_1(conn=None):
+        own = conn is None
+        conn = conn or db.get_conn()
+        _legacy_attach_modules(conn, course_id)
+        if own:
+            conn.close()
+
+    def two_query(conn=None):
+        own = conn is None
+        conn = conn or db.get_conn()
+        models._attach_modules(conn, course_id)
+        if own:
+            conn.close()
+
+    assert _legacy_attach_modules(db.get_conn(), course_id) == models._attach_modules(db.get_conn(), course_id)
+    models.fetch_course_by_slug("bench-curso")  # calienta la caché
+
+    results = [
+        ("n_plus_1", _timed(n_plus_1, args.iterations), _count_queries(db, n_plus_1)),
+        ("two_query", _timed(two_query, args.iterations), _count_queries(db, two_query)),
+        ("cached", _timed(lambda: models.fetch_course_by_slug("bench-curso"), args.iterations), 0),
+    ]
+    print(f"curso con {args.modules} módulos x {args.lessons} lecciones, {args.iterations} iteraciones")
+    for name, ms, queries in results:
+        print(f"  {name:<10} {ms:8.3f} ms/op  {queries:>3} SELECT")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Benchmark de serialización JSON para las respuestas más pesadas:
+  - kdbweb_detail: /api/kdbweb/<slug> con un meta_json grande
+  - publications:  /api/publications?all=1 con cuerpos HTML completos
+  - swagger:       /swagger.json
+
+Compara el proveedor por defecto de Flask (json estándar, meta_json como
+string escapado) con AppJSONProvider en modo json y en modo orjson (meta_json
+incrustado como RawJSON).
+
+Uso (desde la raíz del repo):
+    python bench/json_serialization.py [--iterations 200] [--meta-kb 512]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+
+def _timed(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def _payloads(app, meta_kb):
+    from json_provider import RawJSON
+
+    items = []
+    size = 0
+    while size < meta_kb * 1024:
+        item = {
+            "titulo": f"Convenio para evitar la doble imposición N° {len(items)}",
+            "pais": "España",
+            "url": f"https://example.org/tratados/{len(items)}.pdf",
+            "notas": "Texto con \"comillas\", acentos y saltos\nde línea " * 3,
+        }
+        size += len(json.dumps(item, ensure_ascii=False))
+        items.append(item)
+    meta_text = json.dumps({"tratados": items}, ensure_ascii=False)
+    entry = {"slug": "tratados", "title": "Tratados", "content_html": "<p>Intro</p>" * 50}
+
+    body = "<h2>Sección</h2><p>" + "Análisis tributario con jurisprudencia reciente. " * 200 + "</p>"
+    publications = [
+        {"id": i, "slug": f"pub-{i}", "title": f"Publicación {i}", "content_html": body, "category": "General"}
+        for i in range(60)
+    ]
+    with app.test_client() as client:
+        swagger = client.get("/swagger.json").get_json()
+
+    return {
+        "kdbweb_detail": ({**entry, "meta_json": meta_text}, {**entry, "meta_json": RawJSON(meta_text)}),
+        "publications": (publications, publications),
+        "swagger": (swagger, swagger),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo de serialización JSON por proveedor")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--meta-kb", type=int, default=512)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DB_PATH", str(Path(tempfile.mkdtemp(prefix="bench_json_")) / "bench.db"))
+    os.environ.setdefault("REQUEST_LOG", "0")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from flask.json.provider import DefaultJSONProvider
+
+    import json_provider
+    from app import app
+
+    default_provider = DefaultJSONProvider(app)
+    app_provider = json_provider.AppJSONProvider(app)
+    payloads = _payloads(app, args.meta_kb)
+
+    print(f"{args.iterations} iteraciones, meta_json de ~{args.meta_kb} KB")
+    print(f"  {'payload':<14} {'flask json':>12} {'app json':>12} {'app orjson':>12} {'bytes':>10}")
+    for name, (as_string, as_raw) in payloads.items():
+        flask_ms = _timed(lambda: default_provider.dumps(as_string), args.iterations)
+        orjson_mod = json_provider.orjson
+        json_provider.orjson = None
+        try:
+            app_json_ms = _timed(lambda: app_provider.dumps(as_raw), args.iterations)
+        finally:
+            json_provider.orjson = orjson_mod
+        if orjson_mod is not None:
+            orjson_ms = _timed(lambda: app_provider.dumps(as_raw), args.iterations)
+            orjson_col = f"{orjson_ms:9.3f} ms"
+        else:
+            orjson_col = f"{'n/d':>12}"
+        size = len(app_provider.dumps(as_raw).encode("utf-8"))
+        print(f"  {name:<14} {flask_ms:9.3f} ms {app_json_ms:9.3f} ms {orjson_col} {size:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+"""
+Prueba de carga con recorridos reales de visitantes.
+
+Cada usuario virtual repite un recorrido completo pidiendo lo mismo que el
+JavaScript de cada página (header.js + footer.js + hero/contenido, en
+paralelo como el navegador, hasta 6 conexiones):
+
+  inicio -> publicaciones -> publicación -> kdbweb-* -> búsqueda (header y
+  tecleo en el buscador KATWeb) -> academia -> curso -> pagar (voucher y
+  checkout para --checkout-rate de los visitantes)
+
+El HTML, CSS y JS los sirve nginx y no se piden. SMTP, Moodle y S3 se
+reemplazan por bench/stand_ins.py. Para cada configuración de gunicorn
+(--configs workersxthreads) sube la cantidad de usuarios por escalones y
+reporta el throughput de saturación (el máximo alcanzado), el escalón donde
+se alcanza y el throughput por worker y por hilo, en JSON. El generador es un
+solo proceso asyncio: si su CPU llega al 100 % antes que gunicorn, el número
+mide al cliente; conviene correrlo en otra máquina o con --think > 0.
+
+Uso (desde la raíz del repo):
+    python bench/load_journeys.py --configs 1x1,2x2,4x2 --users 1,4,8,16,32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import seed as seed_module  # noqa: E402
+from api_hot_paths import _git_commit, _percentile, start_gunicorn  # noqa: E402
+from stand_ins import StandIns  # noqa: E402
+
+BROWSER_CONNECTIONS = 6
+VOUCHER_PNG = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89"
+    b"\x00\x00\x00\rIDATx\x9cc\xf8\x0f\x00\x00\x01\x01\x00\x05\x18\xd8N\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+
+
+class HttpClient:
+    """HTTP/1.1 mínimo sobre asyncio con un pool keep-alive por usuario."""
+
+    def __init__(self, port, stats):
+        self.port = port
+        self.stats = stats
+        self.idle = []
+        self.slots = asyncio.Semaphore(BROWSER_CONNECTIONS)
+
+    async def _connect(self):
+        return await asyncio.open_connection("127.0.0.1", self.port)
+
+    async def _exchange(self, conn, raw):
+        reader, writer = conn
+        writer.write(raw)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("conexión cerrada por el servidor")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        keep = headers.get("connection", "").lower() != "close"
+        if "content-length" in headers:
+            await reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await reader.read()
+            keep = False
+        return status, keep
+
+    async def request(self, label, method, path, body=b"", content_type=None):
+        head = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1", "Accept-Encoding: gzip", "Connection: keep-alive"]
+        if body or method != "GET":
+            head.append(f"Content-Length: {len(body)}")
+        if content_type:
+            head.append(f"Content-Type: {content_type}")
+        raw = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+        async with self.slots:
+            start = time.perf_counter()
+            status = 0
+            for attempt in range(2):
+                reused = bool(self.idle)
+                conn = self.idle.pop() if reused else None
+                try:
+                    conn = conn or await self._connect()
+                    status, keep = await self._exchange(conn, raw)
+                except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    if conn:
+                        conn[1].close()
+                    # Una conexión keep-alive vencida se reintenta una vez
+                    if reused and attempt == 0:
+                        continue
+                    break
+                if keep:
+                    self.idle.append(conn)
+                else:
+                    conn[1].close()
+                break
+            self.stats.record(label, time.perf_counter() - start, status)
+            return status
+
+    async def gather(self, *calls):
+        return await asyncio.gather(*(self.request(*call) for call in calls))
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
+class Stats:
+    def __init__(self):
+        self.active = False
+        self.samples = []
+
+    def record(self, label, seconds, status):
+        if self.active:
+            self.samples.append((label, seconds, status))
+
+
+def _chrome():
+    # header.js (visibilidad, empresa, menú KDBWEB) + footer.js (empresa)
+    return [
+        ("/api/pages", "GET", "/api/pages"),
+        ("/api/company", "GET", "/api/company"),
+        ("/api/kdbweb", "GET", "/api/kdbweb"),
+        ("/api/company", "GET", "/api/company"),
+    ]
+
+
+def _multipart(filename, content, content_type):
+    boundary = "----benchboundary7MA4YWxkTrZu0gW"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+async def journey(client, info, rng, think, checkout_rate):
+    async def pause():
+        if think:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * think)
+
+    pub = rng.choice(info["publication_slugs"] or ["publicacion-0"])
+    kdb = rng.choice(info["kdbweb_slugs"] or ["constitucion"])
+    course = rng.choice(info["course_slugs"] or ["curso-0"])
+
+    await client.gather(*_chrome(), ("/api/page/<page>", "GET", "/api/page/home"))
+    await pause()
+    await client.gather(
+        *_chrome(),
+        ("/api/page/<page>", "GET", "/api/page/publicaciones"),
+        ("/api/pages", "GET", "/api/pages"),
+        ("/api/categories", "GET", "/api/categories"),
+        ("/api/publications", "GET", "/api/publications"),
+    )
+    await pause()
+    await client.gather(
+        *_chrome(),
+        ("/api/publications/slug/<slug>", "GET", f"/api/publications/slug/{pub}"),
+        ("/api/publications", "GET", "/api/publications?limit=4"),
+    )
+    await pause()
+    await client.gather(
+        *_chrome(),
+        ("/api/kdbweb/<slug>", "GET", f"/api/kdbweb/{kdb}"),
+        ("/api/kdbweb", "GET", "/api/kdbweb"),
+    )
+    await pause()
+
+    # Búsqueda del header: carga el índice (publicaciones + cada entrada KDBWEB)
+    await client.gather(("/api/publications", "GET", "/api/publications"), ("/api/kdbweb", "GET", "/api/kdbweb"))
+    await client.gather(*[("/api/kdbweb/<slug>", "GET", f"/api/kdbweb/{slug}") for slug in info["kdbweb_slugs"]])
+    # Buscador KATWeb: una consulta por tecla después del debounce
+    term = rng.choice(info["search_terms"])
+    for n in range(2, len(term) + 1):
+        await client.request("/api/kdbweb/search", "GET", f"/api/kdbweb/search?q={term[:n]}")
+        if think:
+            await asyncio.sleep(rng.uniform(0.15, 0.35))
+    await pause()
+
+    await client.gather(
+        *_chrome(),
+        ("/api/page/<page>", "GET", "/api/page/academia"),
+        ("/api/courses", "GET", "/api/courses"),
+    )
+    await pause()
+    await client.gather(
+        *_chrome(),
+        ("/api/courses", "GET", "/api/courses"),
+        ("/api/courses/<slug>", "GET", f"/api/courses/{course}"),
+    )
+    await pause()
+    if rng.random() >= checkout_rate:
+        return
+    await client.gather(
+        *_chrome(),
+        ("/api/payment-config", "GET", "/api/payment-config"),
+        ("/api/courses/<slug>", "GET", f"/api/courses/{course}"),
+    )
+    await pause()
+    body, content_type = _multipart("voucher.png", VOUCHER_PNG, "image/png")
+    await client.request("/api/checkout/voucher-upload", "POST", "/api/checkout/voucher-upload", body, content_type)
+    n = rng.randrange(10**6)
+    payload = {
+        "student_name": f"Visitante {n}",
+        "student_email": f"visitante{n}@example.com",
+        "course_slug": course,
+        "payment_method": "yape",
+        "operation_number": str(n),
+    }
+    await client.request("/api/checkout", "POST", "/api/checkout", json.dumps(payload).encode("utf-8"), "application/json")
+
+
+async def run_level(port, info, users, seconds, think, checkout_rate, seed_value):
+    stats = Stats()
+    # Un segundo de calentamiento con la misma carga antes de medir
+    warm_deadline = time.monotonic() + 1
+    deadline = warm_deadline + seconds
+    journeys = [0]
+
+    async def user(index):
+        rng = random.Random(seed_value * 1000 + index)
+        client = HttpClient(port, stats)
+        try:
+            while time.monotonic() < deadline:
+                await journey(client, info, rng, think, checkout_rate)
+                journeys[0] += 1
+        finally:
+            client.close()
+
+    tasks = [asyncio.create_task(user(i)) for i in range(users)]
+    await asyncio.sleep(max(0.0, warm_deadline - time.monotonic()))
+    stats.active = True
+    journeys[0] = 0
+    start = time.perf_counter()
+    await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+    stats.active = False
+    elapsed = time.perf_counter() - start
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return summarize_level(users, stats.samples, elapsed, journeys[0])
+
+
+def summarize_level(users, samples, elapsed, journeys):
+    latencies = sorted(s for _, s, _ in samples)
+    errors = sum(1 for _, _, status in samples if not 200 <= status < 400)
+    by_label = {}
+    for label, seconds, status in samples:
+        by_label.setdefault(label, []).append(seconds)
+    return {
+        "users": users,
+        "seconds": round(elapsed, 3),
+        "requests": len(samples),
+        "errors": errors,
+        "journeys_completed": journeys,
+        "rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "endpoints": {
+            label: {
+                "requests": len(values),
+                "p50_ms": round(_percentile(sorted(values), 50) * 1000, 2),
+                "p95_ms": round(_percentile(sorted(values), 95) * 1000, 2),
+            }
+            for label, values in sorted(by_label.items())
+        },
+    }
+
+
+def saturation(levels, workers, threads):
+    best = max(levels, key=lambda level: level["rps"]) if levels else None
+    if not best:
+        return {}
+    # Primer escalón que llega al 95 % del máximo: más usuarios ya no suman
+    knee = next(level for level in levels if level["rps"] >= 0.95 * best["rps"])
+    return {
+        "max_rps": best["rps"],
+        "saturation_users": knee["users"],
+        "p95_ms_at_saturation": knee["p95_ms"],
+        "rps_per_worker": round(best["rps"] / workers, 1),
+        "rps_per_thread": round(best["rps"] / (workers * threads), 1),
+    }
+
+
+def _parse_configs(text):
+    configs = []
+    for part in text.split(","):
+        workers, _, threads = part.strip().lower().partition("x")
+        configs.append((int(workers), int(threads or 1)))
+    return configs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga por recorridos de visitantes (JSON)")
+    parser.add_argument("--scale", choices=sorted(seed_module.SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--configs", default="1x1,2x2", help="configuraciones de gunicorn workersxthreads")
+    parser.add_argument("--users", default="1,2,4,8,16", help="usuarios virtuales por escalón")
+    parser.add_argument("--step-seconds", type=float, default=10.0)
+    parser.add_argument("--think", type=float, default=0.0, help="segundos medios entre páginas (0 = sin pausa, satura)")
+    parser.add_argument("--checkout-rate", type=float, default=0.05, help="fracción de recorridos que termina en checkout")
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_load_")
+    os.environ.setdefault("REQUEST_LOG", "0")
+    os.environ.setdefault("METRICS_DIR", str(Path(work_dir) / "metrics"))
+    info = seed_module.seed(Path(work_dir) / "bench.db", args.scale, args.seed)
+    users_levels = [int(u) for u in args.users.split(",") if u.strip()]
+
+    stand_ins = StandIns().start()
+    extra_env = {**stand_ins.env(), "RATE_LIMIT_CONTACT": "0,0", "RATE_LIMIT_SUBSCRIBE": "0,0"}
+    results = []
+    try:
+        for workers, threads in _parse_configs(args.configs):
+            proc, port = start_gunicorn(info["db_path"], workers, threads, work_dir, extra_env)
+            try:
+                levels = []
+                for users in users_levels:
+                    level = asyncio.run(run_level(port, info, users, args.step_seconds, args.think,
+                                                  args.checkout_rate, args.seed))
+                    levels.append(level)
+                    print(f"[load] {workers}x{threads} users={users} rps={level['rps']} "
+                          f"p95={level['p95_ms']}ms errores={level['errors']}", file=sys.stderr)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+            results.append({
+                "workers": workers,
+                "threads": threads,
+                "saturation": saturation(levels, workers, threads),
+                "levels": levels,
+            })
+    finally:
+        stand_ins.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "scale": args.scale,
+            "counts": info["counts"],
+            "step_seconds": args.step_seconds,
+            "think": args.think,
+            "checkout_rate": args.checkout_rate,
+        },
+        "stand_ins": stand_ins.stats(),
+        "configs": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
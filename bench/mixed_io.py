@@ -0,0 +1,198 @@
+"""
+Carga mixta: páginas públicas mientras otros clientes usan endpoints que
+esperan a servicios externos lentos (SMTP en /api/contact, S3 en la subida
+de voucher). Los sustitutos de bench/stand_ins.py responden con --io-delay
+segundos de retraso.
+
+Compara configuraciones de gunicorn, por ejemplo gthread 2x2 contra gevent
+con 2 workers de 100 conexiones, y reporta por grupo (pages / io) requests,
+errores, rps y percentiles. Con gthread cada request que espera al
+servicio externo ocupa un hilo, así que esos endpoints no pasan de
+workers x threads / retraso requests por segundo; con gevent esperan sin
+ocupar un hilo.
+
+Uso (desde la raíz del repo):
+    python bench/mixed_io.py --configs gthread:2x2,gevent:2x100 --io-delay 0.5
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import seed as seed_module  # noqa: E402
+from api_hot_paths import _git_commit, _percentile, start_gunicorn  # noqa: E402
+from load_journeys import VOUCHER_PNG, _multipart  # noqa: E402
+from stand_ins import StandIns  # noqa: E402
+
+
+def _parse_configs(raw):
+    """'gthread:2x2,gevent:2x100' -> [(clase, workers, threads o conexiones)]."""
+    configs = []
+    for part in raw.split(","):
+        worker_class, _, size = part.strip().partition(":")
+        workers, _, per_worker = size.partition("x")
+        configs.append((worker_class, int(workers), int(per_worker)))
+    return configs
+
+
+def _gunicorn_env(worker_class, per_worker):
+    if worker_class == "gevent":
+        return {"GUNICORN_WORKER_CLASS": "gevent", "GUNICORN_WORKER_CONNECTIONS": str(per_worker)}
+    return {"GUNICORN_WORKER_CLASS": "sync"}
+
+
+def page_requests(info):
+    terms = info["search_terms"]
+    pubs = info["publication_slugs"] or ["publicacion-0"]
+    return [
+        lambda i: ("GET", "/api/page/home", None, None),
+        lambda i: ("GET", "/api/publications?limit=20", None, None),
+        lambda i: ("GET", f"/api/publications/slug/{pubs[i % len(pubs)]}", None, None),
+        lambda i: ("GET", f"/api/kdbweb/search?q={terms[i % len(terms)]}", None, None),
+    ]
+
+
+def io_requests():
+    voucher, voucher_type = _multipart("voucher.png", VOUCHER_PNG, "image/png")
+    return [
+        lambda i: ("POST", "/api/contact", json.dumps({
+            "name": f"Visitante {i}", "email": f"visitante{i}@example.com", "message": "Consulta de prueba",
+        }).encode("utf-8"), "application/json"),
+        lambda i: ("POST", "/api/checkout/voucher-upload", voucher, voucher_type),
+    ]
+
+
+class Group:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+
+    def summary(self, seconds):
+        ordered = sorted(self.latencies)
+        count = len(ordered)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "rps": round(count / seconds, 1) if seconds else 0.0,
+            "p50_ms": round(_percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(_percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(_percentile(ordered, 99) * 1000, 2),
+        }
+
+
+def _client(port, builders, group, deadline, offset):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    local, errors = [], 0
+    i = offset
+    while time.monotonic() < deadline:
+        method, path, body, content_type = builders[i % len(builders)](i)
+        headers = {"Content-Type": content_type} if content_type else {}
+        t0 = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        local.append(time.perf_counter() - t0)
+        i += 1
+    conn.close()
+    with group.lock:
+        group.latencies.extend(local)
+        group.errors += errors
+
+
+def run_mixed(port, info, page_users, io_users, seconds):
+    pages, io = Group(), Group()
+    deadline = time.monotonic() + seconds
+    pool = [threading.Thread(target=_client, args=(port, page_requests(info), pages, deadline, n * 7))
+            for n in range(page_users)]
+    pool += [threading.Thread(target=_client, args=(port, io_requests(), io, deadline, n))
+             for n in range(io_users)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    # rps sobre la ventana pedida: los requests de I/O que terminan después no la alargan
+    return {"pages": pages.summary(seconds), "io": io.summary(seconds)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Páginas públicas junto a endpoints con I/O externo lento (JSON)")
+    parser.add_argument("--scale", choices=sorted(seed_module.SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--configs", default="gthread:2x2,gevent:2x100",
+                        help="clase:workersxthreads (gthread) o clase:workersxconexiones (gevent)")
+    parser.add_argument("--io-delay", type=float, default=0.5, help="segundos de retraso de SMTP/S3")
+    parser.add_argument("--page-users", type=int, default=8)
+    parser.add_argument("--io-users", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_mixed_")
+    os.environ.setdefault("REQUEST_LOG", "0")
+    os.environ.setdefault("METRICS_DIR", str(Path(work_dir) / "metrics"))
+    info = seed_module.seed(Path(work_dir) / "bench.db", args.scale, args.seed)
+
+    stand_ins = StandIns(delay=args.io_delay).start()
+    base_env = {**stand_ins.env(), "RATE_LIMIT_CONTACT": "0,0", "RATE_LIMIT_SUBSCRIBE": "0,0"}
+    results = []
+    try:
+        for worker_class, workers, per_worker in _parse_configs(args.configs):
+            threads = per_worker if worker_class != "gevent" else 1
+            env = {**base_env, **_gunicorn_env(worker_class, per_worker)}
+            proc, port = start_gunicorn(info["db_path"], workers, threads, work_dir, env)
+            try:
+                result = run_mixed(port, info, args.page_users, args.io_users, args.seconds)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+            print(f"[mixed] {worker_class} {workers}x{per_worker} pages={result['pages']['rps']}rps "
+                  f"p95={result['pages']['p95_ms']}ms io={result['io']['rps']}rps "
+                  f"errores={result['pages']['errors'] + result['io']['errors']}", file=sys.stderr)
+            results.append({"worker_class": worker_class, "workers": workers, "per_worker": per_worker, **result})
+    finally:
+        stand_ins.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "scale": args.scale,
+            "io_delay": args.io_delay,
+            "page_users": args.page_users,
+            "io_users": args.io_users,
+            "seconds": args.seconds,
+        },
+        "stand_ins": stand_ins.stats(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Base SQLite sintética para los benchmarks.
+
+Usa las funciones de models.py (mismo saneamiento y campos derivados que en
+producción) salvo para las órdenes, que se insertan en lote y luego se
+reconstruye student_stats. Con la misma semilla el contenido es idéntico entre
+corridas, así los resultados se pueden comparar.
+
+Uso (desde la raíz del repo):
+    python bench/seed.py --db /tmp/bench.db --scale medium
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+SCALES = {
+    "small": {"publications": 100, "kdbweb": 15, "kdbweb_items": 40, "orders": 500, "courses": 5, "modules": 6, "lessons": 5},
+    "medium": {"publications": 1000, "kdbweb": 30, "kdbweb_items": 150, "orders": 10000, "courses": 20, "modules": 10, "lessons": 8},
+    "large": {"publications": 5000, "kdbweb": 60, "kdbweb_items": 400, "orders": 100000, "courses": 60, "modules": 12, "lessons": 10},
+}
+
+KDBWEB_SLUGS = [
+    "constitucion",
+    "tratados-internacionales",
+    "legislacion-tributaria-aduanera",
+    "jurisprudencia",
+    "doctrina",
+    "tribunal-fiscal",
+    "casaciones-de-la-corte-suprema",
+    "sentencias-del-tc",
+    "resoluciones",
+    "boletinas",
+]
+CATEGORIES = ["Tributario", "Aduanero", "Laboral", "Societario", "Precios de transferencia"]
+WORDS = (
+    "impuesto renta tributo sunat fiscalizacion deduccion gasto contribuyente "
+    "resolucion tribunal fiscal casacion sentencia constitucional tratado "
+    "doble imposicion aduana arancel drawback igv detraccion percepcion "
+    "retencion planeamiento auditoria devolucion fraccionamiento multa"
+).split()
+
+ADMIN_USERNAME = "bench"
+ADMIN_PASSWORD = "bench-password"
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _html(rng, paragraphs):
+    return "".join(f"<p>{_text(rng, rng.randint(40, 90))}</p>" for _ in range(paragraphs))
+
+
+def _meta(rng, items):
+    """meta_json con la forma de las páginas KATWeb: categorías con ítems."""
+    per_group = max(1, items // 5)
+    return {
+        "intro": _text(rng, 30),
+        "categorias": [
+            {
+                "nombre": f"Categoria {g + 1}",
+                "items": [
+                    {
+                        "titulo": _text(rng, 6).capitalize(),
+                        "descripcion": _text(rng, 25),
+                        "fecha": f"20{rng.randint(10, 25):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                        "url": f"https://example.com/doc/{g}-{i}.pdf",
+                        "tags": rng.sample(WORDS, 3),
+                    }
+                    for i in range(per_group)
+                ],
+            }
+            for g in range(5)
+        ],
+    }
+
+
+def seed(db_path, scale="small", seed_value=1234, **overrides):
+    """
+    Crea (o reemplaza) la base en db_path. overrides pisa los conteos de la
+    escala. Retorna un dict con lo necesario para los benchmarks (slugs,
+    token admin, conteos).
+    """
+    counts = {**SCALES[scale], **{k: v for k, v in overrides.items() if v is not None}}
+    db_path = Path(db_path)
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+    os.environ["DB_PATH"] = str(db_path)
+    sys.path.insert(0, str(BACKEND_DIR))
+    import db
+    import models
+
+    if db.DB_PATH != db_path:
+        raise RuntimeError("seed() debe ejecutarse antes de importar db en este proceso")
+
+    rng = random.Random(seed_value)
+    db.init_db()
+
+    models.save_page_content(
+        "home",
+        {
+            "hero": [
+                {"title": _text(rng, 5), "description": _text(rng, 20), "image_url": f"https://example.com/hero-{i}.jpg",
+                 "primary_label": "Ver mas", "primary_href": "#"}
+                for i in range(3)
+            ],
+            "services": [
+                {"title": _text(rng, 3), "description": _text(rng, 30), "icon": "scale"} for _ in range(8)
+            ],
+            "story": {"title": _text(rng, 4), "content_html": _html(rng, 3)},
+        },
+    )
+
+    for name in CATEGORIES:
+        models.save_category({"name": name})
+    active_slugs = []
+    for i in range(counts["publications"]):
+        active = 1 if rng.random() > 0.1 else 0
+        if active:
+            active_slugs.append(f"publicacion-{i}")
+        models.save_publication({
+            "title": _text(rng, 7).capitalize(),
+            "slug": f"publicacion-{i}",
+            "author": rng.choice(["Equipo KDB", "Socio", "Asociado"]),
+            "category": rng.choice(CATEGORIES),
+            "content_html": f'<p><img src="https://example.com/img/{i}.jpg"></p>' + _html(rng, rng.randint(3, 12)),
+            "published_at": f"20{rng.randint(18, 25):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "active": active,
+        })
+
+    slugs = KDBWEB_SLUGS + [f"kdbweb-extra-{i}" for i in range(max(0, counts["kdbweb"] - len(KDBWEB_SLUGS)))]
+    models.replace_kdbweb_entries([
+        {
+            "slug": slug,
+            "title": slug.replace("-", " ").title(),
+            "card_title": slug.replace("-", " ").title(),
+            "summary": _text(rng, 25),
+            "hero_title": _text(rng, 5),
+            "content_html": _html(rng, 4),
+            "meta_json": json.dumps(_meta(rng, counts["kdbweb_items"]), ensure_ascii=False),
+        }
+        for slug in slugs[: counts["kdbweb"]]
+    ])
+
+    course_ids = []
+    for c in range(counts["courses"]):
+        course_ids.append(models.save_course({
+            "slug": f"curso-{c}",
+            "title": f"Curso {c}: {_text(rng, 4)}",
+            "description": _html(rng, 2),
+            "price": rng.choice([150, 290, 450, 890]),
+            "is_published": 1,
+            "modules": [
+                {
+                    "title": f"Modulo {m + 1}",
+                    "duration": "2h",
+                    "lessons": [{"title": _text(rng, 5), "duration": f"{rng.randint(5, 30)}m"} for _ in range(counts["lessons"])],
+                }
+                for m in range(counts["modules"])
+            ],
+        }))
+
+    statuses = ["pending", "paid", "paid", "paid", "cancelled"]
+    methods = ["transferencia", "yape", "plin", "tarjeta"]
+    students = max(1, counts["orders"] // 3)
+    rows = []
+    for i in range(counts["orders"]):
+        s = rng.randrange(students)
+        created = f"20{rng.randint(22, 25):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00.{i % 1000000:06d}"
+        course_id = rng.choice(course_ids) if course_ids else 1
+        rows.append((course_id, f"Curso {course_id}", f"Alumno {s}", f"alumno{s}@example.com", 290.0,
+                     rng.choice(statuses), rng.choice(methods), created, created))
+    conn = db.get_conn()
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO orders (course_id, course_title, student_name, student_email, amount,
+                                status, payment_method, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+        db.rebuild_student_stats(conn)
+    conn.execute("ANALYZE")
+    conn.close()
+
+    if not models.fetch_admin_by_username(ADMIN_USERNAME):
+        models.create_admin_user(ADMIN_USERNAME, ADMIN_PASSWORD, role="super")
+    admin = models.fetch_admin_by_username(ADMIN_USERNAME)
+    token, _ = models.create_admin_session(admin["id"], ttl_hours=24)
+
+    return {
+        "db_path": str(db_path),
+        "scale": scale,
+        "seed": seed_value,
+        "counts": counts,
+        "admin_token": token,
+        "course_slugs": [f"curso-{c}" for c in range(counts["courses"])],
+        "publication_slugs": active_slugs,
+        "kdbweb_slugs": slugs[: counts["kdbweb"]],
+        "search_terms": rng.sample(WORDS, 8),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera una base SQLite sintética para benchmarks")
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1234)
+    for key in SCALES["small"]:
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, dest=key)
+    args = parser.parse_args(argv)
+    overrides = {key: getattr(args, key) for key in SCALES["small"]}
+    info = seed(args.db, args.scale, args.seed, **overrides)
+    info.pop("admin_token")
+    print(json.dumps(info, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Sustitutos locales de los servicios externos para pruebas de carga:
+
+  - SMTP: acepta y descarta los correos (sin TLS ni auth)
+  - Moodle: responde el REST de webservice/rest/server.php
+  - S3: acepta PUT/POST de objetos y responde como un bucket vacío
+
+Cada uno corre en un hilo de este proceso; env() devuelve las variables que
+hay que pasarle al backend para que los use en lugar de los reales. Con
+delay > 0 cada respuesta (y cada correo aceptado) tarda esos segundos, para
+simular un servicio externo lento.
+"""
+
+import asyncio
+import itertools
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class SmtpSink:
+    def __init__(self, delay=0.0):
+        self.port = _free_port()
+        self.delay = delay
+        self.messages = 0
+        self._loop = None
+        self._thread = None
+
+    async def _handle(self, reader, writer):
+        writer.write(b"220 bench-smtp ESMTP\r\n")
+        in_data = False
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if in_data:
+                if line in (b".\r\n", b".\n"):
+                    in_data = False
+                    if self.delay:
+                        await asyncio.sleep(self.delay)
+                    self.messages += 1
+                    writer.write(b"250 OK queued\r\n")
+                continue
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                writer.write(b"250-bench-smtp\r\n250 8BITMIME\r\n")
+            elif command == b"DATA":
+                in_data = True
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            server = self._loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", self.port))
+            ready.set()
+            try:
+                self._loop.run_forever()
+            finally:
+                server.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait(5)
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _MoodleHandler(_StubHandler):
+    user_ids = itertools.count(1000)
+
+    def do_POST(self):
+        params = parse_qs(self._body().decode("utf-8"))
+        function = (params.get("wsfunction") or [""])[0]
+        self.server.calls[function] = self.server.calls.get(function, 0) + 1
+        if function == "core_user_get_users":
+            result = {"users": [], "warnings": []}
+        elif function == "core_user_create_users":
+            result = [{"id": next(self.user_ids), "username": (params.get("users[0][username]") or [""])[0]}]
+        else:
+            result = None
+        self._send(200, json.dumps(result).encode("utf-8"))
+
+
+class _S3Handler(_StubHandler):
+    def do_PUT(self):
+        size = len(self._body())
+        self.server.calls["put"] = self.server.calls.get("put", 0) + 1
+        self.server.calls["bytes"] = self.server.calls.get("bytes", 0) + size
+        self._send(200, headers={"ETag": '"d41d8cd98f00b204e9800998ecf8427e"'}, content_type="application/xml")
+
+    def do_POST(self):
+        self._body()
+        self.server.calls["post"] = self.server.calls.get("post", 0) + 1
+        self._send(204, content_type="application/xml")
+
+    def do_GET(self):
+        body = (
+            b'<?xml version="1.0" encoding="UTF-8"?>'
+            b'<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            b"<Name>bench</Name><KeyCount>0</KeyCount><IsTruncated>false</IsTruncated></ListBucketResult>"
+        )
+        self._send(200, body, content_type="application/xml")
+
+    def do_HEAD(self):
+        self._send(404, content_type="application/xml")
+
+    def do_DELETE(self):
+        self._send(204, content_type="application/xml")
+
+
+class HttpStub:
+    def __init__(self, handler, delay=0.0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.server.delay = delay
+        self.server.calls = {}
+        self.port = self.server.server_address[1]
+        self.calls = self.server.calls
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StandIns:
+    def __init__(self, delay=0.0):
+        self.smtp = SmtpSink(delay)
+        self.moodle = HttpStub(_MoodleHandler, delay)
+        self.s3 = HttpStub(_S3Handler, delay)
+
+    def start(self):
+        self.smtp.start()
+        self.moodle.start()
+        self.s3.start()
+        return self
+
+    def stop(self):
+        self.smtp.stop()
+        self.moodle.stop()
+        self.s3.stop()
+
+    def env(self):
+        s3_url = f"http://127.0.0.1:{self.s3.port}"
+        return {
+            "MAIL_ENABLED": "1",
+            "SMTP_HOST": "127.0.0.1",
+            "SMTP_PORT": str(self.smtp.port),
+            "SMTP_USER": "",
+            "SMTP_PASS": "",
+            "SMTP_USE_TLS": "0",
+            "SMTP_USE_SSL": "0",
+            "MAIL_FROM": "bench@example.com",
+            "ACADEMIA_MAIL_FROM": "bench@example.com",
+            "MOODLE_BASE_URL": f"http://127.0.0.1:{self.moodle.port}",
+            "MOODLE_TOKEN": "bench",
+            "AWS_ENDPOINT_URL_S3": s3_url,
+            "AWS_ACCESS_KEY_ID": "bench",
+            "AWS_SECRET_ACCESS_KEY": "bench",
+            "AWS_DEFAULT_REGION": "us-east-1",
+            "S3_BUCKET": "bench",
+            "S3_REGION": "us-east-1",
+            "S3_PUBLIC_BASE_URL": f"{s3_url}/bench",
+            "S3_ALLOWED_PREFIXES": "vouchers/",
+        }
+
+    def stats(self):
+        return {
+            "smtp_messages": self.smtp.messages,
+            "moodle_calls": dict(self.moodle.calls),
+            "s3_calls": dict(self.s3.calls),
+        }
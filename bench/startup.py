@@ -0,0 +1,185 @@
+"""
+Costo de arranque del backend.
+
+  - imports: corre `python -X importtime -c "import wsgi"` en un proceso
+    limpio (--runs veces) y reporta la mediana del tiempo total y de cada
+    módulo, propio (self) y acumulado (con sus dependencias)
+  - gunicorn: con y sin preload_app, tiempo hasta el primer /health y
+    tiempo en que un worker reemplazado (como tras max_requests) vuelve a
+    responder; esto último lee /proc, así que solo corre en Linux
+
+Uso (desde la raíz del repo):
+    python bench/startup.py --runs 5 --output startup-main.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import seed as seed_module  # noqa: E402
+from api_hot_paths import BACKEND_DIR, _git_commit, start_gunicorn  # noqa: E402
+
+FIRST_PARTY = sorted(p.stem for p in BACKEND_DIR.glob("*.py"))
+
+
+def _import_env(db_path, work_dir):
+    return {
+        **os.environ,
+        "DB_PATH": str(db_path),
+        "REQUEST_LOG": "0",
+        "METRICS_DIR": str(Path(work_dir) / "metrics"),
+        "PRERENDER_DIR": str(Path(work_dir) / "prerendered"),
+    }
+
+
+def import_times(db_path, work_dir, module="wsgi"):
+    """{módulo: (self_us, cumulative_us)} y el tiempo total de un import en frío."""
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=_import_env(db_path, work_dir),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = time.perf_counter() - start
+    modules = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules, wall
+
+
+def run_imports(db_path, work_dir, runs, top):
+    samples = [import_times(db_path, work_dir) for _ in range(runs)]
+    names = set().union(*(m for m, _ in samples))
+
+    def median(name, index):
+        return statistics.median(m[name][index] for m, _ in samples if name in m) / 1000
+
+    rows = [
+        {"module": name, "self_ms": round(median(name, 0), 3), "cumulative_ms": round(median(name, 1), 3)}
+        for name in names
+    ]
+    top_level = sorted((r for r in rows if "." not in r["module"]), key=lambda r: -r["cumulative_ms"])
+    return {
+        "runs": runs,
+        "process_wall_ms": round(statistics.median(wall for _, wall in samples) * 1000, 1),
+        "wsgi_cumulative_ms": round(median("wsgi", 1), 3),
+        "first_party": sorted((r for r in rows if r["module"] in FIRST_PARTY), key=lambda r: -r["cumulative_ms"]),
+        "top_level": top_level[:top],
+        "top_self": sorted(rows, key=lambda r: -r["self_ms"])[:top],
+    }
+
+
+def _children(pid):
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            stat = Path(f"/proc/{entry}/stat").read_text()
+        except OSError:
+            continue
+        # el nombre del proceso va entre paréntesis y puede tener espacios
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            found.append(int(entry))
+    return found
+
+
+def _respawn_time(proc, port):
+    """Mata al único worker y mide hasta que su reemplazo responde /health."""
+    (worker,) = _children(proc.pid)
+    start = time.perf_counter()
+    os.kill(worker, signal.SIGKILL)
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        if any(pid != worker for pid in _children(proc.pid)):
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", "/health")
+                if conn.getresponse().status == 200:
+                    conn.close()
+                    return time.perf_counter() - start
+            except OSError:
+                pass
+        time.sleep(0.005)
+    raise RuntimeError("el worker reemplazado no respondió a tiempo")
+
+
+def run_gunicorn_boot(db_path, work_dir, workers, runs):
+    results = []
+    for preload in ("0", "1"):
+        env = {"GUNICORN_PRELOAD": preload}
+        boot, respawn = [], []
+        for _ in range(runs):
+            start = time.perf_counter()
+            proc, _ = start_gunicorn(db_path, workers, 1, work_dir, extra_env=env)
+            boot.append(time.perf_counter() - start)
+            proc.terminate()
+            proc.wait(timeout=10)
+            if sys.platform.startswith("linux"):
+                proc, port = start_gunicorn(db_path, 1, 1, work_dir, extra_env=env)
+                try:
+                    respawn.append(_respawn_time(proc, port))
+                finally:
+                    proc.terminate()
+                    proc.wait(timeout=10)
+        results.append({
+            "preload_app": preload == "1",
+            "workers": workers,
+            "first_health_ms": round(statistics.median(boot) * 1000, 1),
+            "worker_respawn_ms": round(statistics.median(respawn) * 1000, 1) if respawn else None,
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo de import y de arranque de workers (JSON)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20, help="módulos a listar por ranking")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--skip-gunicorn", action="store_true")
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    os.environ.setdefault("REQUEST_LOG", "0")
+    os.environ.setdefault("METRICS_DIR", str(Path(work_dir) / "metrics"))
+    info = seed_module.seed(Path(work_dir) / "bench.db", "small")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "imports": run_imports(info["db_path"], work_dir, args.runs, args.top),
+        "gunicorn": [] if args.skip_gunicorn else run_gunicorn_boot(info["db_path"], work_dir, args.workers, max(1, args.runs // 2)),
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
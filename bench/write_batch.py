@@ -0,0 +1,155 @@
+"""
+Inserciones por segundo en los endpoints públicos que escriben
+(/subscribe y /api/contact), con y sin la escritura agrupada de
+db.batched_insert (WRITE_BATCH_ENABLED).
+
+Levanta gunicorn una vez por configuración, lanza --users clientes que
+insertan sin pausa durante --seconds y reporta inserts/s, errores y
+percentiles de latencia. Al final cuenta las filas en la base para
+confirmar que cada 201 quedó escrito.
+
+Uso (desde la raíz del repo):
+    python bench/write_batch.py --users 32 --seconds 10 --workers 2 --threads 8
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import seed as seed_module  # noqa: E402
+from api_hot_paths import _git_commit, _percentile, start_gunicorn  # noqa: E402
+
+ENDPOINTS = {
+    "subscribe": lambda tag, i: ("/subscribe", {"email": f"{tag}-{i}@example.com", "accepted_terms": "1"}),
+    "contact": lambda tag, i: ("/api/contact", {"name": f"Visitante {i}", "email": f"{tag}-{i}@example.com", "message": "Consulta de prueba"}),
+}
+TABLES = {"subscribe": "subscriptions", "contact": "contact_messages"}
+
+
+def _client(port, endpoint, tag, deadline, results):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    latencies, errors, i = [], 0, 0
+    while time.monotonic() < deadline:
+        path, payload = ENDPOINTS[endpoint](tag, i)
+        t0 = time.perf_counter()
+        try:
+            conn.request("POST", path, body=json.dumps(payload), headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status != 201:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        latencies.append(time.perf_counter() - t0)
+        i += 1
+    conn.close()
+    results.append((latencies, errors))
+
+
+def _count_rows(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def run_config(db_path, port, endpoint, users, seconds, tag):
+    table = TABLES[endpoint]
+    before = _count_rows(db_path, table)
+    results = []
+    deadline = time.monotonic() + seconds
+    pool = [threading.Thread(target=_client, args=(port, endpoint, f"{tag}-{n}", deadline, results)) for n in range(users)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies = sorted(lat for lats, _ in results for lat in lats)
+    errors = sum(err for _, err in results)
+    rows = _count_rows(db_path, table) - before
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rows_written": rows,
+        "inserts_per_second": round(rows / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inserts/s con y sin escritura agrupada (JSON)")
+    parser.add_argument("--endpoints", default="subscribe,contact")
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--window-ms", default="2", help="WRITE_BATCH_WINDOW_MS para la corrida agrupada")
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_write_batch_")
+    os.environ.setdefault("REQUEST_LOG", "0")
+    os.environ.setdefault("METRICS_DIR", str(Path(work_dir) / "metrics"))
+    info = seed_module.seed(Path(work_dir) / "bench.db", "small")
+
+    base_env = {"RATE_LIMIT_CONTACT": "0,0", "RATE_LIMIT_SUBSCRIBE": "0,0", "MAIL_ENABLED": "0"}
+    configs = [
+        ("per_request", {"WRITE_BATCH_ENABLED": "0"}),
+        ("batched", {"WRITE_BATCH_ENABLED": "1", "WRITE_BATCH_WINDOW_MS": args.window_ms}),
+    ]
+    results = []
+    for name, env in configs:
+        proc, port = start_gunicorn(info["db_path"], args.workers, args.threads, work_dir, {**base_env, **env})
+        try:
+            for endpoint in args.endpoints.split(","):
+                endpoint = endpoint.strip()
+                result = run_config(info["db_path"], port, endpoint, args.users, args.seconds, f"{name}-{endpoint}")
+                print(f"[write_batch] {name} {endpoint} {result['inserts_per_second']} inserts/s "
+                      f"p95={result['p95_ms']}ms errores={result['errors']}", file=sys.stderr)
+                results.append({"config": name, "endpoint": endpoint, **result})
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "users": args.users,
+            "seconds": args.seconds,
+            "workers": args.workers,
+            "threads": args.threads,
+            "window_ms": args.window_ms,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,10 +4,48 @@ import os
 bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:8000")
 workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
 threads = int(os.environ.get("GUNICORN_THREADS", "2"))
+# "gevent" atiende hasta worker_connections requests por worker con greenlets:
+# las esperas de red (Moodle, SMTP, S3) ceden el turno en lugar de ocupar un
+# hilo. Con "sync" y threads > 1 gunicorn usa gthread.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "100"))
 timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
 accesslog = "-"
 errorlog = "-"
 loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
 wsgi_app = "wsgi:app"
 
+# Con preload el master importa la app y deja la base lista (wsgi.py llama a
+# ensure_db) una sola vez; los workers nacen por fork ya cargados, así que
+# arrancar o reciclar uno por max_requests no vuelve a pagar los imports.
+# Con preload, HUP no recarga código: tras un deploy usa systemctl restart.
+preload_app = (os.environ.get("GUNICORN_PRELOAD") or "1").lower() in ("1", "true", "yes", "on")
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+if worker_class == "gevent":
+    # Parchear antes de que preload_app importe la app: los locks, sockets y
+    # time.sleep de los módulos ya cargados deben ser los de gevent.
+    from gevent import monkey
+
+    monkey.patch_all()
+
 worker_tmp_dir = "/dev/shm"
+
+
+def on_starting(server):
+    # Descarta los registros de métricas de workers de la ejecución anterior
+    from metrics import reset_dir
+
+    reset_dir()
+
+
+def child_exit(server, worker):
+    # Un worker que termina (max_requests, timeout, HUP) deja de volcar: sus
+    # contadores pasan a los archivos *-exited.json y se borra su registro,
+    # así /metrics no lee un archivo por cada pid que existió.
+    from metrics import worker_exited
+    from query_stats import worker_exited as queries_exited
+
+    worker_exited(worker.pid)
+    queries_exited(worker.pid)
@@ -2338,53 +2338,9 @@ let currentAdminUserId = null;
       tbody.innerHTML = `<tr><td colspan="5" class="muted small">Error: ${escHtml(err.message)}</td></tr>`;
     }
 
-    // Load orders
-    const ordTbody = q('ac-orders-body');
-    const ordCount = q('ac-orders-count');
-    try {
-      const oRes = await apiFetch('/api/admin/orders');
-      const orders = await oRes.json().catch(() => []);
-      _ordersCache = Array.isArray(orders) ? orders : [];
-      ordCount.textContent = _ordersCache.length;
-      if (!_ordersCache.length) {
-        ordTbody.innerHTML = '<tr><td colspan="7" class="muted small">Sin órdenes aún.</td></tr>';
-      } else {
-        ordTbody.innerHTML = _ordersCache.map(o => {
-          const d = new Date(o.created_at + 'Z').toLocaleDateString('es-PE', { day:'2-digit', month:'short', year:'2-digit' });
-          const ordRef = `ORD-${String(o.id).padStart(4,'0')}`;
-          const compNumBadge = o.comprobante_number
-            ? `<span class="badge-active small">${escHtml(o.comprobante_number)}</span>`
-            : `<span class="badge-inactive small">Pendiente</span>`;
-          const paidBadge = o.status === 'paid'
-            ? `<span class="badge-active">Pagado</span>`
-            : `<span class="badge-inactive">Pendiente</span>`;
-          const moodleBadge = o.moodle_enrolled
-            ? `<span class="badge-active small">Inscrito</span>`
-            : `<span class="badge-inactive small">No</span>`;
-          const voucherCell = o.voucher_url
-            ? `<a href="${escHtml(o.voucher_url)}" target="_blank" class="small voucher-link">📎 Ver</a>`
-            : `<span class="small muted">—</span>`;
-          const notesSnippet = o.notes
-            ? `<div class="order-notes-preview small muted" title="${escHtml(o.notes)}">📝 ${escHtml(o.notes.substring(0,30))}${o.notes.length>30?'…':''}</div>`
-            : '';
-          return `<tr data-order-id="${o.id}">
-            <td class="small"><strong>${escHtml(ordRef)}</strong><br><span class="muted">${d}</span></td>
-            <td>${escHtml(o.student_name)}<br><a href="mailto:${escHtml(o.student_email)}" class="small muted">${escHtml(o.student_email)}</a>${notesSnippet}</td>
-            <td class="small">${escHtml(o.course_title || o.course_slug || '—')}</td>
-            <td>${voucherCell}</td>
-            <td>${(o.comprobante_type === 'factura' ? 'Factura' : 'Boleta')}<br>${compNumBadge}</td>
-            <td>${paidBadge}<br>${moodleBadge}</td>
-            <td><button class="secondary small-btn ac-ord-manage" data-id="${o.id}">⚙ Gestionar</button></td>
-          </tr>`;
-        }).join('');
-
-        ordTbody.querySelectorAll('.ac-ord-manage').forEach(btn => {
-          btn.addEventListener('click', () => openManageModal(Number(btn.dataset.id)));
-        });
-      }
-    } catch {
-      ordTbody.innerHTML = '<tr><td colspan="7" class="muted small">Error al cargar órdenes.</td></tr>';
-    }
+    // Load orders (primera página; el resto con "Cargar más")
+    bindOrderFilters();
+    await loadOrdersAdmin();
 
     // Load students
     await loadStudentsAdmin();
@@ -2396,20 +2352,136 @@ let currentAdminUserId = null;
     });
   }
 
-  async function loadStudentsAdmin() {
-    const tbody = q('ac-students-body');
-    const countEl = q('ac-students-count');
-    if (!tbody) return;
-    tbody.innerHTML = '<tr><td colspan="7" class="muted small">Cargando…</td></tr>';
+  const ORDERS_PAGE_SIZE = 50;
+  let _ordersNextCursor = null;
+  let _ordersFilterTimer = null;
+  // id del input -> parámetro de /api/admin/orders
+  const ORDER_FILTERS = {
+    'ac-orders-filter-email': 'email',
+    'ac-orders-filter-status': 'status',
+    'ac-orders-filter-payment': 'payment_method',
+    'ac-orders-filter-course': 'course_id',
+    'ac-orders-filter-start': 'from',
+    'ac-orders-filter-end': 'to',
+  };
+
+  function bindOrderFilters() {
+    const courseSel = q('ac-orders-filter-course');
+    if (courseSel) {
+      const current = courseSel.value;
+      const courses = Array.isArray(acCourses) ? acCourses : [];
+      courseSel.innerHTML = '<option value="">Todos</option>' + courses
+        .map(c => `<option value="${c.id}">${escHtml(c.title)}</option>`).join('');
+      courseSel.value = courses.some(c => String(c.id) === current) ? current : '';
+    }
+    Object.keys(ORDER_FILTERS).forEach(id => {
+      const el = q(id);
+      if (!el || el.dataset.bound) return;
+      el.dataset.bound = '1';
+      el.addEventListener(el.id === 'ac-orders-filter-email' ? 'input' : 'change', () => {
+        clearTimeout(_ordersFilterTimer);
+        _ordersFilterTimer = setTimeout(() => loadOrdersAdmin(), 300);
+      });
+    });
+    const clearBtn = q('ac-orders-filter-clear');
+    if (clearBtn && !clearBtn.dataset.bound) {
+      clearBtn.dataset.bound = '1';
+      clearBtn.addEventListener('click', () => {
+        Object.keys(ORDER_FILTERS).forEach(id => {
+          const el = q(id);
+          if (el) el.value = '';
+        });
+        loadOrdersAdmin();
+      });
+    }
+  }
+
+  function renderOrderRow(o) {
+    const d = new Date(o.created_at + 'Z').toLocaleDateString('es-PE', { day:'2-digit', month:'short', year:'2-digit' });
+    const ordRef = `ORD-${String(o.id).padStart(4,'0')}`;
+    const compNumBadge = o.comprobante_number
+      ? `<span class="badge-active small">${escHtml(o.comprobante_number)}</span>`
+      : `<span class="badge-inactive small">Pendiente</span>`;
+    const paidBadge = o.status === 'paid'
+      ? `<span class="badge-active">Pagado</span>`
+      : `<span class="badge-inactive">Pendiente</span>`;
+    const moodleBadge = o.moodle_enrolled
+      ? `<span class="badge-active small">Inscrito</span>`
+      : `<span class="badge-inactive small">No</span>`;
+    const voucherCell = o.voucher_url
+      ? `<a href="${escHtml(o.voucher_url)}" target="_blank" class="small voucher-link">📎 Ver</a>`
+      : `<span class="small muted">—</span>`;
+    const notesSnippet = o.notes
+      ? `<div class="order-notes-preview small muted" title="${escHtml(o.notes)}">📝 ${escHtml(o.notes.substring(0,30))}${o.notes.length>30?'…':''}</div>`
+      : '';
+    return `<tr data-order-id="${o.id}">
+      <td class="small"><strong>${escHtml(ordRef)}</strong><br><span class="muted">${d}</span></td>
+      <td>${escHtml(o.student_name)}<br><a href="mailto:${escHtml(o.student_email)}" class="small muted">${escHtml(o.student_email)}</a>${notesSnippet}</td>
+      <td class="small">${escHtml(o.course_title || o.course_slug || '—')}</td>
+      <td>${voucherCell}</td>
+      <td>${(o.comprobante_type === 'factura' ? 'Factura' : 'Boleta')}<br>${compNumBadge}</td>
+      <td>${paidBadge}<br>${moodleBadge}</td>
+      <td><button class="secondary small-btn ac-ord-manage" data-id="${o.id}">⚙ Gestionar</button></td>
+    </tr>`;
+  }
+
+  async function loadOrdersAdmin(append = false) {
+    const ordTbody = q('ac-orders-body');
+    const ordCount = q('ac-orders-count');
+    const moreBtn = q('ac-orders-more');
+    if (!ordTbody) return;
+    if (moreBtn && !moreBtn.dataset.bound) {
+      moreBtn.dataset.bound = '1';
+      moreBtn.addEventListener('click', () => loadOrdersAdmin(true));
+    }
+    const params = new URLSearchParams({ limit: String(ORDERS_PAGE_SIZE) });
+    Object.entries(ORDER_FILTERS).forEach(([id, name]) => {
+      const value = (q(id)?.value || '').trim();
+      if (value) params.set(name, name === 'email' ? value.toLowerCase() : value);
+    });
+    if (append && _ordersNextCursor) params.set('cursor', _ordersNextCursor);
+    else _ordersNextCursor = null;
+    if (moreBtn) moreBtn.disabled = true;
     try {
-      const res = await apiFetch('/api/admin/students');
-      const students = await res.json().catch(() => []);
-      countEl.textContent = Array.isArray(students) ? students.length : 0;
-      if (!Array.isArray(students) || !students.length) {
-        tbody.innerHTML = '<tr><td colspan="7" class="muted small">Sin alumnos registrados aún.</td></tr>';
-        return;
+      const oRes = await apiFetch(`/api/admin/orders?${params.toString()}`);
+      const page = await oRes.json().catch(() => ({}));
+      const items = Array.isArray(page.items) ? page.items : [];
+      _ordersNextCursor = page.next_cursor || null;
+      if (append) {
+        items.forEach(o => {
+          if (!_ordersCache.some(c => c.id === o.id)) _ordersCache.push(o);
+        });
+      } else {
+        _ordersCache = items;
+        ordCount.textContent = page.total ?? items.length;
       }
-      tbody.innerHTML = students.map(s => `
+      if (!_ordersCache.length) {
+        const filtered = [...params.keys()].some(k => k !== 'limit' && k !== 'cursor');
+        ordTbody.innerHTML = `<tr><td colspan="7" class="muted small">${filtered ? 'Sin órdenes para estos filtros.' : 'Sin órdenes aún.'}</td></tr>`;
+      } else if (append) {
+        ordTbody.insertAdjacentHTML('beforeend', items.map(renderOrderRow).join(''));
+      } else {
+        ordTbody.innerHTML = _ordersCache.map(renderOrderRow).join('');
+      }
+      ordTbody.querySelectorAll('.ac-ord-manage:not([data-bound])').forEach(btn => {
+        btn.dataset.bound = '1';
+        btn.addEventListener('click', () => openManageModal(Number(btn.dataset.id)));
+      });
+      if (moreBtn) {
+        moreBtn.classList.toggle('hidden', !_ordersNextCursor);
+        moreBtn.disabled = false;
+      }
+    } catch {
+      if (!append) ordTbody.innerHTML = '<tr><td colspan="7" class="muted small">Error al cargar órdenes.</td></tr>';
+      if (moreBtn) moreBtn.disabled = false;
+    }
+  }
+
+  let _studentsNextCursor = null;
+  let _studentsSearchTimer = null;
+
+  function renderStudentRow(s) {
+    return `
         <tr>
           <td><strong>${escHtml(s.student_name || '—')}</strong></td>
           <td>${escHtml(s.student_email)}</td>
@@ -2420,12 +2492,58 @@ let currentAdminUserId = null;
           <td>
             <button type="button" class="secondary small-btn ac-student-detail-btn" data-email="${escHtml(s.student_email)}" data-name="${escHtml(s.student_name || '')}">Ver órdenes</button>
           </td>
-        </tr>`).join('');
-      tbody.querySelectorAll('.ac-student-detail-btn').forEach(btn => {
+        </tr>`;
+  }
+
+  async function loadStudentsAdmin(append = false) {
+    const tbody = q('ac-students-body');
+    const countEl = q('ac-students-count');
+    const moreBtn = q('ac-students-more');
+    const searchEl = q('ac-students-search');
+    if (!tbody) return;
+    if (moreBtn && !moreBtn.dataset.bound) {
+      moreBtn.dataset.bound = '1';
+      moreBtn.addEventListener('click', () => loadStudentsAdmin(true));
+    }
+    if (searchEl && !searchEl.dataset.bound) {
+      searchEl.dataset.bound = '1';
+      searchEl.addEventListener('input', () => {
+        clearTimeout(_studentsSearchTimer);
+        _studentsSearchTimer = setTimeout(() => loadStudentsAdmin(), 300);
+      });
+    }
+    const params = new URLSearchParams({ limit: '50' });
+    const term = (searchEl?.value || '').trim();
+    if (term) params.set('q', term);
+    if (append && _studentsNextCursor) params.set('cursor', _studentsNextCursor);
+    if (!append) tbody.innerHTML = '<tr><td colspan="7" class="muted small">Cargando…</td></tr>';
+    if (moreBtn) moreBtn.disabled = true;
+    try {
+      const res = await apiFetch(`/api/admin/students?${params.toString()}`);
+      const page = await res.json().catch(() => ({}));
+      const students = Array.isArray(page.items) ? page.items : [];
+      _studentsNextCursor = page.next_cursor || null;
+      if (moreBtn) {
+        moreBtn.classList.toggle('hidden', !_studentsNextCursor);
+        moreBtn.disabled = false;
+      }
+      if (append) {
+        tbody.insertAdjacentHTML('beforeend', students.map(renderStudentRow).join(''));
+      } else {
+        countEl.textContent = page.total ?? students.length;
+        if (!students.length) {
+          tbody.innerHTML = '<tr><td colspan="7" class="muted small">Sin alumnos registrados aún.</td></tr>';
+          return;
+        }
+        tbody.innerHTML = students.map(renderStudentRow).join('');
+      }
+      tbody.querySelectorAll('.ac-student-detail-btn:not([data-bound])').forEach(btn => {
+        btn.dataset.bound = '1';
         btn.addEventListener('click', () => showStudentDetail(btn.dataset.email, btn.dataset.name));
       });
     } catch {
-      tbody.innerHTML = '<tr><td colspan="7" class="muted small">Error al cargar alumnos.</td></tr>';
+      if (!append) tbody.innerHTML = '<tr><td colspan="7" class="muted small">Error al cargar alumnos.</td></tr>';
+      if (moreBtn) moreBtn.disabled = false;
     }
   }
 
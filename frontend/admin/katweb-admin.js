@@ -931,7 +931,9 @@
       const entry = evt.detail || {};
       currentSlug = entry.slug || "";
       try {
-        currentMeta = entry.meta_json ? JSON.parse(entry.meta_json) : {};
+        const rawMeta = entry.meta_json;
+        // Copia: el editor muta currentMeta y la entrada debe quedar intacta hasta guardar
+        currentMeta = !rawMeta ? {} : JSON.parse(typeof rawMeta === "object" ? JSON.stringify(rawMeta) : rawMeta);
       } catch (_) {
         currentMeta = {};
       }
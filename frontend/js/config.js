@@ -12,3 +12,39 @@
     window.API_BASE = origin || 'http://127.0.0.1:5000';
   }
 })();
+
+// Snapshot prerenderizado (backend/prerender.py): las respuestas del primer
+// render vienen incrustadas en el HTML y se sirven desde memoria en vez de
+// pedirlas a la red. Sin el bloque, fetch queda intacto.
+(() => {
+  const node = document.getElementById('prerender-data');
+  if (!node || typeof window.fetch !== 'function') return;
+  let preloaded;
+  try {
+    preloaded = JSON.parse(node.textContent || '{}');
+  } catch (_) {
+    return;
+  }
+  const byUrl = new Map();
+  Object.keys(preloaded).forEach((key) => {
+    const base = key.startsWith('/') ? window.API_BASE || window.location.href : window.location.href;
+    try {
+      byUrl.set(new URL(key, base).href, preloaded[key]);
+    } catch (_) {}
+  });
+  const nativeFetch = window.fetch.bind(window);
+  window.fetch = (input, init) => {
+    const method = (init && init.method) || (input && input.method) || 'GET';
+    if (method.toUpperCase() === 'GET') {
+      let href = '';
+      try {
+        href = new URL(typeof input === 'string' ? input : input.url, window.location.href).href;
+      } catch (_) {}
+      const hit = byUrl.get(href);
+      if (hit) {
+        return Promise.resolve(new Response(hit.body, { status: 200, headers: { 'Content-Type': hit.type } }));
+      }
+    }
+    return nativeFetch(input, init);
+  };
+})();
@@ -317,19 +317,6 @@ async function loadSearchData() {
     ]);
     const pubs = pubRes.ok ? await pubRes.json() : [];
     const kdbList = kdbRes.ok ? await kdbRes.json() : [];
-    const pubDetails = await Promise.all(
-      (pubs || []).map(async (entry) => {
-        const slug = entry.slug;
-        if (!slug) return entry;
-        try {
-          const res = await fetch(`${base}/api/publications/slug/${encodeURIComponent(slug)}`);
-          if (!res.ok) return entry;
-          return await res.json();
-        } catch (_) {
-          return entry;
-        }
-      }),
-    );
     const kdbDetails = await Promise.all(
       (kdbList || []).map(async (entry) => {
         try {
@@ -342,9 +329,11 @@ async function loadSearchData() {
       }),
     );
     const items = [];
-    (pubDetails || []).forEach((p) => {
+    // El listado ya trae excerpt_text en texto plano; no hace falta pedir
+    // cada publicación completa.
+    (Array.isArray(pubs) ? pubs : pubs.items || []).forEach((p) => {
       const title = p.title || '';
-      const content = stripHtml(p.content_html || p.excerpt || '');
+      const content = p.excerpt_text || stripHtml(p.content_html || p.excerpt || '');
       items.push({
         type: 'Publicacion',
         title,
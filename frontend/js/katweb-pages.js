@@ -47,6 +47,8 @@
   /* ─── PARSE meta_json safely ────────────────────────────── */
   function parseMeta(entry) {
     if (!entry || !entry.meta_json) return null;
+    // La API lo entrega como objeto; se acepta también el formato string anterior
+    if (typeof entry.meta_json === "object") return entry.meta_json;
     try {
       return JSON.parse(entry.meta_json);
     } catch (_) {
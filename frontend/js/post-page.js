@@ -143,13 +143,13 @@
             year: "numeric",
           })
         : "";
-      const snippet = stripHtml(p.content_html || p.excerpt || "");
+      const snippet = p.excerpt_text || stripHtml(p.content_html || p.excerpt || "");
       const snippetText = snippet.slice(0, 160) + (snippet.length > 160 ? " ..." : "");
       const card = `
         <article class="publication-card" tabindex="0">
           <div class="pub-thumb">
             ${categoryHtml}
-            <img src="${escapeHtml(p.hero_image_url || "")}" alt="${escapeHtml(p.title || "")}">
+            <img src="${escapeHtml(p.hero_image_url || p.first_image_url || "")}" alt="${escapeHtml(p.title || "")}">
           </div>
           <div class="pub-body">
             <div class="meta"><span class="date">${escapeHtml(date)}</span></div>
@@ -192,7 +192,7 @@
         <a class="post-sidebar-card" href="publicacion.html?slug=${encodeURIComponent(p.slug || "")}">
           <div class="post-sidebar-thumb">
             ${catName ? `<span class="post-sidebar-badge">${escapeHtml(catName)}</span>` : ""}
-            <img src="${escapeHtml(p.hero_image_url || "")}" alt="${escapeHtml(p.title || "")}">
+            <img src="${escapeHtml(p.hero_image_url || p.first_image_url || "")}" alt="${escapeHtml(p.title || "")}">
           </div>
           <span class="post-sidebar-date">${escapeHtml(date)}</span>
           <h3 class="post-sidebar-title">${escapeHtml(p.title || "")}</h3>
@@ -205,10 +205,11 @@
   async function loadLatest(currentSlug) {
     try {
       const base = window.API_BASE || "";
-      const res = await fetch(`${base}/api/publications`);
+      // Ya vienen ordenadas por fecha; 4 alcanza aunque una sea la actual
+      const res = await fetch(`${base}/api/publications?limit=4`);
       if (!res.ok) throw new Error("No encontrado");
       const data = await res.json();
-      const list = Array.isArray(data) ? data : data.publications || [];
+      const list = Array.isArray(data) ? data : data.items || data.publications || [];
       const filtered = (list || []).filter((p) => p.slug && p.slug !== currentSlug);
       filtered.sort((a, b) => new Date(b.published_at || 0) - new Date(a.published_at || 0));
       const latest = filtered.slice(0, 3);
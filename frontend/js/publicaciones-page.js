@@ -57,19 +57,15 @@
           })
         : '';
       const snippet = (() => {
-        if (p.content_html) {
-          const tmp = document.createElement('div');
-          tmp.innerHTML = p.content_html;
-          const text = (tmp.textContent || '').trim();
-          return text.slice(0, 160) + (text.length > 160 ? ' ...' : '');
-        }
-        return '';
+        // El listado trae solo el extracto en texto plano (sin content_html)
+        const text = (p.excerpt_text || p.excerpt || '').trim();
+        return text.slice(0, 160) + (text.length > 160 ? ' ...' : '');
       })();
       const card = `
         <article class="publication-card" tabindex="0">
           <div class="pub-thumb">
             ${categoryHtml}
-            <img src="${escapeHtml(p.hero_image_url || '')}" alt="${escapeHtml(p.title || '')}">
+            <img src="${escapeHtml(p.hero_image_url || p.first_image_url || '')}" alt="${escapeHtml(p.title || '')}">
           </div>
           <div class="pub-body">
             <div class="meta"><span class="date">${escapeHtml(date)}</span></div>